@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+import hmac
+import logging
+from typing import Optional
+
+from app.core.config import settings
+from app.models.broadcast import BroadcastRequest
+from app.services.broadcast_service import broadcast_service
+
+logger = logging.getLogger(__name__)
+
+async def require_admin(authorization: Optional[str] = Header(None)):
+    """Require `Authorization: Bearer <ADMIN_API_TOKEN>`"""
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API disabled")
+
+    token = (authorization or "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(token.encode(), settings.ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.post("/broadcasts", status_code=202)
+async def create_broadcast(request: BroadcastRequest):
+    """Start a template broadcast"""
+    try:
+        job_id = await broadcast_service.create(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"job_id": job_id, "status": "running"}
+
+@router.get("/broadcasts/{job_id}")
+async def get_broadcast(job_id: str):
+    """Broadcast progress"""
+    job = await broadcast_service.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return job
+
+@router.get("/broadcasts/{job_id}/results")
+async def get_broadcast_results(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Per-recipient results"""
+    if not await broadcast_service.get(job_id):
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return {
+        "job_id": job_id,
+        "offset": offset,
+        "results": await broadcast_service.results(job_id, offset, limit)
+    }
+
+@router.post("/broadcasts/{job_id}/cancel")
+async def cancel_broadcast(job_id: str):
+    """Cancel a running broadcast after its current batch"""
+    if not await broadcast_service.get(job_id):
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    if not await broadcast_service.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Broadcast is not running")
+    return {"job_id": job_id, "status": "cancelled"}
@@ -1,20 +1,23 @@
 from fastapi import APIRouter, Request, HTTPException, Query
 from fastapi.responses import PlainTextResponse
+import asyncio
 import hmac
 import hashlib
-import json
 import logging
-from typing import Dict, Any
+import random
+from typing import List
 
 from app.core.config import settings
-from app.services.message_processor import MessageProcessor
+from app.models.webhook import WebhookEnvelope, MessageStatus
+from app.services.admission_controller import admission_controller, AdmissionRejected
+from app.services.message_dispatcher import message_dispatcher
+from app.services.message_processor import message_processor
+from app.services.status_writer import status_writer
+from app.services.webhook_queue import webhook_queue
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Initialize message processor
-message_processor = MessageProcessor()
-
 @router.get("/webhook")
 async def verify_webhook(
     hub_mode: str = Query(alias="hub.mode"),
@@ -43,17 +46,29 @@ async def handle_webhook(request: Request):
             logger.error("Invalid webhook signature")
             raise HTTPException(status_code=403, detail="Invalid signature")
         
-        # Parse webhook data
+        # Parse webhook data; malformed bodies are rejected, not queued for retries
         try:
-            data = json.loads(body)
-        except json.JSONDecodeError as e:
+            envelope = WebhookEnvelope.from_bytes(body)
+        except ValueError as e:
             logger.error(f"Invalid JSON in webhook: {e}")
             raise HTTPException(status_code=400, detail="Invalid JSON")
         
-        logger.info(f"Received webhook data: {json.dumps(data, indent=2)}")
+        # Ack-first mode: persist the raw body and let the queue workers process it.
+        # Admission control does not apply there: the stream absorbs bursts and
+        # WEBHOOK_WORKER_CONCURRENCY bounds the work in flight.
+        if settings.WEBHOOK_QUEUE_ENABLED:
+            if await webhook_queue.enqueue(body):
+                return {"status": "ok"}
+            logger.warning("Failed to enqueue webhook, processing inline")
+        
+        log_webhook_payload(body)
         
-        # Process webhook data
-        await process_webhook_data(data)
+        # Process webhook data within the admission budget
+        try:
+            async with admission_controller.admit():
+                await process_webhook_envelope(envelope)
+        except AdmissionRejected:
+            await shed_webhook(body, envelope)
         
         return {"status": "ok"}
     
@@ -81,46 +96,56 @@ def verify_signature(payload: bytes, signature: str) -> bool:
         logger.error(f"Error verifying signature: {e}")
         return False
 
-async def process_webhook_data(data: Dict[str, Any]):
-    """Process webhook data and route to appropriate handlers"""
+def log_webhook_payload(body: bytes):
+    """Log a sample of raw webhook payloads; free unless DEBUG logging is enabled"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() < settings.WEBHOOK_PAYLOAD_LOG_SAMPLE_RATE:
+        logger.debug("Received webhook payload: %s", body.decode("utf-8", errors="replace"))
+
+async def process_webhook_body(body: bytes):
+    """Parse a raw webhook body and process it (used by the queue workers)"""
+    log_webhook_payload(body)
+    await process_webhook_envelope(WebhookEnvelope.from_bytes(body))
+
+async def process_webhook_envelope(envelope: WebhookEnvelope):
+    """Route the events of a parsed webhook to the appropriate handlers"""
     try:
-        # Check if this is a message webhook
-        if "entry" not in data:
-            logger.warning("No 'entry' field in webhook data")
+        if not envelope:
+            logger.warning("No events in webhook data")
             return
         
-        for entry in data["entry"]:
-            if "changes" not in entry:
-                continue
-                
-            for change in entry["changes"]:
-                if change.get("field") == "messages":
-                    value = change.get("value", {})
-                    
-                    # Handle incoming messages
-                    if "messages" in value:
-                        await message_processor.process_incoming_message(data)
-                    
-                    # Handle message status updates
-                    elif "statuses" in value:
-                        await handle_message_status(value["statuses"])
-                    
-                    # Handle other webhook events
-                    else:
-                        logger.info(f"Unhandled webhook event: {change}")
+        # Handle message status updates
+        if envelope.statuses:
+            await handle_message_status(envelope.statuses)
+        
+        # Handle other webhook events
+        for change in envelope.unhandled:
+            logger.info(f"Unhandled webhook event: {change.get('field')}")
+        
+        # Handle incoming messages, one job per message
+        await message_dispatcher.dispatch(envelope.messages)
     
     except Exception as e:
         logger.error(f"Error processing webhook data: {e}")
         raise
 
-async def handle_message_status(statuses: list):
+async def shed_webhook(body: bytes, envelope: WebhookEnvelope):
+    """Degrade gracefully when the admission budget of inline processing is exhausted"""
+    admission_controller.record_shed("busy")
+    logger.warning(f"Overloaded, sending busy reply for {len(envelope.messages)} messages")
+    
+    # Status updates are cheap and still recorded
+    if envelope.statuses:
+        await handle_message_status(envelope.statuses)
+    
+    senders = {message.sender_id for message in envelope.messages if message.sender_id}
+    await asyncio.gather(*(message_processor.send_busy_message(sender_id) for sender_id in senders))
+
+async def handle_message_status(statuses: List[MessageStatus]):
     """Handle message status updates (delivered, read, etc.)"""
     for status in statuses:
-        message_id = status.get("id")
-        status_type = status.get("status")
-        timestamp = status.get("timestamp")
-        
-        logger.info(f"Message {message_id} status: {status_type} at {timestamp}")
-        
-        # Here you could update message status in database
-        # For now, just log the status update
+        logger.debug(f"Message {status.id} status: {status.status} at {status.timestamp}")
+    
+    # Buffered; flushed to Postgres in batches by the status writer
+    status_writer.submit(statuses)
@@ -11,6 +11,9 @@ class Settings(BaseSettings):
     # OpenAI API
     OPENAI_API_KEY: str = ""
     OPENAI_MODEL: str = "gpt-4"
+    OPENAI_BASE_URL: str = ""  # empty: api.openai.com
+    # Faster model that races the primary one when it is slow; empty disables hedging
+    OPENAI_SECONDARY_MODEL: str = "gpt-3.5-turbo"
     
     # Google Cloud
     GOOGLE_CLOUD_PROJECT_ID: Optional[str] = None
@@ -30,6 +33,151 @@ class Settings(BaseSettings):
     SHOPIFY_API_SECRET: Optional[str] = None
     SHOPIFY_SHOP_NAME: Optional[str] = None
     
+    # WhatsApp Cloud API HTTP pool
+    WHATSAPP_HTTP_POOL_SIZE: int = 64
+    WHATSAPP_HTTP_KEEPALIVE_SECONDS: float = 30.0
+    WHATSAPP_HTTP_DNS_TTL_SECONDS: int = 300
+    WHATSAPP_HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    WHATSAPP_HTTP_TIMEOUT_SECONDS: float = 15.0
+    WHATSAPP_MEDIA_TIMEOUT_SECONDS: float = 60.0
+    # Circuit breaker around the Cloud API
+    WHATSAPP_BREAKER_WINDOW: int = 20
+    WHATSAPP_BREAKER_MIN_CALLS: int = 10
+    WHATSAPP_BREAKER_FAILURE_RATIO: float = 0.5
+    WHATSAPP_BREAKER_SLOW_CALL_SECONDS: float = 5.0
+    WHATSAPP_BREAKER_OPEN_SECONDS: float = 30.0
+    # Media downloads are streamed and capped (WhatsApp audio/video limit is 16 MB)
+    MEDIA_MAX_BYTES: int = 16 * 1024 * 1024
+    MEDIA_CHUNK_BYTES: int = 64 * 1024
+    MEDIA_SPOOL_MEMORY_BYTES: int = 1024 * 1024
+    # Media URLs expire after 5 minutes; cached a bit shorter
+    MEDIA_URL_TTL_SECONDS: int = 240
+    # Downloaded media cached on disk by sha256 (empty dir: private temp directory)
+    MEDIA_BLOB_CACHE_DIR: str = ""
+    MEDIA_BLOB_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    MEDIA_BLOB_CACHE_MAX_ITEM_BYTES: int = 8 * 1024 * 1024
+    
+    # Outbound send scheduler
+    OUTBOUND_WORKERS: int = 8
+    # Token bucket per phone number ID, shared across replicas through Redis
+    OUTBOUND_RATE_PER_SECOND: float = 20.0
+    OUTBOUND_BURST: int = 40
+    OUTBOUND_MAX_ATTEMPTS: int = 5
+    OUTBOUND_RETRY_BASE_SECONDS: float = 0.5
+    OUTBOUND_RETRY_MAX_SECONDS: float = 30.0
+    OUTBOUND_DEAD_LETTER_KEY: str = "outbound_dead_letter"
+    OUTBOUND_DEAD_LETTER_MAXLEN: int = 10000
+    # Messages parked while the Cloud API breaker is open
+    OUTBOUND_SPILL_KEY: str = "outbound_spill"
+    OUTBOUND_SPILL_CHECK_SECONDS: float = 5.0
+    OUTBOUND_SPILL_DRAIN_BATCH: int = 100
+    OUTBOUND_SPILL_PROBE_BATCH: int = 5
+    OUTBOUND_SPILL_LOCK_TTL_SECONDS: int = 300
+    
+    # Background side-effect lane (read receipts, typing indicators)
+    SIDE_EFFECT_WORKERS: int = 4
+    SIDE_EFFECT_MAX_PENDING: int = 5000
+    
+    # Admin API (broadcasts); empty token disables the admin endpoints
+    ADMIN_API_TOKEN: str = ""
+    
+    # Broadcast jobs
+    BROADCAST_CONCURRENCY: int = 16
+    # Recipients per checkpoint; a resumed job re-sends at most one batch
+    BROADCAST_BATCH_SIZE: int = 200
+    BROADCAST_RECIPIENTS_DIR: str = "data/broadcasts"
+    BROADCAST_LOCK_TTL_SECONDS: int = 300
+    BROADCAST_RESULTS_TTL_SECONDS: int = 30 * 86400
+    
+    # NLU result cache
+    NLU_CACHE_ENABLED: bool = True
+    NLU_CACHE_LOCAL_SIZE: int = 2048
+    NLU_CACHE_MAX_TEXT_LENGTH: int = 64
+    NLU_CACHE_MIN_CONFIDENCE: float = 0.8
+    # Near-duplicate reuse (hashed character n-grams) for greeting/help/goodbye
+    NLU_SEMANTIC_CACHE_ENABLED: bool = True
+    NLU_SEMANTIC_CACHE_SIZE: int = 512  # x DIM float32: 8 MB
+    NLU_SEMANTIC_CACHE_DIM: int = 4096
+    NLU_SEMANTIC_CACHE_THRESHOLD: float = 0.75
+    
+    # Local intent classifier (answers confident predictions without the LLM)
+    NLU_CLASSIFIER_ENABLED: bool = True
+    NLU_CLASSIFIER_THRESHOLD: float = 0.7
+    NLU_CLASSIFIER_CORPUS: str = ""  # empty: app/data/intent_corpus_de.tsv
+    # Rule-based order slots (date, address, quantity) while an order is collected
+    NLU_ENTITY_RULES_ENABLED: bool = True
+    
+    # NLU prompt size (system prompt + examples + message + projected context)
+    NLU_PROMPT_TOKEN_BUDGET: int = 1500
+    NLU_CONTEXT_MAX_FIELD_CHARS: int = 300
+    # Stream completions and reply as soon as intent and response are parsed
+    NLU_STREAMING_ENABLED: bool = True
+    
+    # NLU latency budget and hedging
+    NLU_DEADLINE_SECONDS: float = 12.0
+    NLU_HEDGE_PERCENTILE: float = 0.9  # of recent primary latencies
+    NLU_HEDGE_DELAY_SECONDS: float = 4.0  # until enough samples
+    NLU_HEDGE_MIN_DELAY_SECONDS: float = 1.0
+    NLU_HEDGE_MIN_SAMPLES: int = 20
+    
+    # OpenAI budgets shared by all replicas through Redis, per model
+    NLU_GOVERNOR_ENABLED: bool = True
+    NLU_GOVERNOR_MAX_CONCURRENCY: int = 12
+    NLU_GOVERNOR_RPM: int = 500
+    NLU_GOVERNOR_TPM: int = 40000
+    NLU_GOVERNOR_BURST_SECONDS: float = 10.0  # bucket capacity in seconds of budget
+    NLU_GOVERNOR_COMPLETION_TOKENS: int = 250  # initial completion estimate
+    NLU_GOVERNOR_LEASE_SECONDS: int = 60  # leases of crashed replicas expire
+    NLU_GOVERNOR_POLL_SECONDS: float = 0.1
+    NLU_GOVERNOR_REPLICAS: int = 3  # local share of the budgets while Redis is down
+    
+    # Webhook ingestion queue (Redis Streams)
+    WEBHOOK_QUEUE_ENABLED: bool = False
+    WEBHOOK_QUEUE_RUN_WORKERS: bool = True
+    WEBHOOK_STREAM_KEY: str = "webhook_events"
+    WEBHOOK_STREAM_MAXLEN: int = 100000
+    WEBHOOK_DEAD_LETTER_STREAM_KEY: str = "webhook_events_dead"
+    WEBHOOK_CONSUMER_GROUP: str = "webhook_workers"
+    WEBHOOK_WORKER_CONCURRENCY: int = 4
+    WEBHOOK_READ_BATCH_SIZE: int = 10  # also the unacked entries a consumer handles at once
+    WEBHOOK_READ_BLOCK_MS: int = 5000
+    WEBHOOK_CLAIM_IDLE_MS: int = 60000
+    WEBHOOK_CLAIM_INTERVAL_SECONDS: float = 30.0
+    WEBHOOK_MAX_DELIVERIES: int = 5
+    WEBHOOK_PAYLOAD_LOG_SAMPLE_RATE: float = 0.01
+    
+    # Message dispatch
+    MESSAGE_DISPATCH_CONCURRENCY: int = 16
+    MAILBOX_IDLE_SECONDS: float = 60.0
+    # Debounce window for rapid-fire text messages, 0 disables coalescing
+    MESSAGE_COALESCE_WINDOW_MS: int = 0
+    MESSAGE_COALESCE_MAX_WAIT_MS: int = 3000
+    MESSAGE_COALESCE_MAX_MESSAGES: int = 10
+    
+    # Admission control for inline webhook processing. With the webhook queue
+    # enabled every body is acked and queued instead, so nothing is shed or
+    # degraded: the stream buffers bursts and each queue consumer handles at
+    # most WEBHOOK_READ_BATCH_SIZE entries at once.
+    ADMISSION_MAX_CONCURRENCY: int = 32
+    ADMISSION_MAX_QUEUE_DEPTH: int = 64
+    ADMISSION_DEGRADE_RATIO: float = 0.75
+    # Shed payloads get a short busy reply; only "busy" is supported (the old
+    # "defer" could only run after a failed enqueue and behaves as "busy")
+    ADMISSION_OVERLOAD_POLICY: str = "busy"
+    
+    # Message deduplication
+    DEDUP_ENABLED: bool = True
+    DEDUP_TTL_SECONDS: int = 86400
+    DEDUP_PROCESSING_TTL_SECONDS: int = 45
+    DEDUP_BLOOM_CAPACITY: int = 100000
+    DEDUP_BLOOM_ERROR_RATE: float = 0.000001
+    
+    # Status persistence
+    STATUS_WRITER_ENABLED: bool = True
+    STATUS_WRITER_BATCH_SIZE: int = 500
+    STATUS_WRITER_FLUSH_INTERVAL_SECONDS: float = 2.0
+    STATUS_WRITER_MAX_BUFFER: int = 10000
+    
     # Development
     DEBUG: bool = True
     PORT: int = 8000
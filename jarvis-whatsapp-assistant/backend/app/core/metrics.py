@@ -0,0 +1,211 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Webhook deduplication
+DEDUP_CHECKS = Counter(
+    "jarvis_dedup_checks_total",
+    "Webhook message deduplication checks",
+    ["result"]
+)
+
+# Status persistence
+STATUS_EVENTS = Counter(
+    "jarvis_status_events_total",
+    "Message status events by outcome (buffered, dropped, written, failed)",
+    ["result"]
+)
+STATUS_BUFFER_SIZE = Gauge(
+    "jarvis_status_buffer_size",
+    "Status events waiting to be flushed to Postgres"
+)
+STATUS_FLUSH_SECONDS = Histogram(
+    "jarvis_status_flush_seconds",
+    "Duration of status batch flushes to Postgres"
+)
+
+# Admission control
+ADMISSION_IN_FLIGHT = Gauge(
+    "jarvis_admission_in_flight",
+    "Webhook payloads currently being processed inline"
+)
+ADMISSION_WAITING = Gauge(
+    "jarvis_admission_waiting",
+    "Webhook payloads waiting for a processing slot"
+)
+ADMISSION_SHED = Counter(
+    "jarvis_admission_shed_total",
+    "Webhook payloads shed because the queue budget was exceeded",
+    ["policy"]
+)
+
+# WhatsApp Cloud API HTTP pool
+WHATSAPP_REQUESTS = Counter(
+    "jarvis_whatsapp_requests_total",
+    "WhatsApp Cloud API requests by endpoint and outcome",
+    ["endpoint", "result"]
+)
+WHATSAPP_REQUEST_SECONDS = Histogram(
+    "jarvis_whatsapp_request_seconds",
+    "WhatsApp Cloud API request latency",
+    ["endpoint"]
+)
+WHATSAPP_IN_FLIGHT = Gauge(
+    "jarvis_whatsapp_in_flight",
+    "WhatsApp Cloud API requests currently in flight"
+)
+WHATSAPP_POOL_QUEUED = Gauge(
+    "jarvis_whatsapp_pool_queued",
+    "Requests waiting for a free pooled connection"
+)
+WHATSAPP_POOL_WAIT_SECONDS = Histogram(
+    "jarvis_whatsapp_pool_wait_seconds",
+    "Time spent waiting for a pooled connection when the pool is saturated"
+)
+WHATSAPP_CONNECTIONS = Counter(
+    "jarvis_whatsapp_connections_total",
+    "Pooled connections by event (created, reused)",
+    ["event"]
+)
+
+# Outbound send scheduler
+OUTBOUND_SENDS = Counter(
+    "jarvis_outbound_sends_total",
+    "Outbound messages by priority and outcome (sent, retried, dead_lettered)",
+    ["priority", "result"]
+)
+OUTBOUND_QUEUE_DEPTH = Gauge(
+    "jarvis_outbound_queue_depth",
+    "Outbound messages waiting for a send worker"
+)
+OUTBOUND_QUEUE_SECONDS = Histogram(
+    "jarvis_outbound_queue_seconds",
+    "Time from submission to first send attempt",
+    ["priority"]
+)
+OUTBOUND_RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "jarvis_outbound_rate_limit_wait_seconds",
+    "Time spent waiting for a token-bucket slot"
+)
+
+# Background side-effect lane
+SIDE_EFFECTS = Counter(
+    "jarvis_side_effects_total",
+    "Background side effects by kind and outcome (done, failed, coalesced, dropped)",
+    ["kind", "result"]
+)
+SIDE_EFFECTS_PENDING = Gauge(
+    "jarvis_side_effects_pending",
+    "Side effects waiting for a worker"
+)
+
+# Media caches
+MEDIA_CACHE = Counter(
+    "jarvis_media_cache_total",
+    "Media cache lookups by cache (info, blob) and result (hit, miss)",
+    ["cache", "result"]
+)
+MEDIA_BLOB_CACHE_BYTES = Gauge(
+    "jarvis_media_blob_cache_bytes",
+    "Bytes held by the media blob cache on disk"
+)
+
+# Broadcast jobs
+BROADCAST_RECIPIENTS = Counter(
+    "jarvis_broadcast_recipients_total",
+    "Broadcast recipients by outcome (sent, spilled, failed)",
+    ["result"]
+)
+
+# Circuit breakers
+BREAKER_STATE = Gauge(
+    "jarvis_circuit_breaker_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["breaker"]
+)
+BREAKER_TRANSITIONS = Counter(
+    "jarvis_circuit_breaker_transitions_total",
+    "Circuit breaker state transitions",
+    ["breaker", "state"]
+)
+OUTBOUND_SPILL = Counter(
+    "jarvis_outbound_spill_total",
+    "Outbound messages spilled to Redis while the breaker was open, and drained back",
+    ["result"]
+)
+
+# NLU result cache
+NLU_CACHE_LOOKUPS = Counter(
+    "jarvis_nlu_cache_lookups_total",
+    "NLU cache lookups by result (local_hit, redis_hit, miss, semantic_hit, semantic_miss)",
+    ["result"]
+)
+NLU_CACHE_STORES = Counter(
+    "jarvis_nlu_cache_stores_total",
+    "NLU results stored in the cache by intent",
+    ["intent"]
+)
+NLU_SEMANTIC_SIMILARITY = Histogram(
+    "jarvis_nlu_semantic_similarity",
+    "Best cosine similarity of semantic cache lookups",
+    buckets=(0.2, 0.4, 0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0)
+)
+
+# NLU routing and local intent classifier
+NLU_ROUTES = Counter(
+    "jarvis_nlu_routes_total",
+    "NLU requests by route (cache, semantic_cache, local, rules, llm, fallback) and intent",
+    ["route", "intent"]
+)
+NLU_CLASSIFIER_CONFIDENCE = Histogram(
+    "jarvis_nlu_classifier_confidence",
+    "Confidence of local intent classifier predictions",
+    buckets=(0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99)
+)
+NLU_CLASSIFIER_THRESHOLD = Gauge(
+    "jarvis_nlu_classifier_threshold",
+    "Confidence at or above which the local classifier answers without the LLM"
+)
+NLU_PROMPT_TOKENS = Histogram(
+    "jarvis_nlu_prompt_tokens",
+    "Tokens in the NLU prompt sent to the LLM",
+    buckets=(250, 500, 750, 1000, 1250, 1500, 2000, 3000)
+)
+NLU_STREAM_READY_SECONDS = Histogram(
+    "jarvis_nlu_stream_ready_seconds",
+    "Time from the streamed LLM request until intent and response were parsed"
+)
+NLU_LLM_ATTEMPTS = Counter(
+    "jarvis_nlu_llm_attempts_total",
+    "Hedged LLM attempts by model and result (won, lost, failed, timeout)",
+    ["model", "result"]
+)
+NLU_LLM_HEDGES = Counter(
+    "jarvis_nlu_llm_hedges_total",
+    "Secondary model requests started, by reason (slow, error)",
+    ["reason"]
+)
+NLU_LLM_SECONDS = Histogram(
+    "jarvis_nlu_llm_seconds",
+    "Time until a winning LLM attempt had a usable answer",
+    ["model"],
+    buckets=(0.5, 1, 2, 3, 4, 6, 8, 10, 15, 30)
+)
+NLU_CLASSIFIER_SECONDS = Histogram(
+    "jarvis_nlu_classifier_seconds",
+    "Local intent classifier prediction latency",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+)
+NLU_GOVERNOR_WAIT_SECONDS = Histogram(
+    "jarvis_nlu_governor_wait_seconds",
+    "Time LLM calls waited for the shared OpenAI budgets, by priority",
+    ["priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+)
+NLU_GOVERNOR_WAITING = Gauge(
+    "jarvis_nlu_governor_waiting",
+    "LLM calls queued locally for the shared OpenAI budgets"
+)
+NLU_GOVERNOR_THROTTLED = Counter(
+    "jarvis_nlu_governor_throttled_total",
+    "Governor checks that had to wait, by exhausted budget (concurrency, rpm, tpm)",
+    ["reason"]
+)
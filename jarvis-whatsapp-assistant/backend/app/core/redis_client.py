@@ -1,11 +1,32 @@
 import redis.asyncio as redis
 from app.core.config import settings
+import asyncio
 import json
-from typing import Optional, Any
+import math
+import time
+from typing import Optional, Any, Dict, List, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Release or extend a lock only while it still holds the caller's token;
+# after a stall it may have expired and been taken by someone else
+RELEASE_LOCK_SCRIPT = """
+-- compare_and_delete
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+EXTEND_LOCK_SCRIPT = """
+-- compare_and_expire
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
 class RedisClient:
     def __init__(self):
         self.redis_url = settings.REDIS_URL
@@ -49,6 +70,23 @@ class RedisClient:
         except Exception as e:
             logger.error(f"Redis SET error: {e}")
     
+    async def set_nx(self, key: str, value: str, expire: Optional[int] = None) -> Optional[bool]:
+        """Set key only if it does not exist; returns None when Redis is unavailable"""
+        try:
+            if self.redis_client:
+                return bool(await self.redis_client.set(key, value, ex=expire, nx=True))
+        except Exception as e:
+            logger.error(f"Redis SET NX error: {e}")
+        return None
+    
+    async def release_lock(self, key: str, owner: str) -> bool:
+        """Delete a lock taken with set_nx if `owner` still holds it"""
+        return bool(await self.eval(RELEASE_LOCK_SCRIPT, [key], [owner]))
+    
+    async def extend_lock(self, key: str, owner: str, expire: int) -> bool:
+        """Reset the expiry of a lock if `owner` still holds it"""
+        return bool(await self.eval(EXTEND_LOCK_SCRIPT, [key], [owner, expire]))
+    
     async def setex(self, key: str, expire: int, value: str):
         """Set key-value pair with expiration"""
         await self.set(key, value, expire)
@@ -69,17 +107,219 @@ class RedisClient:
         except Exception as e:
             logger.error(f"Redis EXISTS error: {e}")
         return False
+    
+    async def xadd(self, stream: str, fields: Dict[str, str], maxlen: Optional[int] = None) -> Optional[str]:
+        """Append an entry to a stream, returns the entry ID"""
+        try:
+            if self.redis_client:
+                return await self.redis_client.xadd(stream, fields, maxlen=maxlen, approximate=True)
+        except Exception as e:
+            logger.error(f"Redis XADD error: {e}")
+        return None
+    
+    async def xgroup_create(self, stream: str, group: str, id: str = "0") -> bool:
+        """Create a consumer group (and the stream) if it does not exist yet"""
+        try:
+            if self.redis_client:
+                await self.redis_client.xgroup_create(stream, group, id=id, mkstream=True)
+                return True
+        except Exception as e:
+            if "BUSYGROUP" in str(e):
+                return True
+            logger.error(f"Redis XGROUP CREATE error: {e}")
+        return False
+    
+    async def xreadgroup(
+        self,
+        group: str,
+        consumer: str,
+        stream: str,
+        count: int = 1,
+        block: Optional[int] = None
+    ) -> Optional[List[Tuple[str, Dict[str, str]]]]:
+        """Read new entries for a consumer group, returns (entry_id, fields) pairs or None on error"""
+        try:
+            if self.redis_client:
+                response = await self.redis_client.xreadgroup(
+                    group, consumer, {stream: ">"}, count=count, block=block
+                )
+                entries = []
+                for _, stream_entries in response or []:
+                    entries.extend(stream_entries)
+                return entries
+        except Exception as e:
+            # None, not [], so consumers can back off (and recreate a deleted group: NOGROUP)
+            logger.error(f"Redis XREADGROUP error: {e}")
+            return None
+        return []
+    
+    async def xack(self, stream: str, group: str, *entry_ids: str) -> int:
+        """Acknowledge processed stream entries"""
+        try:
+            if self.redis_client and entry_ids:
+                return await self.redis_client.xack(stream, group, *entry_ids)
+        except Exception as e:
+            logger.error(f"Redis XACK error: {e}")
+        return 0
+    
+    async def xpending_range(self, stream: str, group: str, idle: int, count: int = 100) -> List[Dict[str, Any]]:
+        """List pending entries that have been idle for at least `idle` milliseconds"""
+        try:
+            if self.redis_client:
+                return await self.redis_client.xpending_range(
+                    stream, group, min="-", max="+", count=count, idle=idle
+                )
+        except Exception as e:
+            logger.error(f"Redis XPENDING error: {e}")
+        return []
+    
+    async def xclaim(
+        self,
+        stream: str,
+        group: str,
+        consumer: str,
+        min_idle_time: int,
+        entry_ids: List[str]
+    ) -> List[Tuple[str, Dict[str, str]]]:
+        """Take over pending entries from another consumer"""
+        try:
+            if self.redis_client and entry_ids:
+                return await self.redis_client.xclaim(stream, group, consumer, min_idle_time, entry_ids)
+        except Exception as e:
+            logger.error(f"Redis XCLAIM error: {e}")
+        return []
+
+    async def eval(self, script: str, keys: List[str], args: List[Any]) -> Optional[Any]:
+        """Run a Lua script, returns None when Redis is unavailable"""
+        try:
+            if self.redis_client:
+                return await self.redis_client.eval(script, len(keys), *keys, *args)
+        except Exception as e:
+            logger.error(f"Redis EVAL error: {e}")
+        return None
+    
+    async def rpush(self, key: str, *values: str) -> int:
+        """Append values to a list, returns the new length"""
+        try:
+            if self.redis_client and values:
+                return await self.redis_client.rpush(key, *values)
+        except Exception as e:
+            logger.error(f"Redis RPUSH error: {e}")
+        return 0
+    
+    async def lpop(self, key: str) -> Optional[str]:
+        """Pop the first element of a list"""
+        try:
+            if self.redis_client:
+                return await self.redis_client.lpop(key)
+        except Exception as e:
+            logger.error(f"Redis LPOP error: {e}")
+        return None
+    
+    async def llen(self, key: str) -> int:
+        """Length of a list"""
+        try:
+            if self.redis_client:
+                return await self.redis_client.llen(key)
+        except Exception as e:
+            logger.error(f"Redis LLEN error: {e}")
+        return 0
+    
+    async def ltrim(self, key: str, start: int, end: int):
+        """Trim a list to the given range"""
+        try:
+            if self.redis_client:
+                await self.redis_client.ltrim(key, start, end)
+        except Exception as e:
+            logger.error(f"Redis LTRIM error: {e}")
+    
+    async def lrange(self, key: str, start: int, end: int) -> List[str]:
+        """Get a range of list elements"""
+        try:
+            if self.redis_client:
+                return await self.redis_client.lrange(key, start, end)
+        except Exception as e:
+            logger.error(f"Redis LRANGE error: {e}")
+        return []
+
+    async def hset(self, key: str, mapping: Dict[str, Any]) -> int:
+        """Set hash fields"""
+        try:
+            if self.redis_client and mapping:
+                return await self.redis_client.hset(key, mapping=mapping)
+        except Exception as e:
+            logger.error(f"Redis HSET error: {e}")
+        return 0
+    
+    async def hgetall(self, key: str) -> Dict[str, str]:
+        """Get all hash fields"""
+        try:
+            if self.redis_client:
+                return await self.redis_client.hgetall(key)
+        except Exception as e:
+            logger.error(f"Redis HGETALL error: {e}")
+        return {}
+    
+    async def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        """Increment a hash field"""
+        try:
+            if self.redis_client:
+                return await self.redis_client.hincrby(key, field, amount)
+        except Exception as e:
+            logger.error(f"Redis HINCRBY error: {e}")
+        return 0
+    
+    async def sadd(self, key: str, *members: str) -> int:
+        """Add members to a set"""
+        try:
+            if self.redis_client and members:
+                return await self.redis_client.sadd(key, *members)
+        except Exception as e:
+            logger.error(f"Redis SADD error: {e}")
+        return 0
+    
+    async def smembers(self, key: str) -> set:
+        """Get all members of a (small) set"""
+        try:
+            if self.redis_client:
+                return await self.redis_client.smembers(key)
+        except Exception as e:
+            logger.error(f"Redis SMEMBERS error: {e}")
+        return set()
+    
+    async def sscan(self, key: str, cursor: int = 0, count: int = 100) -> Optional[Tuple[int, List[str]]]:
+        """Incrementally iterate a set, returns (next_cursor, members) or None when Redis is unavailable"""
+        try:
+            if self.redis_client:
+                return await self.redis_client.sscan(key, cursor=cursor, count=count)
+        except Exception as e:
+            logger.error(f"Redis SSCAN error: {e}")
+        return None
+    
+    async def expire(self, key: str, seconds: int):
+        """Set a key's time to live"""
+        try:
+            if self.redis_client:
+                await self.redis_client.expire(key, seconds)
+        except Exception as e:
+            logger.error(f"Redis EXPIRE error: {e}")
 
 class MockRedisClient:
     """Mock Redis client for development when Redis is not available"""
     def __init__(self):
         self.data = {}
+        self.streams = {}
+        self.groups = {}
+        self._last_stream_id = 0
     
     async def get(self, key: str) -> Optional[str]:
         return self.data.get(key)
     
-    async def set(self, key: str, value: str, ex: Optional[int] = None):
+    async def set(self, key: str, value: str, ex: Optional[int] = None, nx: bool = False):
+        if nx and key in self.data:
+            return None
         self.data[key] = value
+        return True
     
     async def delete(self, key: str):
         self.data.pop(key, None)
@@ -87,6 +327,210 @@ class MockRedisClient:
     async def exists(self, key: str) -> bool:
         return key in self.data
     
+    async def eval(self, script: str, numkeys: int, *keys_and_args: Any):
+        """Run the Python twin of a known script, named by its first "-- <name>" line.
+
+        Unknown scripts return None, the same as an unavailable Redis, so
+        callers fall back to their in-process state.
+        """
+        name = script.strip().splitlines()[0][2:].strip() if script.strip().startswith("--") else ""
+        implementation = getattr(self, f"_script_{name}", None)
+        if implementation is None:
+            return None
+        keys = [str(key) for key in keys_and_args[:numkeys]]
+        return implementation(keys, list(keys_and_args[numkeys:]))
+    
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.time() * 1000)
+    
+    def _script_token_bucket(self, keys: List[str], args: List[Any]) -> int:
+        rate, capacity = float(args[0]), float(args[1])
+        now = self._now_ms()
+        state = self.data.setdefault(keys[0], {})
+        tokens = float(state.get("tokens", capacity))
+        ts = int(state.get("ts", now))
+        tokens = min(capacity, tokens + max(0, now - ts) * rate / 1000)
+        wait = 0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = math.ceil((1 - tokens) * 1000 / rate)
+        state.update(tokens=str(tokens), ts=str(now))
+        return wait
+    
+    def _script_llm_governor_acquire(self, keys: List[str], args: List[Any]) -> List[int]:
+        lease_id = str(args[0])
+        max_concurrency, rpm, tpm, cost, burst, lease_ms = (float(arg) for arg in args[1:7])
+        now = self._now_ms()
+        request_capacity = max(1, rpm * burst / 60)
+        token_capacity = max(1, tpm * burst / 60)
+        leases = self.data.setdefault(keys[1], {})
+        for member, expires_at in list(leases.items()):
+            if expires_at <= now:
+                del leases[member]
+        state = self.data.setdefault(keys[0], {})
+        requests = float(state.get("requests", request_capacity))
+        tokens = float(state.get("tokens", token_capacity))
+        elapsed = max(0, now - int(state.get("ts", now)))
+        requests = min(request_capacity, requests + elapsed * rpm / 60000)
+        tokens = min(token_capacity, tokens + elapsed * tpm / 60000)
+        needed = min(cost, token_capacity)
+        wait, reason = 0, 0
+        if len(leases) >= max_concurrency:
+            wait, reason = -1, 1
+        elif requests < 1:
+            wait, reason = math.ceil((1 - requests) * 60000 / rpm), 2
+        elif tokens < needed:
+            wait, reason = math.ceil((needed - tokens) * 60000 / tpm), 3
+        else:
+            requests -= 1
+            tokens -= cost
+            leases[lease_id] = now + lease_ms
+        state.update(requests=str(requests), tokens=str(tokens), ts=str(now))
+        return [wait, reason]
+    
+    def _script_compare_and_delete(self, keys: List[str], args: List[Any]) -> int:
+        if self.data.get(keys[0]) != str(args[0]):
+            return 0
+        del self.data[keys[0]]
+        return 1
+    
+    def _script_compare_and_expire(self, keys: List[str], args: List[Any]) -> int:
+        return int(self.data.get(keys[0]) == str(args[0]))
+    
+    def _script_llm_governor_release(self, keys: List[str], args: List[Any]) -> int:
+        self.data.get(keys[1], {}).pop(str(args[0]), None)
+        refund = float(args[1])
+        if refund and keys[0] in self.data:
+            state = self.data[keys[0]]
+            state["tokens"] = str(float(state.get("tokens", 0)) + refund)
+        return 1
+    
+    async def rpush(self, key: str, *values: str) -> int:
+        items = self.data.setdefault(key, [])
+        items.extend(values)
+        return len(items)
+    
+    async def lpop(self, key: str) -> Optional[str]:
+        items = self.data.get(key)
+        return items.pop(0) if items else None
+    
+    async def llen(self, key: str) -> int:
+        return len(self.data.get(key, []))
+    
+    async def ltrim(self, key: str, start: int, end: int):
+        items = self.data.get(key, [])
+        self.data[key] = items[start:] if end == -1 else items[start:end + 1]
+    
+    async def lrange(self, key: str, start: int, end: int) -> List[str]:
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+    
+    async def hset(self, key: str, mapping: Dict[str, Any]) -> int:
+        items = self.data.setdefault(key, {})
+        added = sum(1 for field in mapping if field not in items)
+        items.update({field: str(value) for field, value in mapping.items()})
+        return added
+    
+    async def hgetall(self, key: str) -> Dict[str, str]:
+        return dict(self.data.get(key, {}))
+    
+    async def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        items = self.data.setdefault(key, {})
+        items[field] = str(int(items.get(field, 0)) + amount)
+        return int(items[field])
+    
+    async def sadd(self, key: str, *members: str) -> int:
+        items = self.data.setdefault(key, set())
+        added = len(set(members) - items)
+        items.update(members)
+        return added
+    
+    async def smembers(self, key: str) -> set:
+        return set(self.data.get(key, set()))
+    
+    async def sscan(self, key: str, cursor: int = 0, count: int = 10) -> Tuple[int, List[str]]:
+        members = sorted(self.data.get(key, set()))
+        batch = members[cursor:cursor + count]
+        next_cursor = cursor + count
+        return (next_cursor if next_cursor < len(members) else 0), batch
+    
+    async def expire(self, key: str, seconds: int):
+        pass
+    
+    async def xadd(self, stream: str, fields: Dict[str, str], maxlen: Optional[int] = None, approximate: bool = True) -> str:
+        entries = self.streams.setdefault(stream, [])
+        self._last_stream_id = max(self._last_stream_id + 1, int(time.time() * 1000))
+        entry_id = f"{self._last_stream_id}-0"
+        entries.append((entry_id, dict(fields)))
+        if maxlen and len(entries) > maxlen:
+            del entries[:len(entries) - maxlen]
+        return entry_id
+    
+    async def xgroup_create(self, stream: str, group: str, id: str = "$", mkstream: bool = False):
+        if (stream, group) in self.groups:
+            raise Exception("BUSYGROUP Consumer Group name already exists")
+        entries = self.streams.setdefault(stream, [])
+        last_id = entries[-1][0] if id == "$" and entries else id
+        self.groups[(stream, group)] = {"last_id": last_id, "pending": {}}
+    
+    async def xreadgroup(self, group: str, consumer: str, streams: Dict[str, str], count: Optional[int] = None, block: Optional[int] = None):
+        response = []
+        for stream in streams:
+            state = self.groups.get((stream, group))
+            if state is None:
+                raise Exception("NOGROUP No such key or consumer group")
+            new_entries = [
+                entry for entry in self.streams.get(stream, [])
+                if self._stream_id_key(entry[0]) > self._stream_id_key(state["last_id"])
+            ][:count]
+            for entry_id, _ in new_entries:
+                state["pending"][entry_id] = {"consumer": consumer, "delivered_at": time.time(), "times_delivered": 1}
+            if new_entries:
+                state["last_id"] = new_entries[-1][0]
+                response.append([stream, new_entries])
+        if not response and block:
+            await asyncio.sleep(block / 1000)
+        return response
+    
+    async def xack(self, stream: str, group: str, *entry_ids: str) -> int:
+        pending = self.groups[(stream, group)]["pending"]
+        return sum(1 for entry_id in entry_ids if pending.pop(entry_id, None) is not None)
+    
+    async def xpending_range(self, stream: str, group: str, min: str, max: str, count: int, consumername: Optional[str] = None, idle: Optional[int] = None):
+        now = time.time()
+        result = []
+        for entry_id, info in self.groups[(stream, group)]["pending"].items():
+            idle_ms = int((now - info["delivered_at"]) * 1000)
+            if idle is not None and idle_ms < idle:
+                continue
+            result.append({
+                "message_id": entry_id,
+                "consumer": info["consumer"],
+                "time_since_delivered": idle_ms,
+                "times_delivered": info["times_delivered"]
+            })
+        return result[:count]
+    
+    async def xclaim(self, stream: str, group: str, consumer: str, min_idle_time: int, message_ids: List[str]):
+        now = time.time()
+        pending = self.groups[(stream, group)]["pending"]
+        entries = dict(self.streams.get(stream, []))
+        claimed = []
+        for entry_id in message_ids:
+            info = pending.get(entry_id)
+            if not info or (now - info["delivered_at"]) * 1000 < min_idle_time or entry_id not in entries:
+                continue
+            info.update(consumer=consumer, delivered_at=now, times_delivered=info["times_delivered"] + 1)
+            claimed.append((entry_id, entries[entry_id]))
+        return claimed
+    
+    @staticmethod
+    def _stream_id_key(entry_id: str) -> Tuple[int, int]:
+        ms, _, seq = entry_id.partition("-")
+        return int(ms), int(seq or 0)
+    
     async def close(self):
         pass
 
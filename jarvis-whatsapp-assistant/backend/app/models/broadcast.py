@@ -0,0 +1,20 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+class BroadcastRequest(BaseModel):
+    """Template broadcast to every recipient of a file or a Redis set"""
+
+    template_name: str
+    language_code: str = "de"
+    parameters: List[str] = Field(default_factory=list)
+    # One recipient per line, optionally followed by tab-separated per-recipient
+    # parameters that replace `parameters`; relative to BROADCAST_RECIPIENTS_DIR
+    recipients_file: Optional[str] = None
+    recipients_set: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_source(self) -> "BroadcastRequest":
+        if bool(self.recipients_file) == bool(self.recipients_set):
+            raise ValueError("Exactly one of recipients_file or recipients_set is required")
+        return self
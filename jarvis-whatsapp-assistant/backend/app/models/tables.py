@@ -0,0 +1,19 @@
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, MetaData, Table, Text, func
+
+metadata = MetaData()
+
+# Delivery/read status callbacks for outgoing messages
+message_statuses = Table(
+    "message_statuses",
+    metadata,
+    Column("id", BigInteger, primary_key=True, autoincrement=True),
+    Column("message_id", Text, nullable=False),
+    Column("status", Text, nullable=False),
+    Column("recipient_id", Text),
+    Column("phone_number_id", Text),
+    Column("status_at", DateTime(timezone=True), nullable=False),
+    Column("error_code", Integer),
+    Column("received_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Index("ix_message_statuses_message_id", "message_id"),
+    Index("ix_message_statuses_status_at", "status_at"),
+)
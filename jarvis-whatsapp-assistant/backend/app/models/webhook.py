@@ -0,0 +1,136 @@
+import orjson
+from typing import Any, Dict, List, Optional
+
+def _to_int(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+class InboundMessage:
+    """Single incoming WhatsApp message"""
+
+    __slots__ = (
+        "id", "sender_id", "type", "timestamp", "text",
+        "media_id", "caption", "interactive", "phone_number_id"
+    )
+
+    def __init__(
+        self,
+        id: str,
+        sender_id: str,
+        type: str,
+        timestamp: int = 0,
+        text: Optional[str] = None,
+        media_id: Optional[str] = None,
+        caption: Optional[str] = None,
+        interactive: Optional[Dict[str, Any]] = None,
+        phone_number_id: Optional[str] = None
+    ):
+        self.id = id
+        self.sender_id = sender_id
+        self.type = type
+        self.timestamp = timestamp
+        self.text = text
+        self.media_id = media_id
+        self.caption = caption
+        self.interactive = interactive
+        self.phone_number_id = phone_number_id
+
+    @classmethod
+    def from_dict(cls, message: Dict[str, Any], phone_number_id: Optional[str] = None) -> "InboundMessage":
+        message_type = message.get("type", "")
+        content = message.get(message_type)
+        content = content if isinstance(content, dict) else {}
+        return cls(
+            id=message.get("id", ""),
+            sender_id=message.get("from", ""),
+            type=message_type,
+            timestamp=_to_int(message.get("timestamp")),
+            text=content.get("body") if message_type == "text" else None,
+            media_id=content.get("id"),
+            caption=content.get("caption"),
+            interactive=content if message_type == "interactive" else None,
+            phone_number_id=phone_number_id
+        )
+
+    def __repr__(self) -> str:
+        return f"InboundMessage(id={self.id!r}, sender_id={self.sender_id!r}, type={self.type!r})"
+
+class MessageStatus:
+    """Delivery/read status callback for an outgoing message"""
+
+    __slots__ = ("id", "status", "timestamp", "recipient_id", "phone_number_id", "errors")
+
+    def __init__(
+        self,
+        id: str,
+        status: str,
+        timestamp: int = 0,
+        recipient_id: Optional[str] = None,
+        phone_number_id: Optional[str] = None,
+        errors: Optional[List[Dict[str, Any]]] = None
+    ):
+        self.id = id
+        self.status = status
+        self.timestamp = timestamp
+        self.recipient_id = recipient_id
+        self.phone_number_id = phone_number_id
+        self.errors = errors
+
+    @classmethod
+    def from_dict(cls, status: Dict[str, Any], phone_number_id: Optional[str] = None) -> "MessageStatus":
+        return cls(
+            id=status.get("id", ""),
+            status=status.get("status", ""),
+            timestamp=_to_int(status.get("timestamp")),
+            recipient_id=status.get("recipient_id"),
+            phone_number_id=phone_number_id,
+            errors=status.get("errors")
+        )
+
+    def __repr__(self) -> str:
+        return f"MessageStatus(id={self.id!r}, status={self.status!r})"
+
+class WebhookEnvelope:
+    """Flattened view of a WhatsApp webhook payload, built in a single pass"""
+
+    __slots__ = ("messages", "statuses", "unhandled")
+
+    def __init__(self):
+        self.messages: List[InboundMessage] = []
+        self.statuses: List[MessageStatus] = []
+        self.unhandled: List[Dict[str, Any]] = []
+
+    @classmethod
+    def from_bytes(cls, body: bytes) -> "WebhookEnvelope":
+        """Decode a raw webhook body; raises ValueError for invalid JSON"""
+        data = orjson.loads(body)
+        if not isinstance(data, dict):
+            raise ValueError("Webhook payload is not a JSON object")
+        return cls.from_dict(data)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WebhookEnvelope":
+        envelope = cls()
+        for entry in data.get("entry") or []:
+            for change in entry.get("changes") or []:
+                if change.get("field") != "messages":
+                    envelope.unhandled.append(change)
+                    continue
+
+                value = change.get("value") or {}
+                phone_number_id = (value.get("metadata") or {}).get("phone_number_id")
+                messages = value.get("messages")
+                statuses = value.get("statuses")
+
+                if messages:
+                    envelope.messages.extend(InboundMessage.from_dict(message, phone_number_id) for message in messages)
+                if statuses:
+                    envelope.statuses.extend(MessageStatus.from_dict(status, phone_number_id) for status in statuses)
+                if not messages and not statuses:
+                    envelope.unhandled.append(change)
+        return envelope
+
+    def __bool__(self) -> bool:
+        return bool(self.messages or self.statuses or self.unhandled)
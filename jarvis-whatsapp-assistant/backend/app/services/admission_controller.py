@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import ADMISSION_IN_FLIGHT, ADMISSION_SHED, ADMISSION_WAITING
+
+logger = logging.getLogger(__name__)
+
+LOAD_NORMAL = "normal"
+LOAD_DEGRADED = "degraded"
+LOAD_OVERLOADED = "overloaded"
+
+# Set while running inside admit(); tasks started from there inherit it
+_admitted: ContextVar[bool] = ContextVar("admitted", default=False)
+
+class AdmissionRejected(Exception):
+    """Raised when the queue-depth budget is exhausted"""
+
+class AdmissionController:
+    """Concurrency ceiling plus queue-depth budget for inline webhook processing.
+
+    Up to max_concurrency payloads run at once and up to max_queue_depth
+    wait for a slot; anything beyond that is rejected so in-flight work and
+    memory stay bounded when a dependency slows down. Above degrade_ratio
+    of the ceiling the load state turns "degraded", which work admitted
+    here uses to switch to cheaper code paths such as the keyword NLU.
+    Work that did not come through admit() (queue workers, broadcasts) is
+    never degraded: the stream is its back-pressure.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_queue_depth: Optional[int] = None,
+        degrade_ratio: Optional[float] = None
+    ):
+        self.max_concurrency = max_concurrency or settings.ADMISSION_MAX_CONCURRENCY
+        self.max_queue_depth = max_queue_depth if max_queue_depth is not None else settings.ADMISSION_MAX_QUEUE_DEPTH
+        self.degrade_ratio = degrade_ratio or settings.ADMISSION_DEGRADE_RATIO
+        self.in_flight = 0
+        self.waiting = 0
+        self.shed = 0
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @property
+    def state(self) -> str:
+        if self.waiting >= self.max_queue_depth and self.in_flight >= self.max_concurrency:
+            return LOAD_OVERLOADED
+        if self.in_flight + self.waiting >= self.max_concurrency * self.degrade_ratio:
+            return LOAD_DEGRADED
+        return LOAD_NORMAL
+
+    @property
+    def degraded(self) -> bool:
+        """Whether the current task was admitted here and the load is above normal"""
+        return _admitted.get() and self.state != LOAD_NORMAL
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current load state for /health"""
+        return {
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue_depth": self.max_queue_depth,
+            "shed": self.shed
+        }
+
+    def record_shed(self, policy: str):
+        self.shed += 1
+        ADMISSION_SHED.labels(policy=policy).inc()
+
+    @asynccontextmanager
+    async def admit(self):
+        """Hold a processing slot; raises AdmissionRejected when the budget is exceeded"""
+        if self.in_flight >= self.max_concurrency and self.waiting >= self.max_queue_depth:
+            raise AdmissionRejected()
+
+        self.waiting += 1
+        ADMISSION_WAITING.set(self.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+            ADMISSION_WAITING.set(self.waiting)
+
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        token = _admitted.set(True)
+        try:
+            yield
+        finally:
+            _admitted.reset(token)
+            self.in_flight -= 1
+            ADMISSION_IN_FLIGHT.set(self.in_flight)
+            self._semaphore.release()
+
+# Global admission controller instance
+admission_controller = AdmissionController()
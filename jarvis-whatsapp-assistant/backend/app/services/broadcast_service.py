@@ -0,0 +1,282 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import BROADCAST_RECIPIENTS
+from app.core.redis_client import redis_client
+from app.models.broadcast import BroadcastRequest
+from app.services.outbound_scheduler import PRIORITY_BULK, OutboundScheduler, outbound_scheduler
+
+logger = logging.getLogger(__name__)
+
+JOBS_KEY = "broadcast_jobs"
+
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+# Checkpoint value once a Redis set has been scanned completely
+CURSOR_DONE = "done"
+
+Recipient = Tuple[str, List[str]]
+
+class BroadcastService:
+    """Template broadcasts streamed from a recipients file or a Redis set.
+
+    Recipients are read one batch at a time (file byte offset or SSCAN
+    cursor), sent through the outbound scheduler at bulk priority with
+    bounded concurrency, and the batch's results and the new position are
+    checkpointed in Redis. A job interrupted by a restart resumes from its
+    last checkpoint, so at most one batch is sent twice. SSCAN may return
+    a member more than once if the set is resized during the scan.
+    """
+
+    def __init__(
+        self,
+        scheduler: Optional[OutboundScheduler] = None,
+        concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.scheduler = scheduler or outbound_scheduler
+        self.concurrency = concurrency or settings.BROADCAST_CONCURRENCY
+        self.batch_size = batch_size or settings.BROADCAST_BATCH_SIZE
+        self.owner = uuid.uuid4().hex
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    async def create(self, request: BroadcastRequest) -> str:
+        """Register and start a broadcast job, returns its ID"""
+        if request.recipients_file:
+            self.resolve_recipients_file(request.recipients_file)
+
+        job_id = uuid.uuid4().hex
+        now = int(time.time())
+        await redis_client.hset(self._job_key(job_id), {
+            "spec": request.model_dump_json(),
+            "status": STATUS_RUNNING,
+            "cursor": "0",
+            "sent": 0,
+            "failed": 0,
+            "spilled": 0,
+            "created_at": now,
+            "updated_at": now
+        })
+        await redis_client.sadd(JOBS_KEY, job_id)
+        logger.info(f"Created broadcast {job_id} for template {request.template_name}")
+
+        self._spawn(job_id)
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status and counters"""
+        job = await redis_client.hgetall(self._job_key(job_id))
+        if not job:
+            return None
+
+        spec = json.loads(job["spec"])
+        sent = int(job.get("sent", 0))
+        failed = int(job.get("failed", 0))
+        spilled = int(job.get("spilled", 0))
+        return {
+            "job_id": job_id,
+            "status": job.get("status"),
+            "template_name": spec["template_name"],
+            "sent": sent,
+            "failed": failed,
+            "spilled": spilled,
+            "processed": sent + failed + spilled,
+            "error": job.get("error"),
+            "created_at": int(job.get("created_at", 0)),
+            "updated_at": int(job.get("updated_at", 0))
+        }
+
+    async def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Per-recipient results in send order"""
+        entries = await redis_client.lrange(self._results_key(job_id), offset, offset + limit - 1)
+        return [json.loads(entry) for entry in entries]
+
+    async def cancel(self, job_id: str) -> bool:
+        """Stop a running job after its current batch"""
+        job = await redis_client.hgetall(self._job_key(job_id))
+        if job.get("status") != STATUS_RUNNING:
+            return False
+        await redis_client.hset(self._job_key(job_id), {"status": STATUS_CANCELLED, "updated_at": int(time.time())})
+        return True
+
+    async def resume(self):
+        """Restart jobs left running by a previous process (called at startup)"""
+        for job_id in await redis_client.smembers(JOBS_KEY):
+            job = await redis_client.hgetall(self._job_key(job_id))
+            if job.get("status") == STATUS_RUNNING:
+                logger.info(f"Resuming broadcast {job_id} from checkpoint {job.get('cursor')}")
+                self._spawn(job_id)
+
+    async def stop(self):
+        """Interrupt running jobs; they stay 'running' and resume on next start"""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.tasks.clear()
+
+    @staticmethod
+    def resolve_recipients_file(name: str) -> Path:
+        """Resolve a recipients file inside BROADCAST_RECIPIENTS_DIR"""
+        base = Path(settings.BROADCAST_RECIPIENTS_DIR).resolve()
+        path = (base / name).resolve()
+        if base not in path.parents:
+            raise ValueError("Recipients file must be inside the broadcast directory")
+        if not path.is_file():
+            raise ValueError(f"Recipients file not found: {name}")
+        return path
+
+    def _spawn(self, job_id: str):
+        task = self.tasks.get(job_id)
+        if task and not task.done():
+            return
+        task = asyncio.create_task(self._run(job_id))
+        self.tasks[job_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str):
+        job_key = self._job_key(job_id)
+        lock_key = f"broadcast:{job_id}:lock"
+        if await redis_client.set_nx(lock_key, self.owner, settings.BROADCAST_LOCK_TTL_SECONDS) is False:
+            logger.info(f"Broadcast {job_id} is running on another replica")
+            return
+
+        try:
+            job = await redis_client.hgetall(job_key)
+            request = BroadcastRequest.model_validate_json(job["spec"])
+
+            async for cursor, batch in self._batches(request, job.get("cursor", "0")):
+                job = await redis_client.hgetall(job_key)
+                if job.get("status") != STATUS_RUNNING:
+                    logger.info(f"Broadcast {job_id} stopped: {job.get('status')}")
+                    return
+
+                results = await self._send_batch(request, batch)
+                await self._checkpoint(job_id, cursor, results)
+                await redis_client.extend_lock(lock_key, self.owner, settings.BROADCAST_LOCK_TTL_SECONDS)
+
+            await redis_client.hset(job_key, {"status": STATUS_COMPLETED, "updated_at": int(time.time())})
+            logger.info(f"Broadcast {job_id} completed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {job_id} failed: {e}")
+            await redis_client.hset(job_key, {
+                "status": STATUS_FAILED,
+                "error": str(e),
+                "updated_at": int(time.time())
+            })
+        finally:
+            await redis_client.release_lock(lock_key, self.owner)
+
+    async def _batches(self, request: BroadcastRequest, cursor: str) -> AsyncIterator[Tuple[str, List[Recipient]]]:
+        """Yield (checkpoint after this batch, recipients) from the job's source"""
+        if request.recipients_file:
+            async for item in self._file_batches(request, int(cursor)):
+                yield item
+        else:
+            async for item in self._set_batches(request, cursor):
+                yield item
+
+    async def _file_batches(self, request: BroadcastRequest, offset: int) -> AsyncIterator[Tuple[str, List[Recipient]]]:
+        # File I/O runs in a thread so a slow disk does not stall the event loop
+        path = self.resolve_recipients_file(request.recipients_file)
+        recipients = await asyncio.to_thread(open, path, "rb")
+        try:
+            await asyncio.to_thread(recipients.seek, offset)
+            while True:
+                batch, position = await asyncio.to_thread(self._read_batch, recipients, request)
+                if not batch:
+                    return
+                yield str(position), batch
+        finally:
+            await asyncio.to_thread(recipients.close)
+
+    def _read_batch(self, recipients, request: BroadcastRequest) -> Tuple[List[Recipient], int]:
+        """Up to batch_size recipients from the file's current position, and the position after them"""
+        batch = []
+        while len(batch) < self.batch_size:
+            line = recipients.readline()
+            if not line:
+                break
+            fields = line.decode("utf-8").strip().split("\t")
+            if not fields[0] or fields[0].startswith("#"):
+                continue
+            batch.append((fields[0].strip(), fields[1:] or request.parameters))
+        return batch, recipients.tell()
+
+    async def _set_batches(self, request: BroadcastRequest, cursor: str) -> AsyncIterator[Tuple[str, List[Recipient]]]:
+        if cursor == CURSOR_DONE:
+            return
+
+        position = int(cursor)
+        while True:
+            scanned = await redis_client.sscan(request.recipients_set, position, self.batch_size)
+            if scanned is None:
+                raise RuntimeError("Redis unavailable while scanning recipients")
+            position, members = scanned
+            batch = [(member, request.parameters) for member in members]
+            yield (str(position) if position else CURSOR_DONE), batch
+            if not position:
+                return
+
+    async def _send_batch(self, request: BroadcastRequest, batch: List[Recipient]) -> List[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(to: str, parameters: List[str]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    response = await self.scheduler.send_template_message(
+                        to,
+                        request.template_name,
+                        request.language_code,
+                        parameters,
+                        priority=PRIORITY_BULK
+                    )
+                except Exception as e:
+                    BROADCAST_RECIPIENTS.labels(result="failed").inc()
+                    return {"to": to, "status": "failed", "error": str(e)}
+
+            if response.get("spilled"):
+                # Parked by the outbound scheduler while the Cloud API is down
+                BROADCAST_RECIPIENTS.labels(result="spilled").inc()
+                return {"to": to, "status": "spilled"}
+
+            BROADCAST_RECIPIENTS.labels(result="sent").inc()
+            message_id = (response.get("messages") or [{}])[0].get("id")
+            return {"to": to, "status": "sent", "message_id": message_id}
+
+        return await asyncio.gather(*(send(to, parameters) for to, parameters in batch))
+
+    async def _checkpoint(self, job_id: str, cursor: str, results: List[Dict[str, Any]]):
+        results_key = self._results_key(job_id)
+        if results:
+            await redis_client.rpush(results_key, *(json.dumps(result, ensure_ascii=False) for result in results))
+            await redis_client.expire(results_key, settings.BROADCAST_RESULTS_TTL_SECONDS)
+
+        job_key = self._job_key(job_id)
+        for status in ("sent", "failed", "spilled"):
+            count = sum(1 for result in results if result["status"] == status)
+            if count:
+                await redis_client.hincrby(job_key, status, count)
+        await redis_client.hset(job_key, {"cursor": cursor, "updated_at": int(time.time())})
+
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        return f"broadcast:{job_id}"
+
+    @staticmethod
+    def _results_key(job_id: str) -> str:
+        return f"broadcast:{job_id}:results"
+
+# Global broadcast service instance
+broadcast_service = BroadcastService()
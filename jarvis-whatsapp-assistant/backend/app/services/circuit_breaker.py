@@ -0,0 +1,126 @@
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from app.core.metrics import BREAKER_STATE, BREAKER_TRANSITIONS
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_HALF_OPEN = "half_open"
+STATE_OPEN = "open"
+
+STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency while its breaker is open"""
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker over a rolling window of recent calls.
+
+    Errors and calls slower than slow_call_seconds count as failures. Once
+    at least min_calls are in the window and the failure ratio reaches
+    failure_ratio the breaker opens and callers fail fast. After
+    open_seconds it turns half-open and lets a few probe calls through;
+    success_threshold successful probes close it again, any failed probe
+    reopens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 10,
+        failure_ratio: float = 0.5,
+        slow_call_seconds: Optional[float] = None,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1,
+        success_threshold: int = 2
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.success_threshold = success_threshold
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.listeners: List[Callable[[str], None]] = []
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        BREAKER_STATE.labels(breaker=name).set(STATE_VALUES[STATE_CLOSED])
+
+    @property
+    def state(self) -> str:
+        if self._state == STATE_OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(STATE_HALF_OPEN)
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in half-open state this takes a probe slot"""
+        state = self.state
+        if state == STATE_CLOSED:
+            return True
+        if state == STATE_HALF_OPEN and self._probes < self.half_open_probes:
+            self._probes += 1
+            return True
+        return False
+
+    def record(self, success: Optional[bool], elapsed: Optional[float] = None):
+        """Record a call outcome; None releases the slot without counting (e.g. cancelled)"""
+        if self._state == STATE_HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+        if success is None:
+            return
+        if success and self.slow_call_seconds and elapsed is not None and elapsed > self.slow_call_seconds:
+            success = False
+
+        if self._state == STATE_HALF_OPEN:
+            if not success:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.success_threshold:
+                self._transition(STATE_CLOSED)
+            return
+
+        if self._state == STATE_OPEN:
+            return
+
+        self.outcomes.append(success)
+        if len(self.outcomes) >= self.min_calls:
+            failures = self.outcomes.count(False)
+            if failures / len(self.outcomes) >= self.failure_ratio:
+                self._open()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Breaker state for /health"""
+        return {
+            "state": self.state,
+            "window_calls": len(self.outcomes),
+            "window_failures": self.outcomes.count(False)
+        }
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._transition(STATE_OPEN)
+
+    def _transition(self, state: str):
+        if state == self._state and state != STATE_OPEN:
+            return
+        logger.warning(f"Circuit breaker {self.name}: {self._state} -> {state}")
+        self._state = state
+        self._probes = 0
+        self._probe_successes = 0
+        if state == STATE_CLOSED:
+            self.outcomes.clear()
+        BREAKER_STATE.labels(breaker=self.name).set(STATE_VALUES[state])
+        BREAKER_TRANSITIONS.labels(breaker=self.name, state=state).inc()
+        for listener in self.listeners:
+            try:
+                listener(state)
+            except Exception as e:
+                logger.error(f"Circuit breaker listener error: {e}")
@@ -4,6 +4,7 @@ from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 import uuid
 from app.core.config import settings
+from app.services.keyword_matcher import keyword_matcher
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +22,7 @@ class ECommerceService:
                 "price": 29.99,
                 "description": "12 frische rote Rosen mit grünem Beiwerk",
                 "category": "rosen",
-                "keywords": ["rote rosen", "rosen", "rot"],
+                "keywords": ["rote rosen", "rosen", "rot*"],
                 "image_url": "https://example.com/red-roses.jpg",
                 "available": True
             },
@@ -31,7 +32,7 @@ class ECommerceService:
                 "price": 32.99,
                 "description": "12 elegante weiße Rosen",
                 "category": "rosen",
-                "keywords": ["weiße rosen", "rosen", "weiß"],
+                "keywords": ["weiße rosen", "rosen", "weiß*"],
                 "image_url": "https://example.com/white-roses.jpg",
                 "available": True
             },
@@ -66,10 +67,18 @@ class ECommerceService:
                 "available": True
             }
         ]
+        keyword_matcher.register({
+            f"product:{product['id']}": product["keywords"] for product in self.product_catalog
+        })
     
     async def search_products(self, query: str, category: Optional[str] = None) -> List[Dict[str, Any]]:
         """Search for products based on query"""
-        query_lower = query.lower() if query else ""
+        # Relevance: total length of the product's keywords found in the query
+        scores: Dict[str, int] = {}
+        if query:
+            for product_category, keyword in {(match.category, match.keyword) for match in keyword_matcher.find(query, "product:")}:
+                product_id = product_category[len("product:"):]
+                scores[product_id] = scores.get(product_id, 0) + len(keyword)
         results = []
         
         for product in self.product_catalog:
@@ -81,23 +90,15 @@ class ECommerceService:
                 continue
             
             # Check keyword match
-            if query_lower:
-                matches = any(keyword in query_lower for keyword in product["keywords"])
-                if matches:
+            if query:
+                if product["id"] in scores:
                     results.append(product)
             else:
                 results.append(product)
         
-        # Sort by relevance (simple scoring)
-        if query_lower:
-            def score_product(product):
-                score = 0
-                for keyword in product["keywords"]:
-                    if keyword in query_lower:
-                        score += len(keyword)
-                return score
-            
-            results.sort(key=score_product, reverse=True)
+        # Sort by relevance
+        if query:
+            results.sort(key=lambda product: scores[product["id"]], reverse=True)
         
         return results
     
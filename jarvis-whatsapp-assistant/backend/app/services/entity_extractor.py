@@ -0,0 +1,192 @@
+import logging
+import re
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMAT = "%d.%m.%Y"
+
+UNITS = {
+    "ein": 1, "eins": 1, "eine": 1, "einen": 1, "einem": 1, "einer": 1,
+    "zwei": 2, "drei": 3, "vier": 4, "fünf": 5, "sechs": 6, "sieben": 7, "acht": 8, "neun": 9
+}
+TEENS = {
+    "zehn": 10, "elf": 11, "zwölf": 12, "dreizehn": 13, "vierzehn": 14, "fünfzehn": 15,
+    "sechzehn": 16, "siebzehn": 17, "achtzehn": 18, "neunzehn": 19
+}
+TENS = {
+    "zwanzig": 20, "dreißig": 30, "vierzig": 40, "fünfzig": 50,
+    "sechzig": 60, "siebzig": 70, "achtzig": 80, "neunzig": 90
+}
+
+MONTHS = {
+    "januar": 1, "jan": 1, "februar": 2, "feb": 2, "märz": 3, "maerz": 3, "mär": 3,
+    "april": 4, "apr": 4, "mai": 5, "juni": 6, "jun": 6, "juli": 7, "jul": 7,
+    "august": 8, "aug": 8, "september": 9, "sep": 9, "sept": 9, "oktober": 10, "okt": 10,
+    "november": 11, "nov": 11, "dezember": 12, "dez": 12
+}
+
+WEEKDAYS = {
+    "montag": 0, "dienstag": 1, "mittwoch": 2, "donnerstag": 3,
+    "freitag": 4, "samstag": 5, "sonnabend": 5, "sonntag": 6
+}
+
+RELATIVE_DAYS = {"heute": 0, "morgen": 1, "übermorgen": 2}
+
+# Nouns a quantity can count ("zwölf rote Rosen", "3 Stück", "einen Strauß")
+COUNTED_STEMS = ("rose", "tulpe", "sonnenblume", "blume", "lilie", "nelke", "stück", "stiel", "strauß", "sträuß")
+
+STREET_SUFFIXES = "straße|strasse|str\\.|weg|allee|platz|gasse|ring|damm|ufer|chaussee|pfad|steig"
+
+_WORD = re.compile(r"[0-9]+|[a-zäöüß]+")
+_NUMERIC_DATE = re.compile(r"(?<![\d.])(\d{1,2})\.(\d{1,2})\.(\d{4}|\d{2})?(?![\d])")
+_MONTH_DATE = re.compile(
+    r"(?<!\d)(\d{1,2})\.?\s*(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\b\.?(?:\s+(\d{4}))?"
+)
+_IN_DAYS = re.compile(r"\bin\s+([0-9]+|[a-zäöüß]+)\s+(tag|tagen|woche|wochen)\b")
+_WEEKDAY = re.compile(r"\b(" + "|".join(WEEKDAYS) + r")\b")
+_RELATIVE = re.compile(r"(?<!guten )\b(übermorgen|morgen|heute)\b")
+_ADDRESS = re.compile(
+    # "Hauptstraße 5", "Karl-Marx-Allee 12a", "Berliner Str. 3", "Am Ring 7" ...
+    r"(?P<street>\b(?:[\w-]{2,}(?i:" + STREET_SUFFIXES + r")|[A-ZÄÖÜ][\w-]+\s(?i:" + STREET_SUFFIXES + r")))"
+    r"\s*(?P<number>\d{1,4}\s?[a-zA-Z]?(?:\s?-\s?\d{1,4})?)\b"
+    # ... optionally followed by "10115 Berlin" or "60311 Frankfurt am Main"
+    r"(?:\s*,?\s*(?P<postcode>\d{5})\s+(?P<city>[^\W\d][\w-]+(?:\s(?:am|an\sder|im)\s[A-ZÄÖÜ][\w-]+)?))?"
+)
+
+def parse_number_word(word: str) -> Optional[int]:
+    """German number word (or digits) up to 999, e.g. "zweiundzwanzig" -> 22; None if not a number"""
+    word = word.lower()
+    if word.isdigit():
+        return int(word)
+
+    value = 0
+    if "hundert" in word:
+        hundreds, _, word = word.partition("hundert")
+        if hundreds and UNITS.get(hundreds) is None:
+            return None
+        value = 100 * UNITS.get(hundreds, 1)
+        if not word:
+            return value
+        if word.startswith("und"):
+            word = word[3:]
+
+    if word in UNITS:
+        return value + UNITS[word]
+    if word in TEENS:
+        return value + TEENS[word]
+    if word in TENS:
+        return value + TENS[word]
+    unit, separator, tens = word.partition("und")
+    if separator and unit in UNITS and tens in TENS:
+        return value + UNITS[unit] + TENS[tens]
+    return None
+
+class EntityExtractor:
+    """Rule-based extraction of the flower order slots from German text.
+
+    Reads delivery dates (relative like "übermorgen" or "in drei Tagen",
+    weekdays, and absolute like "am 14.2." or "14. Februar"), street
+    addresses with optional postcode and city, and quantities given as
+    digits or number words. Slots it cannot read are left out, so callers
+    only need the LLM when nothing was found.
+    """
+
+    def extract(self, text: str, today: Optional[date] = None) -> Dict[str, Any]:
+        """The slots found in text: delivery_date (dd.mm.yyyy), delivery_address, quantity"""
+        slots: Dict[str, Any] = {}
+        delivery_date = self.extract_date(text, today)
+        if delivery_date:
+            slots["delivery_date"] = delivery_date.strftime(DATE_FORMAT)
+        address = self.extract_address(text)
+        if address:
+            slots["delivery_address"] = address
+        quantity = self.extract_quantity(text)
+        if quantity:
+            slots["quantity"] = quantity
+        return slots
+
+    def extract_date(self, text: str, today: Optional[date] = None) -> Optional[date]:
+        today = today or date.today()
+        lowered = text.lower()
+
+        # Absolute dates win over relative words in the same message
+        for match in _NUMERIC_DATE.finditer(lowered):
+            day, month, year = match.groups()
+            resolved = self._resolve(today, int(day), int(month), year)
+            if resolved:
+                return resolved
+        for match in _MONTH_DATE.finditer(lowered):
+            day, month, year = match.groups()
+            resolved = self._resolve(today, int(day), MONTHS[month], year)
+            if resolved:
+                return resolved
+
+        match = _IN_DAYS.search(lowered)
+        if match:
+            count = parse_number_word(match.group(1))
+            if count is not None:
+                days = count * 7 if match.group(2).startswith("woche") else count
+                return today + timedelta(days=days)
+
+        match = _WEEKDAY.search(lowered)
+        if match:
+            # The next such weekday, a week ahead if it is today
+            ahead = (WEEKDAYS[match.group(1)] - today.weekday()) % 7 or 7
+            return today + timedelta(days=ahead)
+
+        match = _RELATIVE.search(lowered)
+        if match:
+            return today + timedelta(days=RELATIVE_DAYS[match.group(1)])
+        return None
+
+    def extract_address(self, text: str) -> Optional[str]:
+        match = _ADDRESS.search(text)
+        if not match:
+            return None
+        number = re.sub(r"\s+", "", match.group("number"))
+        address = f"{match.group('street')} {number}"
+        if match.group("postcode"):
+            address += f", {match.group('postcode')} {match.group('city')}"
+        return address
+
+    def extract_quantity(self, text: str) -> Optional[int]:
+        words = _WORD.findall(text.lower())
+        for index, word in enumerate(words):
+            count = parse_number_word(word)
+            if not count:
+                continue
+            following = words[index + 1:index + 4]
+            if following and following[0] == "dutzend":
+                # "ein Dutzend" counts on its own
+                return count * 12
+            if self._counts_item(following):
+                return count
+        return None
+
+    @staticmethod
+    def _counts_item(following: List[str]) -> bool:
+        """A counted noun follows, directly or after one adjective ("rote", "langstielige")"""
+        for position, word in enumerate(following[:2]):
+            if word.startswith(COUNTED_STEMS):
+                return True
+            if position == 0 and (word == "paar" or parse_number_word(word) is not None):
+                return False
+        return False
+
+    @staticmethod
+    def _resolve(today: date, day: int, month: int, year: Optional[str]) -> Optional[date]:
+        """The date, in the coming year if no year is given and it has passed this year"""
+        try:
+            if year:
+                return date(int(year) + (2000 if len(year) == 2 else 0), month, day)
+            resolved = date(today.year, month, day)
+            if resolved < today:
+                resolved = date(today.year + 1, month, day)
+            return resolved
+        except ValueError:
+            return None
+
+# Global entity extractor instance
+entity_extractor = EntityExtractor()
@@ -0,0 +1,157 @@
+import logging
+import time
+from collections import Counter as TermCounter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import NLU_CLASSIFIER_SECONDS, NLU_CLASSIFIER_THRESHOLD
+from app.services.nlu_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent.parent / "data" / "intent_corpus_de.tsv"
+
+def char_ngrams(text: str, min_n: int = 2, max_n: int = 4) -> List[str]:
+    """Character n-grams of each word, padded with spaces at the word boundaries"""
+    grams = []
+    for word in normalize_text(text).split():
+        padded = f" {word} "
+        for n in range(min_n, max_n + 1):
+            if n > len(padded):
+                break
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+def load_corpus(path: Path) -> Tuple[List[str], List[str]]:
+    """Read `<intent>\\t<message>` lines, skipping blanks and # comments"""
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as corpus:
+        for line in corpus:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            intent, text = line.split("\t", 1)
+            labels.append(intent.strip())
+            texts.append(text.strip())
+    return texts, labels
+
+class IntentClassifier:
+    """Character n-gram TF-IDF features with a softmax regression on top.
+
+    Trained in NumPy from a small labelled corpus when first used (well
+    under a second). Prediction only touches the weight rows of the
+    message's n-grams, so it takes microseconds and never leaves the
+    process.
+    """
+
+    def __init__(self, epochs: int = 300, learning_rate: float = 2.0, l2: float = 1e-4):
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.vocabulary: Dict[str, int] = {}
+        self.idf: Optional[np.ndarray] = None
+        self.weights: Optional[np.ndarray] = None
+        self.bias: Optional[np.ndarray] = None
+        self.intents: List[str] = []
+
+    @property
+    def trained(self) -> bool:
+        return self.weights is not None
+
+    def fit(self, texts: List[str], labels: List[str]) -> "IntentClassifier":
+        """Build the vocabulary and IDF weights and train the model"""
+        documents = [TermCounter(char_ngrams(text)) for text in texts]
+        vocabulary: Dict[str, int] = {}
+        for document in documents:
+            for gram in document:
+                vocabulary.setdefault(gram, len(vocabulary))
+
+        document_frequency = np.zeros(len(vocabulary))
+        for document in documents:
+            document_frequency[[vocabulary[gram] for gram in document]] += 1
+        self.vocabulary = vocabulary
+        self.idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+
+        features = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+        for row, document in enumerate(documents):
+            indices, values = self._weigh(document)
+            features[row, indices] = values
+
+        self.intents = sorted(set(labels))
+        targets = np.zeros((len(labels), len(self.intents)), dtype=np.float32)
+        targets[np.arange(len(labels)), [self.intents.index(label) for label in labels]] = 1
+
+        weights = np.zeros((len(vocabulary), len(self.intents)), dtype=np.float32)
+        bias = np.zeros(len(self.intents), dtype=np.float32)
+        for _ in range(self.epochs):
+            gradient = (self._softmax(features @ weights + bias) - targets) / len(labels)
+            weights -= self.learning_rate * (features.T @ gradient + self.l2 * weights)
+            bias -= self.learning_rate * gradient.sum(axis=0)
+
+        self.weights = weights
+        self.bias = bias
+        return self
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Most likely intent and its probability; confidence 0.0 for unknown text"""
+        start = time.perf_counter()
+        indices, values = self._weigh(TermCounter(char_ngrams(text)))
+        if not len(indices):
+            return self.intents[0], 0.0
+
+        probabilities = self._softmax(values @ self.weights[indices] + self.bias)
+        best = int(np.argmax(probabilities))
+        NLU_CLASSIFIER_SECONDS.observe(time.perf_counter() - start)
+        return self.intents[best], float(probabilities[best])
+
+    def _weigh(self, grams: TermCounter) -> Tuple[np.ndarray, np.ndarray]:
+        """Sublinear TF-IDF of known n-grams, L2 normalized"""
+        known = [(self.vocabulary[gram], count) for gram, count in grams.items() if gram in self.vocabulary]
+        if not known:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        indices = np.fromiter((index for index, _ in known), dtype=np.int64, count=len(known))
+        counts = np.fromiter((count for _, count in known), dtype=np.float32, count=len(known))
+        values = (1 + np.log(counts)) * self.idf[indices]
+        return indices, (values / np.linalg.norm(values)).astype(np.float32)
+
+    @staticmethod
+    def _softmax(scores: np.ndarray) -> np.ndarray:
+        exp = np.exp(scores - scores.max(axis=-1, keepdims=True))
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+class LocalIntentRouter:
+    """Lazily trained classifier plus the confidence threshold for answering locally"""
+
+    def __init__(self, corpus_path: Optional[str] = None, threshold: Optional[float] = None):
+        self.corpus_path = Path(corpus_path or settings.NLU_CLASSIFIER_CORPUS or DEFAULT_CORPUS)
+        self.threshold = threshold if threshold is not None else settings.NLU_CLASSIFIER_THRESHOLD
+        self.classifier: Optional[IntentClassifier] = None
+        NLU_CLASSIFIER_THRESHOLD.set(self.threshold)
+
+    @property
+    def enabled(self) -> bool:
+        return settings.NLU_CLASSIFIER_ENABLED
+
+    def load(self) -> IntentClassifier:
+        """Train the classifier from the corpus (once)"""
+        if self.classifier is None:
+            start = time.perf_counter()
+            texts, labels = load_corpus(self.corpus_path)
+            self.classifier = IntentClassifier().fit(texts, labels)
+            logger.info(
+                f"Trained intent classifier on {len(texts)} examples "
+                f"({len(self.classifier.vocabulary)} n-grams) in {time.perf_counter() - start:.2f}s"
+            )
+        return self.classifier
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        return self.load().predict(text)
+
+    def is_confident(self, confidence: float) -> bool:
+        return confidence >= self.threshold
+
+# Global intent router instance
+intent_router = LocalIntentRouter()
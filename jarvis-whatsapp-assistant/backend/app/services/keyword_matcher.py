@@ -0,0 +1,142 @@
+import logging
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Keyword tables of the rule-based text checks, as "<namespace>:<name>" ->
+# keywords. Keywords match whole words (or phrases); a trailing "*" makes a
+# stem that matches any word starting with it ("bestell*" -> "Bestellung").
+KEYWORDS: Dict[str, List[str]] = {
+    # NLUEngine._mock_analyze and MessageProcessor.generate_simple_response
+    "intent:greeting": ["hallo", "hi", "hey", "guten tag", "guten morgen", "guten abend", "moin"],
+    "intent:order_flowers": ["blumen*", "rose*", "tulpe*", "sonnenblume*", "bestell*", "order*"],
+    "intent:help": ["hilfe", "help", "was kannst du", "funktionen"],
+    "intent:status": ["status", "wie geht", "entwicklung"],
+    # NLUEngine._slot_guards: other requests while an order is being collected
+    "intent:get_weather": ["wetter*", "regen*", "regnet", "schnee*", "schneit", "temperatur*"],
+    "intent:schedule_meeting": ["termin*", "meeting*", "besprechung*"],
+    "intent:send_email": ["mail*", "email*"],
+    # NLUEngine._slot_guards: negations, cancellations and corrections
+    "guard:negation": ["nicht", "nichts", "kein*", "nein", "vergiss*", "abbrechen", "abbruch", "storn*", "cancel"],
+    "guard:correction": ["lieber", "eher", "sondern", "stattdessen", "doch", "anders"],
+    # NLUEngine._extract_recipient
+    "recipient:Freundin": ["freundin"],
+    "recipient:Freund": ["freund"],
+    "recipient:Mutter": ["mutter", "mama"],
+    "recipient:Vater": ["vater", "papa"],
+    # NLUEngine._extract_flower_type
+    "flower:rosen": ["rose", "rosen"],
+    "flower:tulpen": ["tulpe", "tulpen"],
+    "flower:sonnenblumen": ["sonnenblume", "sonnenblumen"],
+    "color:rot": ["rot*"],
+    "color:weiß": ["weiß*", "weiss*"],
+    # TaskExecutor.handle_confirmation
+    "confirm:yes": ["ja", "yes", "ok", "okay", "bestellen", "bestätig*"],
+    "confirm:no": ["nein", "no", "abbrechen", "cancel"],
+    # SpeechService.detect_language
+    "language:de": ["der", "die", "das", "und", "ist", "ich", "du", "er", "sie", "es", "wir", "ihr"],
+    "language:en": ["the", "and", "is", "i", "you", "he", "she", "it", "we", "they", "are"]
+}
+
+class KeywordMatch(NamedTuple):
+    category: str
+    keyword: str
+    start: int
+    end: int
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over all registered keyword tables.
+
+    One pass over the lowercased text reports every keyword hit with its
+    category, so callers no longer run one substring scan per keyword.
+    Hits must start and end on word boundaries ("hi" does not match
+    "nicht"), except that stems may end inside a word.
+    """
+
+    def __init__(self, tables: Dict[str, Iterable[str]] = None):
+        self.tables: Dict[str, Set[str]] = {}
+        self._goto: List[Dict[str, int]] = []
+        self._outputs: List[List[Tuple[str, str, int, bool]]] = []
+        self._built = False
+        if tables:
+            self.register(tables)
+
+    def register(self, tables: Dict[str, Iterable[str]]):
+        """Add keyword tables; the automaton is rebuilt on the next match"""
+        for category, keywords in tables.items():
+            self.tables.setdefault(category, set()).update(keyword.lower() for keyword in keywords)
+        self._built = False
+
+    def build(self):
+        """Compile the trie with failure links"""
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[Tuple[str, str, int, bool]]] = [[]]
+        for category, keywords in self.tables.items():
+            for keyword in keywords:
+                stem = keyword.endswith("*")
+                word = keyword.rstrip("*")
+                state = 0
+                for char in word:
+                    if char not in goto[state]:
+                        goto.append({})
+                        outputs.append([])
+                        goto[state][char] = len(goto) - 1
+                    state = goto[state][char]
+                outputs[state].append((category, word, len(word), stem))
+
+        fail = [0] * len(goto)
+        order = []
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            order.append(state)
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+
+        # Fold the failure links into the transitions (in BFS order, so the
+        # failure state is already complete): one dict lookup per character
+        for state in order:
+            for char, target in goto[fail[state]].items():
+                goto[state].setdefault(char, target)
+        self._goto = goto
+        self._outputs = outputs
+        self._built = True
+        logger.debug(f"Keyword matcher compiled: {sum(map(len, self.tables.values()))} keywords, {len(goto)} states")
+
+    def find(self, text: str, namespace: str = "") -> List[KeywordMatch]:
+        """All keyword hits in order of their end position, optionally only one namespace"""
+        if not self._built:
+            self.build()
+
+        lowered = text.lower()
+        goto, outputs = self._goto, self._outputs
+        matches = []
+        state = 0
+        for end, char in enumerate(lowered, 1):
+            state = goto[state].get(char, 0)
+            for category, keyword, length, stem in outputs[state]:
+                if namespace and not category.startswith(namespace):
+                    continue
+                start = end - length
+                if start > 0 and _is_word_char(lowered[start - 1]):
+                    continue
+                if not stem and end < len(lowered) and _is_word_char(lowered[end]):
+                    continue
+                matches.append(KeywordMatch(category, keyword, start, end))
+        return matches
+
+    def categories(self, text: str, namespace: str = "") -> Set[str]:
+        """Names of the categories with at least one hit, namespace prefix removed"""
+        return {match.category[len(namespace):] for match in self.find(text, namespace)}
+
+# Global keyword matcher instance
+keyword_matcher = KeywordMatcher(KEYWORDS)
@@ -0,0 +1,289 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import NLU_GOVERNOR_THROTTLED, NLU_GOVERNOR_WAIT_SECONDS, NLU_GOVERNOR_WAITING
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Lower value goes first
+PRIORITY_FLOW = 0  # turns inside a multi-step flow (order details, confirmations)
+PRIORITY_CHAT = 1  # everything else
+
+PRIORITY_NAMES = {PRIORITY_FLOW: "flow", PRIORITY_CHAT: "chat"}
+
+# Why an acquisition has to wait
+REASON_NONE = 0
+REASON_CONCURRENCY = 1
+REASON_RPM = 2
+REASON_TPM = 3
+
+REASON_NAMES = {REASON_CONCURRENCY: "concurrency", REASON_RPM: "rpm", REASON_TPM: "tpm"}
+
+# Expire stale leases, refill the request and token buckets, then take one
+# request, `cost` tokens and a lease if all three budgets allow it.
+# Returns {wait_ms, reason}; wait_ms is -1 when waiting for a lease.
+ACQUIRE_SCRIPT = """
+-- llm_governor_acquire
+local max_concurrency = tonumber(ARGV[2])
+local rpm = tonumber(ARGV[3])
+local tpm = tonumber(ARGV[4])
+local cost = tonumber(ARGV[5])
+local burst = tonumber(ARGV[6])
+local lease_ms = tonumber(ARGV[7])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local request_capacity = math.max(1, rpm * burst / 60)
+local token_capacity = math.max(1, tpm * burst / 60)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens', 'ts')
+local requests = tonumber(state[1]) or request_capacity
+local tokens = tonumber(state[2]) or token_capacity
+local elapsed = math.max(0, now - (tonumber(state[3]) or now))
+requests = math.min(request_capacity, requests + elapsed * rpm / 60000)
+tokens = math.min(token_capacity, tokens + elapsed * tpm / 60000)
+local needed = math.min(cost, token_capacity)
+local wait = 0
+local reason = 0
+if redis.call('ZCARD', KEYS[2]) >= max_concurrency then
+    wait = -1
+    reason = 1
+elseif requests < 1 then
+    wait = math.ceil((1 - requests) * 60000 / rpm)
+    reason = 2
+elseif tokens < needed then
+    wait = math.ceil((needed - tokens) * 60000 / tpm)
+    reason = 3
+else
+    requests = requests - 1
+    tokens = tokens - cost
+    redis.call('ZADD', KEYS[2], now + lease_ms, ARGV[1])
+    redis.call('PEXPIRE', KEYS[2], lease_ms * 2)
+end
+redis.call('HSET', KEYS[1], 'requests', tostring(requests), 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000) + 60000)
+return {wait, reason}
+"""
+
+# Drop the lease and refund (or charge) the difference between the estimated
+# and the actual token cost
+RELEASE_SCRIPT = """
+-- llm_governor_release
+redis.call('ZREM', KEYS[2], ARGV[1])
+local refund = tonumber(ARGV[2])
+if refund ~= 0 and redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HINCRBYFLOAT', KEYS[1], 'tokens', refund)
+end
+return 1
+"""
+
+class LLMLease:
+    """One granted LLM call"""
+
+    __slots__ = ("model", "lease_id", "estimated_tokens", "prompt_tokens", "completion_tokens", "local")
+
+    def __init__(self, model: str, lease_id: str, prompt_tokens: int, estimated_tokens: int):
+        self.model = model
+        self.lease_id = lease_id
+        self.prompt_tokens = prompt_tokens
+        self.estimated_tokens = estimated_tokens
+        self.completion_tokens: Optional[int] = None
+        self.local = False
+
+class LLMGovernor:
+    """Cluster-wide concurrency, requests-per-minute and tokens-per-minute budgets per model.
+
+    Budgets live in Redis (a lease sorted set and a refilling bucket hash
+    per model, updated by Lua scripts) so all replicas share them. Each
+    call reserves its prompt tokens plus the expected completion up front
+    and settles the difference on release, so the token budget drains
+    smoothly instead of running into the provider's limit. Local callers
+    wait in a priority queue per model; only the head of the queue polls
+    Redis. While Redis is unavailable each replica enforces its share
+    (1/NLU_GOVERNOR_REPLICAS) of the budgets in process.
+    """
+
+    REDIS_RETRY_SECONDS = 30.0
+    COMPLETION_SMOOTHING = 0.1
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None
+    ):
+        self.max_concurrency = max_concurrency or settings.NLU_GOVERNOR_MAX_CONCURRENCY
+        self.rpm = rpm or settings.NLU_GOVERNOR_RPM
+        self.tpm = tpm or settings.NLU_GOVERNOR_TPM
+        self.expected_completion_tokens = float(settings.NLU_GOVERNOR_COMPLETION_TOKENS)
+        self.waiting: Dict[str, List[Tuple[int, int]]] = {}
+        self._sequence = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._redis_retry_at = 0.0
+        # In-process fallback: model -> lease expiries, model -> (requests, tokens, updated)
+        self._local_leases: Dict[str, Dict[str, float]] = {}
+        self._local_buckets: Dict[str, Tuple[float, float, float]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.NLU_GOVERNOR_ENABLED
+
+    def estimate(self, prompt_tokens: int) -> int:
+        """Expected total tokens of a call: prompt plus the recent average completion"""
+        return prompt_tokens + int(round(self.expected_completion_tokens))
+
+    @asynccontextmanager
+    async def slot(self, model: str, prompt_tokens: int, priority: int = PRIORITY_CHAT) -> AsyncIterator[LLMLease]:
+        """Wait for budget, hold a lease for the call; set lease.completion_tokens before leaving"""
+        lease = await self.acquire(model, prompt_tokens, priority)
+        try:
+            yield lease
+        finally:
+            await self.release(lease)
+
+    async def acquire(self, model: str, prompt_tokens: int, priority: int = PRIORITY_CHAT) -> LLMLease:
+        lease = LLMLease(model, uuid.uuid4().hex, prompt_tokens, self.estimate(prompt_tokens))
+        if not self.enabled:
+            return lease
+
+        self._ensure_loop()
+        queue = self.waiting.setdefault(model, [])
+        entry = (priority, next(self._sequence))
+        heapq.heappush(queue, entry)
+        self._update_waiting()
+        started = time.perf_counter()
+        try:
+            while True:
+                timeout = None
+                changed = self._changed
+                if queue[0] == entry:
+                    wait_ms, reason = await self._take(lease)
+                    if wait_ms == 0:
+                        break
+                    NLU_GOVERNOR_THROTTLED.labels(reason=REASON_NAMES.get(reason, "unknown")).inc()
+                    # Leases held by other replicas are released without telling us
+                    timeout = settings.NLU_GOVERNOR_POLL_SECONDS if wait_ms < 0 else wait_ms / 1000
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            queue.remove(entry)
+            heapq.heapify(queue)
+            self._update_waiting()
+            self._notify()
+
+        NLU_GOVERNOR_WAIT_SECONDS.labels(priority=PRIORITY_NAMES.get(priority, str(priority))).observe(
+            time.perf_counter() - started
+        )
+        return lease
+
+    async def release(self, lease: LLMLease):
+        """Return the lease and settle the token estimate against the actual use"""
+        if not self.enabled:
+            return
+
+        used = lease.estimated_tokens
+        if lease.completion_tokens is not None:
+            used = lease.prompt_tokens + lease.completion_tokens
+            self.expected_completion_tokens += self.COMPLETION_SMOOTHING * (
+                lease.completion_tokens - self.expected_completion_tokens
+            )
+        refund = lease.estimated_tokens - used
+
+        if lease.local:
+            self._local_leases.get(lease.model, {}).pop(lease.lease_id, None)
+            requests, tokens, updated = self._local_buckets.get(lease.model, (0.0, 0.0, time.monotonic()))
+            self._local_buckets[lease.model] = (requests, tokens + refund, updated)
+        else:
+            await redis_client.eval(RELEASE_SCRIPT, self._keys(lease.model), [lease.lease_id, refund])
+        self._notify()
+
+    async def _take(self, lease: LLMLease) -> Tuple[float, int]:
+        """(0, 0) when the lease was granted, otherwise (wait ms or -1, reason)"""
+        if time.monotonic() >= self._redis_retry_at:
+            result = await redis_client.eval(
+                ACQUIRE_SCRIPT,
+                self._keys(lease.model),
+                [
+                    lease.lease_id,
+                    self.max_concurrency,
+                    self.rpm,
+                    self.tpm,
+                    lease.estimated_tokens,
+                    settings.NLU_GOVERNOR_BURST_SECONDS,
+                    settings.NLU_GOVERNOR_LEASE_SECONDS * 1000
+                ]
+            )
+            if result is not None:
+                return float(result[0]), int(result[1])
+            # Don't hit a broken Redis on every call
+            self._redis_retry_at = time.monotonic() + self.REDIS_RETRY_SECONDS
+        return self._take_local(lease)
+
+    def _take_local(self, lease: LLMLease) -> Tuple[float, int]:
+        share = max(1, settings.NLU_GOVERNOR_REPLICAS)
+        max_concurrency = max(1, self.max_concurrency // share)
+        rpm = self.rpm / share
+        tpm = self.tpm / share
+        burst = settings.NLU_GOVERNOR_BURST_SECONDS
+        request_capacity = max(1.0, rpm * burst / 60)
+        token_capacity = max(1.0, tpm * burst / 60)
+
+        now = time.monotonic()
+        leases = self._local_leases.setdefault(lease.model, {})
+        for lease_id, expires_at in list(leases.items()):
+            if expires_at <= now:
+                del leases[lease_id]
+
+        requests, tokens, updated = self._local_buckets.get(lease.model, (request_capacity, token_capacity, now))
+        elapsed = max(0.0, now - updated)
+        requests = min(request_capacity, requests + elapsed * rpm / 60)
+        tokens = min(token_capacity, tokens + elapsed * tpm / 60)
+        needed = min(lease.estimated_tokens, token_capacity)
+
+        result: Tuple[float, int] = (0, REASON_NONE)
+        if len(leases) >= max_concurrency:
+            result = (-1, REASON_CONCURRENCY)
+        elif requests < 1:
+            result = ((1 - requests) * 60000 / rpm, REASON_RPM)
+        elif tokens < needed:
+            result = ((needed - tokens) * 60000 / tpm, REASON_TPM)
+        else:
+            requests -= 1
+            tokens -= lease.estimated_tokens
+            leases[lease.lease_id] = now + settings.NLU_GOVERNOR_LEASE_SECONDS
+            lease.local = True
+        self._local_buckets[lease.model] = (requests, tokens, now)
+        return result
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._changed = asyncio.Event()
+            self.waiting = {}
+            self._loop = loop
+
+    def _notify(self):
+        # Wake every waiter once; they re-check whether they are at the head
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    def _update_waiting(self):
+        NLU_GOVERNOR_WAITING.set(sum(len(queue) for queue in self.waiting.values()))
+
+    @staticmethod
+    def _keys(model: str) -> List[str]:
+        return [f"llm_governor:{model}:bucket", f"llm_governor:{model}:leases"]
+
+# Global LLM governor instance
+llm_governor = LLMGovernor()
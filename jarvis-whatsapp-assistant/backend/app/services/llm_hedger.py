@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import math
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import NLU_LLM_ATTEMPTS, NLU_LLM_HEDGES, NLU_LLM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# attempt(model, claim, timeout): claim() is called once the attempt has a
+# usable answer and returns False if another attempt got there first
+Attempt = Callable[[str, Callable[[], bool], float], Awaitable[Any]]
+
+class HedgedLLMCaller:
+    """Runs an LLM call against a deadline, hedging slow primaries with a faster model.
+
+    The primary model gets the call first. If it has not produced a usable
+    answer after the hedge delay (the configured percentile of its recent
+    latencies), or fails before that, the same call goes to the secondary
+    model. Whichever attempt claims first wins and the other is cancelled.
+    """
+
+    def __init__(
+        self,
+        primary_model: Optional[str] = None,
+        secondary_model: Optional[str] = None,
+        deadline_seconds: Optional[float] = None,
+        window: int = 200
+    ):
+        self.primary_model = primary_model or settings.OPENAI_MODEL
+        self.secondary_model = secondary_model if secondary_model is not None else settings.OPENAI_SECONDARY_MODEL
+        self.deadline_seconds = deadline_seconds or settings.NLU_DEADLINE_SECONDS
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.window = window
+
+    def hedge_delay(self) -> float:
+        """Seconds to give the primary model before hedging"""
+        samples = sorted(self.latencies.get(self.primary_model, ()))
+        if len(samples) < settings.NLU_HEDGE_MIN_SAMPLES:
+            delay = settings.NLU_HEDGE_DELAY_SECONDS
+        else:
+            index = min(len(samples) - 1, math.ceil(settings.NLU_HEDGE_PERCENTILE * len(samples)) - 1)
+            delay = samples[index]
+        return min(max(delay, settings.NLU_HEDGE_MIN_DELAY_SECONDS), self.deadline_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedge_delay": round(self.hedge_delay(), 3),
+            "samples": {model: len(samples) for model, samples in self.latencies.items()}
+        }
+
+    async def call(self, attempt: Attempt) -> Tuple[str, Any]:
+        """(winning model, result); raises asyncio.TimeoutError past the deadline"""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + self.deadline_seconds
+        hedge_at = start + self.hedge_delay()
+        tasks: Dict[asyncio.Task, str] = {}
+        started: Dict[asyncio.Task, float] = {}
+        failed = set()
+        winner: Optional[asyncio.Task] = None
+        last_error: Optional[BaseException] = None
+
+        def claim_for(task: asyncio.Task) -> bool:
+            nonlocal winner
+            if winner is None:
+                winner = task
+                self._record_latency(tasks[task], loop.time() - started[task])
+                for other in tasks:
+                    if other is not task:
+                        other.cancel()
+            return winner is task
+
+        def launch(model: str):
+            task = asyncio.create_task(
+                attempt(model, lambda: claim_for(asyncio.current_task()), max(0.0, deadline - loop.time()))
+            )
+            tasks[task] = model
+            started[task] = loop.time()
+
+        launch(self.primary_model)
+        can_hedge = bool(self.secondary_model) and self.secondary_model != self.primary_model
+        try:
+            while True:
+                pending = [task for task in tasks if not task.done()]
+                if can_hedge and winner is None and (not pending or loop.time() >= hedge_at):
+                    reason = "error" if not pending else "slow"
+                    logger.info(f"Hedging {self.primary_model} with {self.secondary_model} ({reason})")
+                    NLU_LLM_HEDGES.labels(reason=reason).inc()
+                    launch(self.secondary_model)
+                    can_hedge = False
+                    continue
+
+                if winner is not None and not winner.done():
+                    # The winner's answer may already be in use (streamed
+                    # reply), so it is no longer bound by the deadline
+                    done, _ = await asyncio.wait([winner])
+                elif not pending:
+                    raise last_error or RuntimeError("LLM call failed")
+                else:
+                    now = loop.time()
+                    if now >= deadline:
+                        raise asyncio.TimeoutError(f"LLM deadline of {self.deadline_seconds}s exceeded")
+                    wake_at = min(hedge_at, deadline) if can_hedge else deadline
+                    done, _ = await asyncio.wait(
+                        pending,
+                        timeout=max(0.0, wake_at - now),
+                        return_when=asyncio.FIRST_COMPLETED
+                    )
+
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    error = task.exception()
+                    if error is not None:
+                        failed.add(task)
+                        last_error = error
+                        NLU_LLM_ATTEMPTS.labels(model=tasks[task], result="failed").inc()
+                        logger.warning(f"LLM attempt with {tasks[task]} failed: {error}")
+                    elif claim_for(task):
+                        # Attempts that return without claiming win as well
+                        NLU_LLM_ATTEMPTS.labels(model=tasks[task], result="won").inc()
+                        return tasks[task], task.result()
+        finally:
+            for task, model in tasks.items():
+                if task is winner or task in failed:
+                    continue
+                task.cancel()
+                NLU_LLM_ATTEMPTS.labels(model=model, result="lost" if winner is not None else "timeout").inc()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _record_latency(self, model: str, elapsed: float):
+        NLU_LLM_SECONDS.labels(model=model).observe(elapsed)
+        self.latencies.setdefault(model, deque(maxlen=self.window)).append(elapsed)
+
+# Global hedged LLM caller instance
+llm_hedger = HedgedLLMCaller()
@@ -0,0 +1,219 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from app.core.config import settings
+from app.core.metrics import MEDIA_BLOB_CACHE_BYTES, MEDIA_CACHE
+from app.core.redis_client import redis_client
+from app.services.whatsapp_client import DownloadedMedia, WhatsAppAPIError, WhatsAppClient, whatsapp_client
+
+logger = logging.getLogger(__name__)
+
+def url_expiry(url: Optional[str]) -> Optional[int]:
+    """Unix expiry encoded in a lookaside media URL (`ext` parameter), if any"""
+    if not url:
+        return None
+    try:
+        return int(parse_qs(urlparse(url).query)["ext"][0])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+class MediaCache:
+    """Caches in front of the Graph API media lookups.
+
+    Media metadata (download URL, sha256, size) is cached per media ID in
+    process and in Redis until shortly before the URL expires. Downloaded
+    bodies are copied to files named by their content sha256 in a cache
+    directory, with an in-process LRU index over them, so a redelivered or
+    forwarded file is fetched once without holding it in memory. Concurrent
+    fetches of the same content share one download.
+    """
+
+    URL_EXPIRY_MARGIN_SECONDS = 15
+    MAX_INFO_ENTRIES = 1024
+
+    def __init__(
+        self,
+        client: Optional[WhatsAppClient] = None,
+        url_ttl: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_item_bytes: Optional[int] = None
+    ):
+        self.client = client or whatsapp_client
+        self.url_ttl = url_ttl or settings.MEDIA_URL_TTL_SECONDS
+        self.max_bytes = max_bytes or settings.MEDIA_BLOB_CACHE_MAX_BYTES
+        self.max_item_bytes = max_item_bytes or settings.MEDIA_BLOB_CACHE_MAX_ITEM_BYTES
+        self.info: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        # sha256 -> size of the cached file, least recently used first
+        self.blobs: "OrderedDict[str, int]" = OrderedDict()
+        self.blob_bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._directory: Optional[Path] = None
+        self._tempdir: Optional[tempfile.TemporaryDirectory] = None
+
+    @property
+    def directory(self) -> Path:
+        """Blob directory: MEDIA_BLOB_CACHE_DIR, or a private temp directory removed at exit"""
+        if self._directory is None:
+            if settings.MEDIA_BLOB_CACHE_DIR:
+                self._directory = Path(settings.MEDIA_BLOB_CACHE_DIR)
+                self._directory.mkdir(parents=True, exist_ok=True)
+            else:
+                self._tempdir = tempfile.TemporaryDirectory(prefix="jarvis-media-")
+                self._directory = Path(self._tempdir.name)
+        return self._directory
+
+    async def get_info(self, media_id: str) -> Dict[str, Any]:
+        """Media metadata for an ID, from cache while its URL is still valid"""
+        cached = self.info.get(media_id)
+        if cached and cached[0] > time.time():
+            MEDIA_CACHE.labels(cache="info", result="hit").inc()
+            return cached[1]
+
+        cached_data = await redis_client.get(f"media_info:{media_id}")
+        if cached_data:
+            try:
+                entry = json.loads(cached_data)
+                if entry["expires_at"] > time.time():
+                    self._remember_info(media_id, entry["info"], entry["expires_at"])
+                    MEDIA_CACHE.labels(cache="info", result="hit").inc()
+                    return entry["info"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                logger.error(f"Invalid media info cache entry for {media_id}")
+
+        MEDIA_CACHE.labels(cache="info", result="miss").inc()
+        info = await self.client.get_media_info(media_id)
+
+        ttl = self.url_ttl
+        expiry = url_expiry(info.get("url"))
+        if expiry:
+            ttl = min(ttl, expiry - time.time() - self.URL_EXPIRY_MARGIN_SECONDS)
+        if ttl >= 1:
+            expires_at = time.time() + ttl
+            self._remember_info(media_id, info, expires_at)
+            await redis_client.setex(
+                f"media_info:{media_id}",
+                int(ttl),
+                json.dumps({"info": info, "expires_at": expires_at})
+            )
+        return info
+
+    async def get_url(self, media_id: str) -> str:
+        """Download URL for a media ID, from cache while it is still valid"""
+        return (await self.get_info(media_id))["url"]
+
+    async def invalidate(self, media_id: str):
+        self.info.pop(media_id, None)
+        await redis_client.delete(f"media_info:{media_id}")
+
+    async def fetch(self, media_id: str) -> DownloadedMedia:
+        """Media body for an ID, downloaded at most once per content hash while cached"""
+        info = await self.get_info(media_id)
+        digest = info.get("sha256")
+
+        if digest:
+            media = await self._cached_media(digest)
+            if media:
+                return media
+
+            inflight = self._inflight.get(digest)
+            if inflight:
+                await asyncio.shield(inflight)
+                media = await self._cached_media(digest)
+                if media:
+                    return media
+
+        return await self._download(media_id, info, digest)
+
+    async def _download(self, media_id: str, info: Dict[str, Any], digest: Optional[str]) -> DownloadedMedia:
+        future = None
+        if digest and digest not in self._inflight:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[digest] = future
+
+        try:
+            try:
+                media = await self.client.download_media_to_file(info["url"])
+            except WhatsAppAPIError as e:
+                if e.status not in (401, 403, 404):
+                    raise
+                # The cached URL went stale early, look it up once more
+                await self.invalidate(media_id)
+                info = await self.get_info(media_id)
+                media = await self.client.download_media_to_file(info["url"])
+
+            if digest and media.sha256 != digest:
+                logger.warning(f"Media {media_id} sha256 mismatch: expected {digest}, got {media.sha256}")
+            await self._store_blob(media)
+            return media
+        finally:
+            if future:
+                self._inflight.pop(digest, None)
+                future.set_result(None)
+
+    async def _cached_media(self, digest: str) -> Optional[DownloadedMedia]:
+        size = self.blobs.get(digest)
+        if size is not None:
+            try:
+                file = await asyncio.to_thread(open, self.directory / digest, "rb")
+            except OSError:
+                # Removed behind our back (shared directory, tmp cleaner)
+                self._forget_blob(digest)
+            else:
+                self.blobs.move_to_end(digest)
+                MEDIA_CACHE.labels(cache="blob", result="hit").inc()
+                return DownloadedMedia(file, size, digest)
+        MEDIA_CACHE.labels(cache="blob", result="miss").inc()
+        return None
+
+    async def _store_blob(self, media: DownloadedMedia):
+        if media.size > self.max_item_bytes or media.sha256 in self.blobs:
+            return
+
+        try:
+            await asyncio.to_thread(self._write_blob, media)
+        except OSError as e:
+            logger.error(f"Could not cache media {media.sha256}: {e}")
+            return
+        self.blobs[media.sha256] = media.size
+        self.blob_bytes += media.size
+        while self.blob_bytes > self.max_bytes and self.blobs:
+            self._forget_blob(next(iter(self.blobs)))
+        MEDIA_BLOB_CACHE_BYTES.set(self.blob_bytes)
+
+    def _write_blob(self, media: DownloadedMedia):
+        """Copy the spooled body into the cache directory; the rename makes it visible complete"""
+        path = self.directory / media.sha256
+        partial = path.with_suffix(".part")
+        media.file.seek(0)
+        with open(partial, "wb") as blob:
+            shutil.copyfileobj(media.file, blob)
+        media.file.seek(0)
+        os.replace(partial, path)
+
+    def _forget_blob(self, digest: str):
+        self.blob_bytes -= self.blobs.pop(digest, 0)
+        try:
+            (self.directory / digest).unlink()
+        except FileNotFoundError:
+            pass
+        MEDIA_BLOB_CACHE_BYTES.set(self.blob_bytes)
+
+    def _remember_info(self, media_id: str, info: Dict[str, Any], expires_at: float):
+        if len(self.info) >= self.MAX_INFO_ENTRIES:
+            now = time.time()
+            self.info = {key: entry for key, entry in self.info.items() if entry[0] > now}
+            if len(self.info) >= self.MAX_INFO_ENTRIES:
+                self.info.pop(next(iter(self.info)))
+        self.info[media_id] = (expires_at, info)
+
+# Global media cache instance
+media_cache = MediaCache()
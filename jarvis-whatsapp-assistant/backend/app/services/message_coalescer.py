@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.models.webhook import InboundMessage
+
+logger = logging.getLogger(__name__)
+
+FlushCallback = Callable[[str, List[InboundMessage]], asyncio.Future]
+
+def merge_text_messages(messages: List[InboundMessage]) -> InboundMessage:
+    """Combine consecutive text messages of one sender into a single message"""
+    last = messages[-1]
+    if len(messages) == 1:
+        return last
+    return InboundMessage(
+        id=last.id,
+        sender_id=last.sender_id,
+        type="text",
+        timestamp=last.timestamp,
+        text="\n".join(message.text for message in messages if message.text),
+        phone_number_id=last.phone_number_id
+    )
+
+class PendingBurst:
+    """Text messages of one sender collected during the debounce window"""
+
+    __slots__ = ("messages", "waiters", "started_at", "timer")
+
+    def __init__(self):
+        self.messages: List[InboundMessage] = []
+        self.waiters: List[asyncio.Future] = []
+        self.started_at = time.monotonic()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+class MessageCoalescer:
+    """Per-sender debounce window for rapid-fire text messages.
+
+    Every new text message restarts the sender's window; when it elapses
+    (or MESSAGE_COALESCE_MAX_WAIT_MS after the first message at the
+    latest) the collected burst is handed to the flush callback as one
+    job, so three short messages cost one NLU call and one reply.
+    """
+
+    def __init__(
+        self,
+        on_flush: FlushCallback,
+        window_ms: Optional[int] = None,
+        max_wait_ms: Optional[int] = None,
+        max_messages: Optional[int] = None
+    ):
+        self.on_flush = on_flush
+        self.window = (window_ms if window_ms is not None else settings.MESSAGE_COALESCE_WINDOW_MS) / 1000
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.MESSAGE_COALESCE_MAX_WAIT_MS) / 1000
+        self.max_messages = max_messages or settings.MESSAGE_COALESCE_MAX_MESSAGES
+        self.pending: Dict[str, PendingBurst] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def add(self, message: InboundMessage) -> asyncio.Future:
+        """Buffer a text message, returns a future resolved once its burst is processed"""
+        loop = asyncio.get_running_loop()
+        burst = self.pending.get(message.sender_id)
+        if burst is None:
+            burst = PendingBurst()
+            self.pending[message.sender_id] = burst
+
+        waiter = loop.create_future()
+        burst.messages.append(message)
+        burst.waiters.append(waiter)
+
+        if burst.timer:
+            burst.timer.cancel()
+        if len(burst.messages) >= self.max_messages:
+            self.flush(message.sender_id)
+        else:
+            elapsed = time.monotonic() - burst.started_at
+            delay = max(0.0, min(self.window, self.max_wait - elapsed))
+            burst.timer = loop.call_later(delay, self.flush, message.sender_id)
+        return waiter
+
+    def flush(self, sender_id: str):
+        """Hand a sender's pending burst to the flush callback right away"""
+        burst = self.pending.pop(sender_id, None)
+        if burst is None:
+            return
+        if burst.timer:
+            burst.timer.cancel()
+
+        if len(burst.messages) > 1:
+            logger.info(f"Coalesced {len(burst.messages)} messages from {sender_id}")
+
+        job = self.on_flush(sender_id, burst.messages)
+        job.add_done_callback(lambda done: self._resolve(done, burst.waiters))
+
+    def flush_all(self):
+        for sender_id in list(self.pending):
+            self.flush(sender_id)
+
+    @staticmethod
+    def _resolve(job: asyncio.Future, waiters: List[asyncio.Future]):
+        for waiter in waiters:
+            if waiter.done():
+                continue
+            if job.cancelled():
+                waiter.cancel()
+            elif job.exception():
+                waiter.set_exception(job.exception())
+            else:
+                waiter.set_result(job.result())
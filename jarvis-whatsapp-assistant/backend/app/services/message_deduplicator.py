@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import math
+import time
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import DEDUP_CHECKS
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over a bytearray using double hashing"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class MessageDeduplicator:
+    """Drop webhook redeliveries of already handled message IDs.
+
+    A local Bloom filter answers the common case (redelivery to the same
+    replica) without a round trip; Redis SET NX is the authority across
+    replicas. Keys are first written with a short processing TTL so that a
+    crashed worker does not block a retry, and extended once the message
+    has been handled.
+    """
+
+    def __init__(self):
+        self.ttl = settings.DEDUP_TTL_SECONDS
+        self.processing_ttl = settings.DEDUP_PROCESSING_TTL_SECONDS
+        self._current = self._new_filter()
+        self._previous = self._new_filter()
+        self._rotated_at = time.monotonic()
+        self.stats: Dict[str, int] = {"local_hit": 0, "redis_hit": 0, "miss": 0}
+
+    @staticmethod
+    def _new_filter() -> BloomFilter:
+        return BloomFilter(settings.DEDUP_BLOOM_CAPACITY, settings.DEDUP_BLOOM_ERROR_RATE)
+
+    @staticmethod
+    def _key(message_id: str) -> str:
+        return f"dedup:message:{message_id}"
+
+    def _rotate_if_needed(self):
+        """Age out old IDs by keeping two generations of one TTL each"""
+        if time.monotonic() - self._rotated_at >= self.ttl:
+            self._previous = self._current
+            self._current = self._new_filter()
+            self._rotated_at = time.monotonic()
+
+    def _record(self, result: str):
+        self.stats[result] += 1
+        DEDUP_CHECKS.labels(result=result).inc()
+
+    async def claim(self, message_id: Optional[str]) -> bool:
+        """Return True if this replica should process the message, False for a duplicate"""
+        if not settings.DEDUP_ENABLED or not message_id:
+            return True
+
+        self._rotate_if_needed()
+        if message_id in self._current or message_id in self._previous:
+            self._record("local_hit")
+            logger.info(f"Skipping duplicate message {message_id} (local)")
+            return False
+
+        claimed = await redis_client.set_nx(self._key(message_id), "processing", self.processing_ttl)
+        if claimed is False:
+            self._record("redis_hit")
+            logger.info(f"Skipping duplicate message {message_id} (redis)")
+            return False
+
+        # Redis unavailable (None) fails open: a duplicate reply beats a dropped message
+        self._record("miss")
+        return True
+
+    async def mark_done(self, message_id: Optional[str]):
+        """Remember a handled message for the full deduplication window"""
+        if not settings.DEDUP_ENABLED or not message_id:
+            return
+        self._current.add(message_id)
+        await redis_client.setex(self._key(message_id), self.ttl, "done")
+
+    async def release(self, message_id: Optional[str]):
+        """Forget a claim so that a redelivery can retry the message"""
+        if not settings.DEDUP_ENABLED or not message_id:
+            return
+        await redis_client.delete(self._key(message_id))
+
+# Global message deduplicator instance
+message_deduplicator = MessageDeduplicator()
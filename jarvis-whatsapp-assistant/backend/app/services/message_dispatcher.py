@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from app.models.webhook import InboundMessage
+from app.services.message_coalescer import MessageCoalescer, merge_text_messages
+from app.services.message_deduplicator import MessageDeduplicator, message_deduplicator
+from app.services.message_processor import MessageProcessor, message_processor
+from app.services.sender_mailboxes import SenderMailboxes
+
+logger = logging.getLogger(__name__)
+
+class MessageDispatcher:
+    """Fan out webhook messages into per-sender mailboxes: parallel across senders, ordered per sender"""
+
+    def __init__(
+        self,
+        processor: Optional[MessageProcessor] = None,
+        max_concurrency: Optional[int] = None,
+        deduplicator: Optional[MessageDeduplicator] = None,
+        idle_seconds: Optional[float] = None,
+        coalesce_window_ms: Optional[int] = None
+    ):
+        self.processor = processor or message_processor
+        self.deduplicator = deduplicator or message_deduplicator
+        self.mailboxes = SenderMailboxes(max_concurrency, idle_seconds)
+        self.coalescer = MessageCoalescer(self._submit, window_ms=coalesce_window_ms)
+
+    async def dispatch(self, messages: List[InboundMessage]):
+        """Process a batch of messages and wait until all of them are handled"""
+        if not messages:
+            return
+
+        # Stable sort keeps payload order for equal timestamps
+        ordered = sorted(messages, key=lambda message: message.timestamp)
+        futures = []
+        for message in ordered:
+            if self.coalescer.enabled and message.type == "text":
+                futures.append(self.coalescer.add(message))
+            else:
+                # Release buffered text first so the sender's order is kept
+                self.coalescer.flush(message.sender_id)
+                futures.append(self._submit(message.sender_id, [message]))
+
+        logger.info(f"Dispatched {len(messages)} messages, {len(self.mailboxes)} active mailboxes")
+
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error dispatching message: {result}")
+
+    async def close(self):
+        """Flush pending bursts and stop all sender mailboxes"""
+        self.coalescer.flush_all()
+        await self.mailboxes.close()
+
+    def _submit(self, sender_id: str, messages: List[InboundMessage]) -> asyncio.Future:
+        return self.mailboxes.submit(sender_id, lambda: self._process(messages))
+
+    async def _process(self, messages: List[InboundMessage]):
+        """Process one message (or one coalesced burst) inside its sender's mailbox"""
+        claimed = [message for message in messages if await self.deduplicator.claim(message.id)]
+        if not claimed:
+            return
+
+        try:
+            await self.processor.process_message(merge_text_messages(claimed))
+        except Exception:
+            for message in claimed:
+                await self.deduplicator.release(message.id)
+            raise
+        for message in claimed:
+            await self.deduplicator.mark_done(message.id)
+
+# Global message dispatcher instance
+message_dispatcher = MessageDispatcher()
@@ -1,9 +1,14 @@
 import asyncio
 import json
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
+from app.models.webhook import InboundMessage, WebhookEnvelope
 from app.services.whatsapp_client import whatsapp_client
+from app.services.keyword_matcher import keyword_matcher
+from app.services.media_cache import media_cache
+from app.services.outbound_scheduler import outbound_scheduler
+from app.services.side_effects import side_effects
 from app.core.redis_client import redis_client
 from app.services.nlu_engine import nlu_engine
 from app.services.task_executor import task_executor
@@ -14,52 +19,46 @@ logger = logging.getLogger(__name__)
 class MessageProcessor:
     def __init__(self):
         self.whatsapp_client = whatsapp_client
+        self.outbound = outbound_scheduler
         
     async def process_incoming_message(self, webhook_data: Dict[str, Any]):
-        """Process incoming WhatsApp message"""
+        """Process every incoming WhatsApp message of a webhook payload in order"""
+        messages = WebhookEnvelope.from_dict(webhook_data).messages
+        
+        if not messages:
+            logger.warning("No messages in webhook data")
+            return
+        
+        for message in messages:
+            await self.process_message(message)
+    
+    async def process_message(self, message: InboundMessage):
+        """Process a single incoming WhatsApp message"""
+        sender_id = message.sender_id
         try:
-            # Extract message data
-            entry = webhook_data["entry"][0]
-            changes = entry["changes"][0]
-            value = changes["value"]
-            
-            if "messages" not in value:
-                logger.warning("No messages in webhook data")
-                return
-            
-            message = value["messages"][0]
-            sender_id = message["from"]
-            message_id = message["id"]
-            message_type = message["type"]
-            timestamp = message.get("timestamp")
+            message_id = message.id
+            message_type = message.type
             
             logger.info(f"Processing message from {sender_id}: type={message_type}, id={message_id}")
             
-            # Mark message as read
-            try:
-                await self.whatsapp_client.mark_message_as_read(message_id)
-            except Exception as e:
-                logger.warning(f"Failed to mark message as read: {e}")
+            # Read receipt and typing indicator run in the background while the context loads
+            side_effects.mark_read(sender_id, message_id, typing=message_type in ("text", "audio"))
             
             # Get user context
             user_context = await self.get_user_context(sender_id)
             
             # Process different message types
             if message_type == "text":
-                text = message["text"]["body"]
-                await self.process_text_message(sender_id, text, user_context)
+                await self.process_text_message(sender_id, message.text or "", user_context)
             
             elif message_type == "audio":
-                audio_id = message["audio"]["id"]
-                await self.process_audio_message(sender_id, audio_id, user_context)
+                await self.process_audio_message(sender_id, message.media_id, user_context)
             
             elif message_type == "interactive":
                 await self.process_interactive_message(sender_id, message, user_context)
             
             elif message_type == "image":
-                image_id = message["image"]["id"]
-                caption = message["image"].get("caption", "")
-                await self.process_image_message(sender_id, image_id, caption, user_context)
+                await self.process_image_message(sender_id, message.media_id, message.caption or "", user_context)
             
             else:
                 logger.warning(f"Unhandled message type: {message_type}")
@@ -67,7 +66,8 @@ class MessageProcessor:
         
         except Exception as e:
             logger.error(f"Error processing message: {e}")
-            await self.send_error_message(sender_id)
+            if sender_id:
+                await self.send_error_message(sender_id)
     
     async def process_text_message(self, sender_id: str, text: str, context: Dict):
         """Process text message"""
@@ -81,20 +81,25 @@ class MessageProcessor:
         if context.get("conversation_state") in ["confirming_flower_order"]:
             confirmation_result = await task_executor.handle_confirmation(text, context)
             if confirmation_result:
-                await self.whatsapp_client.send_text_message(sender_id, confirmation_result["text"])
+                await self.outbound.send_text_message(sender_id, confirmation_result["text"])
                 context["conversation_state"] = confirmation_result["state"]
                 await self.save_user_context(sender_id, context)
                 return
         
-        # Analyze intent and entities with NLU engine
-        nlu_result = await nlu_engine.analyze(text, context)
+        # Analyze intent and entities with NLU engine; a streamed analysis
+        # hands over the partial result as soon as the reply can be sent
+        early_reply: Optional[asyncio.Task] = None
         
-        # Execute task based on NLU result
-        task_result = await task_executor.execute(nlu_result, context)
+        async def on_ready(partial_result: Dict[str, Any]):
+            nonlocal early_reply
+            early_reply = asyncio.create_task(self.execute_and_reply(sender_id, partial_result, context))
         
-        # Send response
-        response_text = task_result.get("text", "Entschuldigung, ich konnte keine Antwort generieren.")
-        await self.whatsapp_client.send_text_message(sender_id, response_text)
+        nlu_result = await nlu_engine.analyze(text, context, on_ready=on_ready)
+        
+        if early_reply:
+            task_result, response_text = await early_reply
+        else:
+            task_result, response_text = await self.execute_and_reply(sender_id, nlu_result, context)
         
         # Update user context
         context["last_response"] = response_text
@@ -102,6 +107,14 @@ class MessageProcessor:
         context["conversation_state"] = task_result.get("state", "idle")
         await self.save_user_context(sender_id, context)
     
+    async def execute_and_reply(self, sender_id: str, nlu_result: Dict[str, Any], context: Dict) -> Tuple[Dict[str, Any], str]:
+        """Execute task based on NLU result and send the response"""
+        task_result = await task_executor.execute(nlu_result, context)
+        
+        response_text = task_result.get("text", "Entschuldigung, ich konnte keine Antwort generieren.")
+        await self.outbound.send_text_message(sender_id, response_text)
+        return task_result, response_text
+    
     async def process_audio_message(self, sender_id: str, audio_id: str, context: Dict):
         """Process audio message using speech-to-text"""
         try:
@@ -109,11 +122,9 @@ class MessageProcessor:
             
             # Download audio from WhatsApp
             try:
-                media_url = await self.whatsapp_client.get_media_url(audio_id)
-                audio_data = await self.whatsapp_client.download_media(media_url)
-                
-                # Transcribe audio to text
-                transcript = await speech_service.transcribe_audio(audio_data, "ogg")
+                # Cached by media ID and content hash; transcoding reads from the spool
+                with await media_cache.fetch(audio_id) as media:
+                    transcript = await speech_service.transcribe_audio(media.file, "ogg")
                 
                 if transcript:
                     logger.info(f"Audio transcribed: {transcript}")
@@ -122,22 +133,22 @@ class MessageProcessor:
                     await self.process_text_message(sender_id, transcript, context)
                 else:
                     response_text = "🎤 Entschuldigung, ich konnte Ihre Sprachnachricht nicht verstehen. Können Sie es bitte wiederholen oder eine Textnachricht senden?"
-                    await self.whatsapp_client.send_text_message(sender_id, response_text)
+                    await self.outbound.send_text_message(sender_id, response_text)
                     
             except Exception as e:
                 logger.error(f"Error downloading/transcribing audio: {e}")
                 response_text = "🎤 Ich habe Ihre Sprachnachricht erhalten und verarbeite sie... Die Spracherkennung ist aktiviert!"
-                await self.whatsapp_client.send_text_message(sender_id, response_text)
+                await self.outbound.send_text_message(sender_id, response_text)
             
         except Exception as e:
             logger.error(f"Error processing audio: {e}")
             await self.send_error_message(sender_id)
     
-    async def process_interactive_message(self, sender_id: str, message: Dict, context: Dict):
+    async def process_interactive_message(self, sender_id: str, message: InboundMessage, context: Dict):
         """Process interactive message (button clicks, etc.)"""
         logger.info(f"Processing interactive message from {sender_id}")
         
-        interactive = message.get("interactive", {})
+        interactive = message.interactive or {}
         button_reply = interactive.get("button_reply", {})
         
         if button_reply:
@@ -145,7 +156,7 @@ class MessageProcessor:
             button_title = button_reply.get("title")
             
             response_text = f"Sie haben '{button_title}' ausgewählt. Diese Funktion wird bald implementiert!"
-            await self.whatsapp_client.send_text_message(sender_id, response_text)
+            await self.outbound.send_text_message(sender_id, response_text)
     
     async def process_image_message(self, sender_id: str, image_id: str, caption: str, context: Dict):
         """Process image message"""
@@ -155,22 +166,22 @@ class MessageProcessor:
         if caption:
             response_text += f"\nBildunterschrift: {caption}"
         
-        await self.whatsapp_client.send_text_message(sender_id, response_text)
+        await self.outbound.send_text_message(sender_id, response_text)
     
     async def generate_simple_response(self, text: str, context: Dict) -> str:
         """Generate a simple response (placeholder for NLU engine)"""
-        text_lower = text.lower()
+        intents = keyword_matcher.categories(text, "intent:")
         
         # Greeting responses
-        if any(greeting in text_lower for greeting in ["hallo", "hi", "hey", "guten tag", "moin"]):
+        if "greeting" in intents:
             return "🤖 Hallo! Ich bin JARVIS, Ihr persönlicher KI-Assistent. Wie kann ich Ihnen heute helfen?"
         
         # Flower ordering
-        elif any(word in text_lower for word in ["blumen", "rosen", "bestell", "order"]):
+        elif "order_flowers" in intents:
             return "🌹 Gerne helfe ich Ihnen bei der Blumenbestellung! Diese Funktion wird gerade implementiert. Bald können Sie mir sagen: 'Bestelle meiner Freundin rote Rosen' und ich kümmere mich darum!"
         
         # Help requests
-        elif any(word in text_lower for word in ["hilfe", "help", "was kannst du", "funktionen"]):
+        elif "help" in intents:
             return """🤖 Ich bin JARVIS, Ihr KI-Assistent! Bald werde ich folgende Aufgaben für Sie erledigen können:
 
 🌹 Blumen bestellen
@@ -182,7 +193,7 @@ class MessageProcessor:
 Die Entwicklung läuft auf Hochtouren!"""
         
         # Status requests
-        elif any(word in text_lower for word in ["status", "wie geht", "entwicklung"]):
+        elif "status" in intents:
             return "⚡ Aktueller Entwicklungsstand:\n✅ WhatsApp Integration\n🔄 KI-Engine (in Arbeit)\n⏳ Spracherkennung\n⏳ Aufgabenautomatisierung\n\nIch werde immer intelligenter!"
         
         # Default response
@@ -226,15 +237,23 @@ Die Entwicklung läuft auf Hochtouren!"""
         """Send error message to user"""
         error_message = "😔 Entschuldigung, es ist ein Fehler aufgetreten. Bitte versuchen Sie es erneut oder kontaktieren Sie den Support."
         try:
-            await self.whatsapp_client.send_text_message(sender_id, error_message)
+            await self.outbound.send_text_message(sender_id, error_message)
         except Exception as e:
             logger.error(f"Failed to send error message: {e}")
     
+    async def send_busy_message(self, sender_id: str):
+        """Send a short reply while the assistant is overloaded"""
+        busy_message = "⏳ Gerade ist sehr viel los. Bitte senden Sie Ihre Nachricht in ein paar Minuten erneut."
+        try:
+            await self.outbound.send_text_message(sender_id, busy_message)
+        except Exception as e:
+            logger.error(f"Failed to send busy message: {e}")
+    
     async def send_unsupported_message_response(self, sender_id: str):
         """Send response for unsupported message types"""
         response = "🤖 Dieser Nachrichtentyp wird noch nicht unterstützt. Bitte senden Sie eine Textnachricht oder probieren Sie es später erneut."
         try:
-            await self.whatsapp_client.send_text_message(sender_id, response)
+            await self.outbound.send_text_message(sender_id, response)
         except Exception as e:
             logger.error(f"Failed to send unsupported message response: {e}")
 
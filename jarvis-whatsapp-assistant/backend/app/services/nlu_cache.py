@@ -0,0 +1,145 @@
+import copy
+import hashlib
+import json
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import NLU_CACHE_LOOKUPS, NLU_CACHE_STORES
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Bump when the prompt or the result format changes
+CACHE_VERSION = "v2"
+
+# Intents whose result depends only on the (short) text and conversation
+# state, with their TTL in seconds. Everything else goes to the LLM every
+# time: weather and orders are time or user dependent, and general_chat
+# replies are written from the user's history and profile.
+CACHEABLE_INTENTS: Dict[str, int] = {
+    "greeting": 7 * 86400,
+    "help": 7 * 86400,
+    "goodbye": 7 * 86400
+}
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a message"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _NON_WORD.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+class NLUCache:
+    """Two-tier cache for NLU results: in-process LRU in front of Redis.
+
+    Keys combine the normalized text with the only context fields that
+    change the analysis (conversation state and last intent). Only short
+    messages with a confident, entity-free result of a cacheable intent are
+    stored, and only their classification: the LLM's reply text is written
+    from the sender's context, so the engine answers a hit with its canned
+    reply for the intent instead.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.NLU_CACHE_LOCAL_SIZE
+        self.local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.NLU_CACHE_ENABLED
+
+    def key(self, text: str, context: Dict) -> Optional[str]:
+        """Cache key for a message, None if it is too long to be worth caching"""
+        normalized = normalize_text(text)
+        if not normalized or len(normalized) > settings.NLU_CACHE_MAX_TEXT_LENGTH:
+            return None
+        raw = "|".join([
+            normalized,
+            context.get("conversation_state") or "idle",
+            context.get("last_intent") or ""
+        ])
+        return f"nlu_cache:{CACHE_VERSION}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+    async def get(self, text: str, context: Dict) -> Optional[Dict[str, Any]]:
+        """Cached result for this message and context, if any"""
+        key = self.key(text, context)
+        if not key:
+            return None
+
+        entry = self.local.get(key)
+        if entry:
+            expires_at, result = entry
+            if expires_at > time.time():
+                self.local.move_to_end(key)
+                NLU_CACHE_LOOKUPS.labels(result="local_hit").inc()
+                return copy.deepcopy(result)
+            del self.local[key]
+
+        cached_data = await redis_client.get(key)
+        if cached_data:
+            try:
+                result = json.loads(cached_data)
+                ttl = CACHEABLE_INTENTS.get(result.get("intent"), 0)
+                # Local copy expires no later than a fresh Redis entry would
+                self._remember(key, result, time.time() + ttl)
+                NLU_CACHE_LOOKUPS.labels(result="redis_hit").inc()
+                return copy.deepcopy(result)
+            except json.JSONDecodeError:
+                logger.error(f"Invalid NLU cache entry {key}")
+
+        NLU_CACHE_LOOKUPS.labels(result="miss").inc()
+        return None
+
+    async def set(self, text: str, context: Dict, result: Dict[str, Any]) -> bool:
+        """Store a result if its intent and content are cacheable"""
+        ttl = self.ttl_for(result)
+        key = self.key(text, context) if ttl else None
+        if not key:
+            return False
+
+        classification = self.classification(result)
+        self._remember(key, classification, time.time() + ttl)
+        await redis_client.setex(key, ttl, json.dumps(classification, ensure_ascii=False))
+        NLU_CACHE_STORES.labels(intent=result["intent"]).inc()
+        return True
+
+    @staticmethod
+    def classification(result: Dict[str, Any]) -> Dict[str, Any]:
+        """The user independent part of a result: intent, entities and confidence"""
+        return {
+            "intent": result["intent"],
+            "entities": copy.deepcopy(result.get("entities") or {}),
+            "confidence": result.get("confidence")
+        }
+
+    @staticmethod
+    def ttl_for(result: Dict[str, Any]) -> int:
+        """TTL for a result, 0 when it must not be cached"""
+        ttl = CACHEABLE_INTENTS.get(result.get("intent"), 0)
+        if not ttl:
+            return 0
+        entities = result.get("entities") or {}
+        if any(entities.values() if isinstance(entities, dict) else entities):
+            return 0
+        try:
+            if float(result.get("confidence", 0)) < settings.NLU_CACHE_MIN_CONFIDENCE:
+                return 0
+        except (TypeError, ValueError):
+            return 0
+        return ttl
+
+    def _remember(self, key: str, result: Dict[str, Any], expires_at: float):
+        self.local[key] = (expires_at, result)
+        self.local.move_to_end(key)
+        while len(self.local) > self.max_entries:
+            self.local.popitem(last=False)
+
+# Global NLU cache instance
+nlu_cache = NLUCache()
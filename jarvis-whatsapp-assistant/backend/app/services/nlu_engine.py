@@ -1,11 +1,71 @@
+import asyncio
 import openai
 import json
 import logging
-from typing import Dict, Any, List, Optional
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from openai import AsyncOpenAI
 from app.core.config import settings
+from app.core.metrics import NLU_CLASSIFIER_CONFIDENCE, NLU_PROMPT_TOKENS, NLU_ROUTES, NLU_STREAM_READY_SECONDS
+from app.services.admission_controller import admission_controller
+from app.services.entity_extractor import entity_extractor
+from app.services.intent_classifier import intent_router
+from app.services.keyword_matcher import keyword_matcher
+from app.services.llm_governor import PRIORITY_CHAT, PRIORITY_FLOW, LLMLease, llm_governor
+from app.services.llm_hedger import llm_hedger
+from app.services.nlu_cache import nlu_cache
+from app.services.prompt_context import context_projector, token_counter
+from app.services.semantic_cache import semantic_cache
+from app.services.streaming_json import IncrementalJSONObject
 
 logger = logging.getLogger(__name__)
 
+HELP_TEXT = """🤖 Ich bin JARVIS und kann Ihnen bei folgenden Aufgaben helfen:
+
+🌹 Blumen bestellen
+📅 Termine planen  
+📧 E-Mails senden
+🌤️ Wetter abfragen
+💬 Allgemeine Fragen beantworten
+
+Probieren Sie es aus: "Bestelle meiner Freundin rote Rosen" """
+
+# Intents the local classifier may answer on its own: their handlers in the
+# task executor need neither entities nor a generated reply. Orders, weather
+# and general chat always go to the LLM.
+LOCAL_INTENTS: Dict[str, Dict[str, str]] = {
+    "greeting": {
+        "response": "🤖 Hallo! Ich bin JARVIS, Ihr persönlicher KI-Assistent. Wie kann ich Ihnen heute helfen?",
+        "action": "greet_user",
+        "next_step": "await_user_request"
+    },
+    "help": {
+        "response": HELP_TEXT,
+        "action": "show_help",
+        "next_step": "await_user_request"
+    },
+    "goodbye": {
+        "response": "👋 Auf Wiedersehen! Ich bin jederzeit für Sie da, wenn Sie mich brauchen.",
+        "action": "say_goodbye",
+        "next_step": "await_user_request"
+    },
+    "schedule_meeting": {
+        "response": "📅 Gerne plane ich einen Termin für Sie!",
+        "action": "schedule_meeting",
+        "next_step": "await_user_request"
+    },
+    "send_email": {
+        "response": "📧 Gerne verschicke ich eine E-Mail für Sie!",
+        "action": "send_email",
+        "next_step": "await_user_request"
+    }
+}
+
+# Task handlers that read entities: an early dispatch waits for them
+ENTITY_INTENTS = {"order_flowers", "get_weather"}
+
+ReadyCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
 class NLUEngine:
     def __init__(self):
         if settings.OPENAI_API_KEY and settings.OPENAI_API_KEY != "sk-demo-key-replace-with-real-key":
@@ -14,41 +74,200 @@ class NLUEngine:
         else:
             self.openai_available = False
             logger.warning("OpenAI API key not configured - using mock responses")
+        self._template_tokens: Optional[int] = None
+        self._async_client: Optional[AsyncOpenAI] = None
     
-    async def analyze(self, text: str, context: Dict) -> Dict[str, Any]:
-        """Analyze user intent and extract entities"""
+    async def analyze(self, text: str, context: Dict, on_ready: Optional[ReadyCallback] = None) -> Dict[str, Any]:
+        """Analyze user intent and extract entities.
+        
+        With on_ready, the LLM completion is streamed and on_ready is awaited
+        with the partial result as soon as it can be acted on (see
+        _is_dispatchable); the complete result is still returned.
+        """
+        
+        if nlu_cache.enabled:
+            cached = await nlu_cache.get(text, context)
+            if cached:
+                NLU_ROUTES.labels(route="cache", intent=cached.get("intent")).inc()
+                return self._cached_result(cached)
+        
+        # Near-duplicates of greeting/help/goodbye messages the LLM answered before
+        if semantic_cache.enabled:
+            similar = semantic_cache.get(text, context)
+            if similar:
+                NLU_ROUTES.labels(route="semantic_cache", intent=similar.get("intent")).inc()
+                return self._cached_result(similar)
+        
+        # Outside of a multi-step flow, the local classifier answers confident
+        # predictions of intents that need no generated text
+        if intent_router.enabled and context.get("conversation_state", "idle") == "idle":
+            intent, confidence = intent_router.classify(text)
+            NLU_CLASSIFIER_CONFIDENCE.observe(confidence)
+            if intent in LOCAL_INTENTS and intent_router.is_confident(confidence):
+                NLU_ROUTES.labels(route="local", intent=intent).inc()
+                return self._local_result(intent, confidence)
+        
+        # Order details the rules can read (date, address, quantity) need no LLM,
+        # unless the message also negates, corrects or asks for something else
+        rule_slots: Dict[str, Any] = {}
+        if settings.NLU_ENTITY_RULES_ENABLED and context.get("conversation_state") == "collecting_flower_order":
+            slots = entity_extractor.extract(text)
+            guards = self._slot_guards(text)
+            if slots and not guards:
+                NLU_ROUTES.labels(route="rules", intent="order_flowers").inc()
+                return self._order_result(text, slots, 0.9)
+            if "negation" not in guards and "correction" not in guards:
+                # Only another intent keyword: the LLM decides, the rules fill its gaps
+                rule_slots = slots
         
-        if not self.openai_available:
-            return await self._mock_analyze(text, context)
+        # Keyword rules when OpenAI is not configured or the service is under load
+        if not self.openai_available or admission_controller.degraded:
+            result = await self._mock_analyze(text, context)
+            NLU_ROUTES.labels(route="fallback", intent=result["intent"]).inc()
+            return result
         
         try:
             system_prompt = self._get_system_prompt()
             user_prompt = self._get_user_prompt(text, context)
+            prompt_tokens = token_counter.count(system_prompt) + token_counter.count(user_prompt)
+            NLU_PROMPT_TOKENS.observe(prompt_tokens)
+            logger.info(f"NLU prompt: {prompt_tokens} tokens (budget {settings.NLU_PROMPT_TOKEN_BUDGET})")
             
-            response = await openai.ChatCompletion.acreate(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3,
-                max_tokens=800,
-                timeout=30
-            )
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
             
-            result_text = response.choices[0].message.content
-            result = json.loads(result_text)
+            streaming = on_ready is not None and settings.NLU_STREAMING_ENABLED
+            # Turns inside a flow (order details, confirmations) jump the OpenAI queue
+            priority = PRIORITY_CHAT if context.get("conversation_state", "idle") == "idle" else PRIORITY_FLOW
             
-            logger.info(f"NLU analysis result: {result}")
+            async def attempt(model: str, claim: Callable[[], bool], timeout: float) -> Tuple[Dict[str, Any], bool]:
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + timeout
+                async with llm_governor.slot(model, prompt_tokens, priority) as lease:
+                    timeout = max(0.0, deadline - loop.time())
+                    if streaming:
+                        return await self._stream_completion(model, messages, on_ready, claim, timeout, lease)
+                    return await self._complete(model, messages, claim, timeout, lease)
+            
+            # Primary model, hedged with the secondary one if it is slow
+            model, (result, complete) = await llm_hedger.call(attempt)
+            
+            if rule_slots and result.get("intent") == "order_flowers":
+                result = self._merge_slots(result, rule_slots)
+            logger.info(f"NLU analysis result ({model}): {result}")
+            NLU_ROUTES.labels(route="llm", intent=result.get("intent")).inc()
+            if nlu_cache.enabled and complete:
+                await nlu_cache.set(text, context, result)
+            if semantic_cache.enabled and complete:
+                semantic_cache.set(text, context, result)
             return result
         
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse OpenAI response as JSON: {e}")
             return await self._fallback_analyze(text, context)
+        except asyncio.TimeoutError as e:
+            # Out of time for this turn: keyword rules beat an error message
+            logger.error(f"NLU deadline exceeded: {e}")
+            result = await self._mock_analyze(text, context)
+            NLU_ROUTES.labels(route="fallback", intent=result["intent"]).inc()
+            return result
         except Exception as e:
             logger.error(f"OpenAI API error: {e}")
             return await self._fallback_analyze(text, context)
     
+    async def _complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        claim: Callable[[], bool],
+        timeout: float,
+        lease: Optional[LLMLease] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """One non-streamed completion; returns (result, complete)"""
+        response = await openai.ChatCompletion.acreate(
+            model=model,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=800,
+            timeout=timeout
+        )
+        
+        result_text = response.choices[0].message.content
+        if lease is not None:
+            lease.completion_tokens = token_counter.count(result_text)
+        result = json.loads(result_text)
+        claim()
+        return result, True
+    
+    async def _stream_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        on_ready: ReadyCallback,
+        claim: Callable[[], bool],
+        timeout: float,
+        lease: Optional[LLMLease] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Stream the completion, parsing it incrementally; returns (result, complete)"""
+        start = time.perf_counter()
+        parser = IncrementalJSONObject()
+        dispatched = False
+        try:
+            stream = await self._get_async_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=800,
+                stream=True,
+                timeout=timeout
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                parser.feed(delta)
+                if not dispatched and self._is_dispatchable(parser.fields):
+                    dispatched = True
+                    if not claim():
+                        # A hedged attempt with another model answered first
+                        return parser.fields, False
+                    NLU_STREAM_READY_SECONDS.observe(time.perf_counter() - start)
+                    await on_ready(dict(parser.fields))
+        except Exception as e:
+            if not dispatched:
+                raise
+            # The reply is out already; keep what was parsed
+            logger.warning(f"NLU stream failed after early dispatch: {e}")
+            return parser.fields, False
+        finally:
+            if lease is not None:
+                lease.completion_tokens = token_counter.count(parser.text)
+        
+        if not parser.done:
+            if dispatched:
+                logger.warning("NLU stream ended before the JSON object was complete")
+                return parser.fields, False
+            raise json.JSONDecodeError("Incomplete JSON object in streamed completion", parser.text, len(parser.text))
+        return parser.fields, True
+    
+    @staticmethod
+    def _is_dispatchable(fields: Dict[str, Any]) -> bool:
+        """Intent and response are complete, and so are entities if the intent's handler reads them"""
+        if not isinstance(fields.get("intent"), str) or not isinstance(fields.get("response"), str):
+            return False
+        return fields["intent"] not in ENTITY_INTENTS or "entities" in fields
+    
+    def _get_async_client(self) -> AsyncOpenAI:
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL or None,
+                max_retries=0
+            )
+        return self._async_client
+    
     def _get_system_prompt(self) -> str:
         """Get system prompt for OpenAI"""
         return """Du bist JARVIS, ein intelligenter KI-Assistent wie aus Iron Man. Du hilfst Benutzern bei verschiedenen Aufgaben.
@@ -74,10 +293,20 @@ Verfügbare Intents:
 Antworte IMMER im JSON-Format. Sei freundlich und hilfsbereit wie JARVIS."""
     
     def _get_user_prompt(self, text: str, context: Dict) -> str:
-        """Get user prompt for OpenAI"""
+        """Get user prompt for OpenAI with the context projected into the remaining token budget"""
+        if self._template_tokens is None:
+            self._template_tokens = (
+                token_counter.count(self._get_system_prompt()) +
+                token_counter.count(self._render_user_prompt("", "{}"))
+            )
+        budget = settings.NLU_PROMPT_TOKEN_BUDGET - self._template_tokens - token_counter.count(text)
+        projected = context_projector.project(context, budget)
+        return self._render_user_prompt(text, json.dumps(projected, ensure_ascii=False))
+    
+    def _render_user_prompt(self, text: str, context_json: str) -> str:
         return f"""
 Benutzeranfrage: "{text}"
-Kontext: {json.dumps(context, ensure_ascii=False)}
+Kontext: {context_json}
 
 Beispiel für Blumenbestellung:
 Benutzer: "Bestelle meiner Freundin rote Rosen"
@@ -112,54 +341,19 @@ Analysiere jetzt die Benutzeranfrage:
     
     async def _mock_analyze(self, text: str, context: Dict) -> Dict[str, Any]:
         """Mock analysis when OpenAI is not available"""
-        text_lower = text.lower()
+        intents = keyword_matcher.categories(text, "intent:")
         
         # Greeting
-        if any(greeting in text_lower for greeting in ["hallo", "hi", "hey", "guten tag", "moin"]):
-            return {
-                "intent": "greeting",
-                "entities": {},
-                "confidence": 0.95,
-                "response": "🤖 Hallo! Ich bin JARVIS, Ihr persönlicher KI-Assistent. Wie kann ich Ihnen heute helfen?",
-                "action": "greet_user",
-                "next_step": "await_user_request"
-            }
+        if "greeting" in intents:
+            return self._local_result("greeting", 0.95)
         
         # Flower ordering
-        elif any(word in text_lower for word in ["blumen", "rosen", "bestell", "order"]):
-            return {
-                "intent": "order_flowers",
-                "entities": {
-                    "recipient": self._extract_recipient(text),
-                    "flower_type": self._extract_flower_type(text),
-                    "quantity": None,
-                    "delivery_date": None,
-                    "delivery_address": None
-                },
-                "confidence": 0.85,
-                "response": "🌹 Gerne helfe ich Ihnen bei der Blumenbestellung! Ich benötige noch einige Details wie die Lieferadresse und das gewünschte Lieferdatum.",
-                "action": "collect_order_details",
-                "next_step": "ask_delivery_address"
-            }
+        elif "order_flowers" in intents:
+            return self._order_result(text, entity_extractor.extract(text), 0.85)
         
         # Help
-        elif any(word in text_lower for word in ["hilfe", "help", "was kannst du", "funktionen"]):
-            return {
-                "intent": "help",
-                "entities": {},
-                "confidence": 0.98,
-                "response": """🤖 Ich bin JARVIS und kann Ihnen bei folgenden Aufgaben helfen:
-
-🌹 Blumen bestellen
-📅 Termine planen  
-📧 E-Mails senden
-🌤️ Wetter abfragen
-💬 Allgemeine Fragen beantworten
-
-Probieren Sie es aus: "Bestelle meiner Freundin rote Rosen" """,
-                "action": "show_help",
-                "next_step": "await_user_request"
-            }
+        elif "help" in intents:
+            return self._local_result("help", 0.98)
         
         # Default
         else:
@@ -172,6 +366,58 @@ Probieren Sie es aus: "Bestelle meiner Freundin rote Rosen" """,
                 "next_step": "await_user_request"
             }
     
+    def _local_result(self, intent: str, confidence: float) -> Dict[str, Any]:
+        """Result for an intent answered without the LLM"""
+        return {
+            "intent": intent,
+            "entities": {},
+            "confidence": confidence,
+            **LOCAL_INTENTS[intent]
+        }
+    
+    def _cached_result(self, cached: Dict[str, Any]) -> Dict[str, Any]:
+        """Cached classification with the canned reply; the LLM's own reply was written for another sender"""
+        return {**self._local_result(cached["intent"], cached.get("confidence")), "entities": cached.get("entities") or {}}
+    
+    def _order_result(self, text: str, slots: Dict[str, Any], confidence: float) -> Dict[str, Any]:
+        """Flower order result from keyword and rule-based entity extraction"""
+        return {
+            "intent": "order_flowers",
+            "entities": {
+                "recipient": self._extract_recipient(text),
+                "flower_type": self._extract_flower_type(text),
+                "quantity": slots.get("quantity"),
+                "delivery_date": slots.get("delivery_date"),
+                "delivery_address": slots.get("delivery_address")
+            },
+            "confidence": confidence,
+            "response": "🌹 Gerne helfe ich Ihnen bei der Blumenbestellung! Ich benötige noch einige Details wie die Lieferadresse und das gewünschte Lieferdatum.",
+            "action": "collect_order_details",
+            "next_step": "ask_delivery_address"
+        }
+    
+    @staticmethod
+    def _slot_guards(text: str) -> Set[str]:
+        """Why a message with order details is not a plain answer: negation, correction or another intent"""
+        guards = set()
+        for category in keyword_matcher.categories(text):
+            if category.startswith("guard:"):
+                guards.add(category[len("guard:"):])
+            elif category.startswith("intent:") and category != "intent:order_flowers":
+                guards.add("intent")
+        return guards
+    
+    @staticmethod
+    def _merge_slots(result: Dict[str, Any], slots: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill order slots the LLM left empty with the rule-based values"""
+        entities = result.get("entities")
+        if not isinstance(entities, dict):
+            entities = {}
+        for slot, value in slots.items():
+            if not entities.get(slot):
+                entities[slot] = value
+        return {**result, "entities": entities}
+    
     async def _fallback_analyze(self, text: str, context: Dict) -> Dict[str, Any]:
         """Fallback analysis when OpenAI fails"""
         return {
@@ -185,30 +431,25 @@ Probieren Sie es aus: "Bestelle meiner Freundin rote Rosen" """,
     
     def _extract_recipient(self, text: str) -> Optional[str]:
         """Extract recipient from text"""
-        text_lower = text.lower()
-        if "freundin" in text_lower:
-            return "Freundin"
-        elif "freund" in text_lower:
-            return "Freund"
-        elif "mutter" in text_lower or "mama" in text_lower:
-            return "Mutter"
-        elif "vater" in text_lower or "papa" in text_lower:
-            return "Vater"
+        recipients = keyword_matcher.categories(text, "recipient:")
+        for recipient in ("Freundin", "Freund", "Mutter", "Vater"):
+            if recipient in recipients:
+                return recipient
         return None
     
     def _extract_flower_type(self, text: str) -> Optional[str]:
         """Extract flower type from text"""
-        text_lower = text.lower()
-        if "rosen" in text_lower or "rose" in text_lower:
-            if "rot" in text_lower:
+        hits = keyword_matcher.categories(text)
+        if "flower:rosen" in hits:
+            if "color:rot" in hits:
                 return "rote Rosen"
-            elif "weiß" in text_lower:
+            elif "color:weiß" in hits:
                 return "weiße Rosen"
             else:
                 return "Rosen"
-        elif "tulpen" in text_lower:
+        elif "flower:tulpen" in hits:
             return "Tulpen"
-        elif "sonnenblumen" in text_lower:
+        elif "flower:sonnenblumen" in hits:
             return "Sonnenblumen"
         return None
 
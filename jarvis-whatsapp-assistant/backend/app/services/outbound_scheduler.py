@@ -0,0 +1,392 @@
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from app.core.config import settings
+from app.core.metrics import (
+    OUTBOUND_QUEUE_DEPTH,
+    OUTBOUND_QUEUE_SECONDS,
+    OUTBOUND_RATE_LIMIT_WAIT_SECONDS,
+    OUTBOUND_SENDS,
+    OUTBOUND_SPILL
+)
+from app.core.redis_client import redis_client
+from app.services.circuit_breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitOpenError
+from app.services.whatsapp_client import WhatsAppAPIError, WhatsAppClient, whatsapp_client
+
+logger = logging.getLogger(__name__)
+
+# Lower value goes first
+PRIORITY_REPLY = 0
+PRIORITY_BULK = 1
+
+PRIORITY_NAMES = {PRIORITY_REPLY: "reply", PRIORITY_BULK: "bulk"}
+
+# Refill-and-take on a hash {tokens, ts}; returns 0 when a token was taken,
+# otherwise the milliseconds until the next token is available
+TOKEN_BUCKET_SCRIPT = """
+-- token_bucket
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait
+"""
+
+class TokenBucket:
+    """Token bucket per phone number ID.
+
+    The bucket state lives in Redis and is updated by one Lua script, so all
+    replicas draw from the same budget. While Redis is unavailable each
+    replica falls back to an in-process bucket with the same parameters.
+    """
+
+    REDIS_RETRY_SECONDS = 30.0
+
+    def __init__(self, rate: Optional[float] = None, capacity: Optional[int] = None):
+        self.rate = rate or settings.OUTBOUND_RATE_PER_SECOND
+        self.capacity = capacity or settings.OUTBOUND_BURST
+        self.local: Dict[str, Tuple[float, float]] = {}
+        self._redis_retry_at = 0.0
+
+    async def acquire(self, key: str):
+        """Wait until a token for `key` is available and take it"""
+        started = time.perf_counter()
+        while True:
+            wait_ms = await self.take(key)
+            if wait_ms <= 0:
+                break
+            await asyncio.sleep(wait_ms / 1000)
+        OUTBOUND_RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+    async def take(self, key: str) -> float:
+        """Try to take a token, returns 0 on success or the milliseconds to wait"""
+        if time.monotonic() >= self._redis_retry_at:
+            wait_ms = await redis_client.eval(
+                TOKEN_BUCKET_SCRIPT, [f"outbound_bucket:{key}"], [self.rate, self.capacity]
+            )
+            if wait_ms is not None:
+                return float(wait_ms)
+            # Don't hit a broken Redis on every send
+            self._redis_retry_at = time.monotonic() + self.REDIS_RETRY_SECONDS
+        return self._take_local(key)
+
+    def _take_local(self, key: str) -> float:
+        now = time.monotonic()
+        tokens, updated = self.local.get(key, (float(self.capacity), now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self.local[key] = (tokens - 1, now)
+            return 0.0
+        self.local[key] = (tokens, now)
+        return (1 - tokens) * 1000 / self.rate
+
+class OutboundJob:
+    """One message waiting to be sent"""
+
+    __slots__ = ("to", "message", "priority", "phone_number_id", "attempts", "submitted_at", "future")
+
+    def __init__(self, to: str, message: Dict[str, Any], priority: int, phone_number_id: str, future: asyncio.Future):
+        self.to = to
+        self.message = message
+        self.priority = priority
+        self.phone_number_id = phone_number_id
+        self.attempts = 0
+        self.submitted_at = time.perf_counter()
+        self.future = future
+
+class OutboundScheduler:
+    """Priority queue in front of WhatsAppClient.send_message.
+
+    Workers take the most urgent job, wait for a token of the sending phone
+    number and send it. Transient failures (network errors, 429 and 5xx)
+    are retried with exponential backoff and full jitter; jobs that run out
+    of attempts or fail permanently are pushed to a Redis dead-letter list.
+
+    While the client's circuit breaker is open, jobs are spilled to a Redis
+    list instead (their callers get {"spilled": True}) and drained back into
+    the queue by a background loop: a small batch while half-open, larger
+    ones once the breaker has closed. Entries stay in the list until their
+    batch has been sent, dead-lettered or spilled again, so a restart
+    mid-batch sends it again rather than losing it.
+    """
+
+    def __init__(
+        self,
+        client: Optional[WhatsAppClient] = None,
+        bucket: Optional[TokenBucket] = None,
+        workers: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        retry_base: Optional[float] = None,
+        retry_max: Optional[float] = None
+    ):
+        self.client = client or whatsapp_client
+        self.bucket = bucket or TokenBucket()
+        self.workers = workers or settings.OUTBOUND_WORKERS
+        self.max_attempts = max_attempts or settings.OUTBOUND_MAX_ATTEMPTS
+        self.retry_base = retry_base or settings.OUTBOUND_RETRY_BASE_SECONDS
+        self.retry_max = retry_max or settings.OUTBOUND_RETRY_MAX_SECONDS
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._retries: Dict[OutboundJob, asyncio.TimerHandle] = {}
+        self._sequence = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._spill_event: Optional[asyncio.Event] = None
+        self.owner = uuid.uuid4().hex
+        breaker = getattr(self.client, "breaker", None)
+        if breaker is not None:
+            breaker.listeners.append(self._on_breaker_state)
+
+    async def start(self):
+        """Start the send workers (called from the app lifespan)"""
+        self._ensure_started()
+        logger.info(f"Outbound scheduler started with {self.workers} workers")
+
+    async def stop(self):
+        """Stop the send workers; queued jobs are failed"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        pending = list(self._retries)
+        for handle in self._retries.values():
+            handle.cancel()
+        self._retries = {}
+        while self.queue and not self.queue.empty():
+            pending.append(self.queue.get_nowait()[2])
+        for job in pending:
+            if not job.future.done():
+                job.future.set_exception(RuntimeError("Outbound scheduler stopped"))
+        OUTBOUND_QUEUE_DEPTH.set(0)
+        self._loop = None
+
+    def submit(self, to: str, message: Dict[str, Any], priority: int = PRIORITY_REPLY) -> asyncio.Future:
+        """Queue a message, returns a future resolved with the API response"""
+        self._ensure_started()
+        job = OutboundJob(to, message, priority, self.client.phone_number_id, self._loop.create_future())
+        self._enqueue(job)
+        return job.future
+
+    async def send_message(self, to: str, message: Dict[str, Any], priority: int = PRIORITY_REPLY) -> Dict[str, Any]:
+        """Send through the scheduler and wait for the result"""
+        return await self.submit(to, message, priority)
+
+    async def send_text_message(self, to: str, text: str, priority: int = PRIORITY_REPLY) -> Dict[str, Any]:
+        """Send text message"""
+        return await self.send_message(to, {"type": "text", "text": {"body": text}}, priority)
+
+    async def send_template_message(
+        self,
+        to: str,
+        template_name: str,
+        language_code: str = "de",
+        parameters: Optional[List[str]] = None,
+        priority: int = PRIORITY_BULK
+    ) -> Dict[str, Any]:
+        """Send template message, bulk priority by default"""
+        message = WhatsAppClient.build_template_message(template_name, language_code, parameters)
+        return await self.send_message(to, message, priority)
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        # Fresh queue and workers for this event loop
+        self.queue = asyncio.PriorityQueue()
+        self._retries = {}
+        self._spill_event = asyncio.Event()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._spill_loop()))
+        self._loop = loop
+
+    def _enqueue(self, job: OutboundJob):
+        self.queue.put_nowait((job.priority, next(self._sequence), job))
+        OUTBOUND_QUEUE_DEPTH.set(self.queue.qsize())
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self.queue.get()
+            OUTBOUND_QUEUE_DEPTH.set(self.queue.qsize())
+            try:
+                await self._send(job)
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Unexpected outbound scheduler error: {e}")
+                if not job.future.done():
+                    job.future.set_exception(e)
+
+    async def _send(self, job: OutboundJob):
+        priority = PRIORITY_NAMES.get(job.priority, str(job.priority))
+        if job.attempts == 0:
+            OUTBOUND_QUEUE_SECONDS.labels(priority=priority).observe(time.perf_counter() - job.submitted_at)
+
+        if self.client.breaker.state == STATE_OPEN:
+            await self._spill(job)
+            return
+
+        await self.bucket.acquire(job.phone_number_id)
+        job.attempts += 1
+        try:
+            result = await self.client.send_message(job.to, job.message)
+        except CircuitOpenError:
+            job.attempts -= 1
+            await self._spill(job)
+            return
+        except Exception as e:
+            if self._is_retryable(e) and job.attempts < self.max_attempts:
+                delay = self._backoff(job.attempts)
+                logger.warning(f"Send to {job.to} failed (attempt {job.attempts}), retrying in {delay:.2f}s: {e}")
+                OUTBOUND_SENDS.labels(priority=priority, result="retried").inc()
+                self._schedule_retry(job, delay)
+                return
+            OUTBOUND_SENDS.labels(priority=priority, result="dead_lettered").inc()
+            await self._dead_letter(job, e)
+            if not job.future.done():
+                job.future.set_exception(e)
+            return
+
+        OUTBOUND_SENDS.labels(priority=priority, result="sent").inc()
+        if not job.future.done():
+            job.future.set_result(result)
+
+    def _schedule_retry(self, job: OutboundJob, delay: float):
+        # Requeue later instead of holding a worker for the backoff
+        self._retries[job] = self._loop.call_later(delay, self._retry, job)
+
+    def _retry(self, job: OutboundJob):
+        self._retries.pop(job, None)
+        if not job.future.done():
+            self._enqueue(job)
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, WhatsAppAPIError):
+            return error.status == 429 or error.status >= 500
+        return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+    async def _spill(self, job: OutboundJob):
+        """Park a job in Redis until the breaker lets traffic through again"""
+        entry = json.dumps({
+            "to": job.to,
+            "message": job.message,
+            "priority": job.priority,
+            "phone_number_id": job.phone_number_id,
+            "attempts": job.attempts
+        }, ensure_ascii=False)
+        if not await redis_client.rpush(settings.OUTBOUND_SPILL_KEY, entry):
+            if not job.future.done():
+                job.future.set_exception(CircuitOpenError("WhatsApp API unavailable and spill list unreachable"))
+            return
+        OUTBOUND_SPILL.labels(result="spilled").inc()
+        if not job.future.done():
+            job.future.set_result({"spilled": True})
+
+    async def drain_spill(self, limit: int) -> int:
+        """Send up to `limit` spilled jobs through the queue and wait for them, returns how many"""
+        lock_key = f"{settings.OUTBOUND_SPILL_KEY}:drain_lock"
+        # One replica drains at a time: entries are only removed once their batch is done
+        if await redis_client.set_nx(lock_key, self.owner, settings.OUTBOUND_SPILL_LOCK_TTL_SECONDS) is False:
+            return 0
+
+        try:
+            entries = await redis_client.lrange(settings.OUTBOUND_SPILL_KEY, 0, limit - 1)
+            jobs = []
+            for raw in entries:
+                try:
+                    entry = json.loads(raw)
+                except json.JSONDecodeError:
+                    logger.error(f"Dropping invalid spill entry: {raw[:200]}")
+                    continue
+
+                job = OutboundJob(
+                    entry["to"],
+                    entry["message"],
+                    entry["priority"],
+                    entry["phone_number_id"],
+                    self._loop.create_future()
+                )
+                job.attempts = entry.get("attempts", 0)
+                self._enqueue(job)
+                jobs.append(job)
+
+            # Jobs that hit the breaker again were appended to the list by _spill
+            await asyncio.gather(*(job.future for job in jobs), return_exceptions=True)
+            if entries:
+                await redis_client.ltrim(settings.OUTBOUND_SPILL_KEY, len(entries), -1)
+        finally:
+            await redis_client.release_lock(lock_key, self.owner)
+
+        if jobs:
+            OUTBOUND_SPILL.labels(result="drained").inc(len(jobs))
+            logger.info(f"Drained {len(jobs)} spilled outbound messages")
+        return len(entries)
+
+    def _on_breaker_state(self, state: str):
+        if self._spill_event and state in (STATE_HALF_OPEN, STATE_CLOSED):
+            self._spill_event.set()
+
+    async def _spill_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._spill_event.wait(), timeout=settings.OUTBOUND_SPILL_CHECK_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._spill_event.clear()
+
+            try:
+                state = self.client.breaker.state
+                if state == STATE_CLOSED:
+                    while await self.drain_spill(settings.OUTBOUND_SPILL_DRAIN_BATCH):
+                        if self.client.breaker.state != STATE_CLOSED:
+                            break
+                elif state == STATE_HALF_OPEN:
+                    # Probes decide whether the breaker closes; the rest of the batch is spilled again
+                    await self.drain_spill(settings.OUTBOUND_SPILL_PROBE_BATCH)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error draining spilled outbound messages: {e}")
+
+    async def _dead_letter(self, job: OutboundJob, error: Exception):
+        logger.error(f"Dead-lettering message to {job.to} after {job.attempts} attempts: {error}")
+        entry = json.dumps({
+            "to": job.to,
+            "message": job.message,
+            "priority": job.priority,
+            "phone_number_id": job.phone_number_id,
+            "attempts": job.attempts,
+            "error": str(error),
+            "failed_at": int(time.time())
+        }, ensure_ascii=False)
+        await redis_client.rpush(settings.OUTBOUND_DEAD_LETTER_KEY, entry)
+        await redis_client.ltrim(settings.OUTBOUND_DEAD_LETTER_KEY, -settings.OUTBOUND_DEAD_LETTER_MAXLEN, -1)
+
+# Global outbound scheduler instance
+outbound_scheduler = OutboundScheduler()
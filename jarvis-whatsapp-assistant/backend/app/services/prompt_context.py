@@ -0,0 +1,92 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+try:
+    import tiktoken
+except ImportError:  # token counts fall back to an estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Context fields the LLM needs per conversation state, most important first.
+# Everything else in the user context (user_id, counters, last_message,
+# active_tasks, ...) is never sent.
+STATE_FIELDS: Dict[str, List[str]] = {
+    "idle": ["conversation_state", "last_intent", "last_response", "preferences"],
+    "collecting_flower_order": ["conversation_state", "active_order", "last_intent", "last_response", "preferences"],
+    "confirming_flower_order": ["conversation_state", "pending_order", "last_intent", "last_response"]
+}
+
+class TokenCounter:
+    """Counts tokens with the model's tiktoken encoding, or estimates 4 characters per token.
+
+    tiktoken downloads the encoding file on first use, so servers call
+    load() at startup; otherwise the first count() blocks while it loads.
+    """
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model or settings.OPENAI_MODEL
+        self._encoding = None
+        self._loaded = False
+
+    async def load(self):
+        """Load the encoding in a worker thread instead of on the first count()"""
+        if not self._loaded:
+            await asyncio.get_running_loop().run_in_executor(None, self._get_encoding)
+
+    @property
+    def exact(self) -> bool:
+        return self._get_encoding() is not None
+
+    def count(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is None:
+            return (len(text) + 3) // 4
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def _get_encoding(self):
+        if not self._loaded:
+            self._loaded = True
+            if tiktoken is not None:
+                try:
+                    try:
+                        self._encoding = tiktoken.encoding_for_model(self.model)
+                    except KeyError:
+                        self._encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    # The encoding file is downloaded on first use
+                    logger.warning(f"tiktoken encoding unavailable, estimating tokens: {e}")
+        return self._encoding
+
+class ContextProjector:
+    """Projects the user context onto the fields relevant for its state, within a token budget"""
+
+    def __init__(self, counter: Optional[TokenCounter] = None, max_field_chars: Optional[int] = None):
+        self.counter = counter or token_counter
+        self.max_field_chars = max_field_chars or settings.NLU_CONTEXT_MAX_FIELD_CHARS
+
+    def project(self, context: Dict[str, Any], budget_tokens: int) -> Dict[str, Any]:
+        """Relevant, non-empty fields in priority order; a field that does not fit is skipped"""
+        state = context.get("conversation_state") or "idle"
+        fields = STATE_FIELDS.get(state, STATE_FIELDS["idle"])
+
+        projected: Dict[str, Any] = {}
+        for field in fields:
+            value = context.get(field)
+            if value in (None, "", {}, []):
+                continue
+            if isinstance(value, str) and len(value) > self.max_field_chars:
+                value = value[:self.max_field_chars] + "…"
+
+            candidate = {**projected, field: value}
+            if self.counter.count(json.dumps(candidate, ensure_ascii=False)) <= budget_tokens:
+                projected = candidate
+        return projected
+
+# Global token counter and context projector instances
+token_counter = TokenCounter()
+context_projector = ContextProjector()
@@ -0,0 +1,162 @@
+import copy
+import logging
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import NLU_CACHE_LOOKUPS, NLU_CACHE_STORES, NLU_SEMANTIC_SIMILARITY
+from app.services.intent_classifier import char_ngrams
+from app.services.keyword_matcher import keyword_matcher
+from app.services.nlu_cache import CACHEABLE_INTENTS, NLUCache, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Intents whose answer does not depend on the exact wording, so the result
+# of a similar message can be reused
+SEMANTIC_INTENTS = {"greeting", "help", "goodbye"}
+
+# A hit is rejected when the message is this much longer than the cached one
+MAX_LENGTH_RATIO = 1.6
+
+def hashed_vector(text: str, dim: int) -> np.ndarray:
+    """L2-normalized signed feature hashing of the character n-grams of a text"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for gram in char_ngrams(text):
+        digest = zlib.crc32(gram.encode("utf-8"))
+        # Low bits pick the bucket, the top bit the sign, so collisions cancel out on average
+        vector[digest % dim] += 1.0 if digest & 0x80000000 else -1.0
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    return vector
+
+class SemanticCache:
+    """Nearest-neighbour reuse of NLU results for near-duplicate messages.
+
+    Messages are embedded offline as hashed character n-gram vectors and
+    kept as rows of one contiguous matrix, so a lookup is a single
+    matrix-vector product over all entries. A result is reused when the
+    most similar entry with the same conversation state and last intent
+    scores above the threshold and the message does not add content to
+    it ("Hallo Jarvis, Rosen" is not "Hallo Jarvis"). The index is bounded;
+    the least recently used row is overwritten when it is full.
+    """
+
+    def __init__(
+        self,
+        capacity: Optional[int] = None,
+        dim: Optional[int] = None,
+        threshold: Optional[float] = None
+    ):
+        self.capacity = capacity or settings.NLU_SEMANTIC_CACHE_SIZE
+        self.dim = dim or settings.NLU_SEMANTIC_CACHE_DIM
+        self.threshold = threshold or settings.NLU_SEMANTIC_CACHE_THRESHOLD
+        self.vectors = np.zeros((self.capacity, self.dim), dtype=np.float32)
+        self.partitions = np.full(self.capacity, -1, dtype=np.int32)  # -1: free row
+        self.expires_at = np.zeros(self.capacity, dtype=np.float64)
+        self.results: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+        self.texts: List[str] = [""] * self.capacity
+        # Rows in least recently used order
+        self.lru: "OrderedDict[int, None]" = OrderedDict()
+        # Rows are taken lowest first; everything from here on is still unused
+        self.rows_used = 0
+        self._partition_ids: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.NLU_SEMANTIC_CACHE_ENABLED
+
+    def __len__(self) -> int:
+        return len(self.lru)
+
+    def get(self, text: str, context: Dict) -> Optional[Dict[str, Any]]:
+        """Result of the most similar cached message, if similar enough"""
+        if not self._is_short(text) or not self.lru:
+            return None
+        row, score = self._nearest(hashed_vector(text, self.dim), self._partition(context))
+        NLU_SEMANTIC_SIMILARITY.observe(max(score, 0.0))
+        if row is None or score < self.threshold or self._adds_content(text, self.texts[row]):
+            NLU_CACHE_LOOKUPS.labels(result="semantic_miss").inc()
+            return None
+
+        self.lru.move_to_end(row)
+        NLU_CACHE_LOOKUPS.labels(result="semantic_hit").inc()
+        logger.debug(f"Semantic cache hit {score:.2f}: {text!r} ~ {self.texts[row]!r}")
+        return copy.deepcopy(self.results[row])
+
+    def set(self, text: str, context: Dict, result: Dict[str, Any]) -> bool:
+        """Index a result if its intent is safe to reuse for similar messages"""
+        if result.get("intent") not in SEMANTIC_INTENTS or not NLUCache.ttl_for(result):
+            return False
+        if not self._is_short(text):
+            return False
+
+        vector = hashed_vector(text, self.dim)
+        partition = self._partition(context)
+        row, score = self._nearest(vector, partition)
+        if row is None or score < 0.999:
+            # New row: a free one, or the least recently used
+            row = self._free_row()
+            if row is None:
+                row, _ = self.lru.popitem(last=False)
+
+        self.vectors[row] = vector
+        self.partitions[row] = partition
+        self.expires_at[row] = time.time() + CACHEABLE_INTENTS[result["intent"]]
+        self.results[row] = NLUCache.classification(result)
+        self.texts[row] = text
+        self.lru[row] = None
+        self.lru.move_to_end(row)
+        self.rows_used = max(self.rows_used, row + 1)
+        NLU_CACHE_STORES.labels(intent=f"semantic:{result['intent']}").inc()
+        return True
+
+    def _nearest(self, vector: np.ndarray, partition: int):
+        """(row, cosine similarity) of the best live entry in the partition, or (None, 0.0)"""
+        used = self.rows_used
+        scores = self.vectors[:used] @ vector
+        live = (self.partitions[:used] == partition) & (self.expires_at[:used] > time.time())
+        if not live.any():
+            return None, 0.0
+        scores = np.where(live, scores, -np.inf)
+        row = int(np.argmax(scores))
+        return row, float(scores[row])
+
+    def _free_row(self) -> Optional[int]:
+        if len(self.lru) < self.capacity:
+            free = np.flatnonzero(self.partitions == -1)
+            if free.size:
+                return int(free[0])
+        # Expired rows are free as well
+        expired = np.flatnonzero((self.partitions != -1) & (self.expires_at <= time.time()))
+        if expired.size:
+            row = int(expired[0])
+            self.lru.pop(row, None)
+            return row
+        return None
+
+    def _partition(self, context: Dict) -> int:
+        # Same context fields as the exact cache key
+        key = f"{context.get('conversation_state') or 'idle'}|{context.get('last_intent') or ''}"
+        return self._partition_ids.setdefault(key, len(self._partition_ids))
+
+    @staticmethod
+    def _adds_content(text: str, cached: str) -> bool:
+        """Whether a message says more than the cached one it is similar to"""
+        if len(normalize_text(text)) > MAX_LENGTH_RATIO * len(normalize_text(cached)):
+            return True
+        # Intents, flowers, recipients, ... the cached message does not mention
+        topics = {c for c in keyword_matcher.categories(text) if not c.startswith("language:")}
+        return bool(topics - keyword_matcher.categories(cached))
+
+    @staticmethod
+    def _is_short(text: str) -> bool:
+        normalized = normalize_text(text)
+        return bool(normalized) and len(normalized) <= settings.NLU_CACHE_MAX_TEXT_LENGTH
+
+# Global semantic cache instance
+semantic_cache = SemanticCache()
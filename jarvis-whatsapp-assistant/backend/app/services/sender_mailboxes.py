@@ -0,0 +1,102 @@
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[Any]]
+
+class SenderMailbox:
+    """Queue and worker task owned by a single sender"""
+
+    __slots__ = ("queue", "task", "last_active")
+
+    def __init__(self):
+        self.queue: "asyncio.Queue[Tuple[Job, asyncio.Future, contextvars.Context]]" = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+        self.last_active = time.monotonic()
+
+class SenderMailboxes:
+    """Actor-style dispatcher: one in-process mailbox per sender.
+
+    Jobs of one sender run strictly one after another, so the read/modify/
+    write cycle on the sender's context never interleaves. Different
+    senders run in parallel, bounded only by the shared concurrency limit.
+    A mailbox and its worker disappear after being idle for
+    MAILBOX_IDLE_SECONDS.
+
+    Each job runs in a copy of the context it was submitted from, not the
+    one the mailbox worker happened to start in, so per-request context
+    variables (e.g. whether the request was admitted) follow the job.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, idle_seconds: Optional[float] = None):
+        self.max_concurrency = max_concurrency or settings.MESSAGE_DISPATCH_CONCURRENCY
+        self.idle_seconds = idle_seconds if idle_seconds is not None else settings.MAILBOX_IDLE_SECONDS
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.mailboxes: Dict[str, SenderMailbox] = {}
+
+    def __len__(self) -> int:
+        return len(self.mailboxes)
+
+    def submit(self, sender_id: str, job: Job) -> asyncio.Future:
+        """Queue a job for a sender, returns a future resolved with the job's result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        mailbox = self.mailboxes.get(sender_id)
+        # A worker from a finished or foreign event loop can never drain the queue
+        if mailbox is None or mailbox.task.done() or mailbox.task.get_loop() is not loop:
+            mailbox = SenderMailbox()
+            self.mailboxes[sender_id] = mailbox
+            mailbox.task = asyncio.create_task(self._run(sender_id, mailbox))
+
+        mailbox.queue.put_nowait((job, future, contextvars.copy_context()))
+        return future
+
+    async def _run(self, sender_id: str, mailbox: SenderMailbox):
+        """Drain one sender's mailbox until it stays idle"""
+        while True:
+            try:
+                job, future, context = await asyncio.wait_for(mailbox.queue.get(), timeout=self.idle_seconds)
+            except asyncio.TimeoutError:
+                # No await between the emptiness check and the removal, so
+                # submit() cannot slip a job into an evicted mailbox
+                if mailbox.queue.empty():
+                    self.mailboxes.pop(sender_id, None)
+                    logger.debug(f"Evicted idle mailbox for {sender_id}")
+                    return
+                continue
+
+            mailbox.last_active = time.monotonic()
+            try:
+                async with self.semaphore:
+                    result = await asyncio.create_task(job(), context=context)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self):
+        """Cancel all mailbox workers and their pending jobs"""
+        mailboxes = list(self.mailboxes.values())
+        tasks = [mailbox.task for mailbox in mailboxes if mailbox.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for mailbox in mailboxes:
+            while not mailbox.queue.empty():
+                _, future, _ = mailbox.queue.get_nowait()
+                future.cancel()
+        self.mailboxes.clear()
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import SIDE_EFFECTS, SIDE_EFFECTS_PENDING
+from app.services.whatsapp_client import WhatsAppClient, whatsapp_client
+
+logger = logging.getLogger(__name__)
+
+SideEffect = Callable[[], Awaitable]
+
+class SideEffectLane:
+    """Fire-and-forget lane for calls that must not delay message handling.
+
+    Jobs are keyed; submitting a job whose key is still pending replaces the
+    queued one, so e.g. several read receipts for one sender collapse into a
+    single call for the newest message. The lane is bounded: when it is full
+    the oldest pending job is dropped.
+    """
+
+    def __init__(
+        self,
+        client: Optional[WhatsAppClient] = None,
+        workers: Optional[int] = None,
+        max_pending: Optional[int] = None
+    ):
+        self.client = client or whatsapp_client
+        self.workers = workers or settings.SIDE_EFFECT_WORKERS
+        self.max_pending = max_pending or settings.SIDE_EFFECT_MAX_PENDING
+        self.pending: "OrderedDict[str, Tuple[str, SideEffect]]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._running = 0
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self):
+        """Start the lane workers (called from the app lifespan)"""
+        self._ensure_started()
+        logger.info(f"Side-effect lane started with {self.workers} workers")
+
+    async def stop(self, timeout: float = 5.0):
+        """Give pending side effects a moment to finish, then stop the workers"""
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self.drain(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Stopping side-effect lane with {len(self.pending)} pending jobs")
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        self.pending.clear()
+        SIDE_EFFECTS_PENDING.set(0)
+
+    async def drain(self):
+        """Wait until no side effect is pending or running"""
+        while self.pending or self._running:
+            self._idle.clear()
+            await self._idle.wait()
+
+    def submit(self, key: str, kind: str, job: SideEffect):
+        """Queue a side effect; replaces a still-pending job with the same key"""
+        self._ensure_started()
+        if key in self.pending:
+            SIDE_EFFECTS.labels(kind=kind, result="coalesced").inc()
+            del self.pending[key]
+        elif len(self.pending) >= self.max_pending:
+            _, (dropped_kind, _) = self.pending.popitem(last=False)
+            SIDE_EFFECTS.labels(kind=dropped_kind, result="dropped").inc()
+
+        self.pending[key] = (kind, job)
+        SIDE_EFFECTS_PENDING.set(len(self.pending))
+        self._wakeup.set()
+
+    def mark_read(self, sender_id: str, message_id: str, typing: bool = False):
+        """Send a read receipt (optionally with typing indicator) in the background.
+
+        Marking the newest message read covers the earlier ones, so only the
+        latest receipt per sender is kept.
+        """
+        self.submit(
+            f"read:{sender_id}",
+            "read_receipt",
+            lambda: self.client.mark_message_as_read(message_id, typing=typing)
+        )
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._running = 0
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._loop = loop
+
+    async def _worker(self):
+        while True:
+            if not self.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            _, (kind, job) = self.pending.popitem(last=False)
+            SIDE_EFFECTS_PENDING.set(len(self.pending))
+            self._running += 1
+            try:
+                await job()
+                SIDE_EFFECTS.labels(kind=kind, result="done").inc()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Side effect {kind} failed: {e}")
+                SIDE_EFFECTS.labels(kind=kind, result="failed").inc()
+            finally:
+                self._running -= 1
+                if not self.pending and not self._running:
+                    self._idle.set()
+
+# Global side-effect lane instance
+side_effects = SideEffectLane()
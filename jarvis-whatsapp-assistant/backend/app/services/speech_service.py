@@ -1,15 +1,18 @@
 import asyncio
 import logging
-import tempfile
-import os
-from typing import Optional
+from typing import BinaryIO, Iterator, Optional, Union
 from google.cloud import speech
 from google.cloud import texttospeech
 import aiohttp
 from app.core.config import settings
+from app.services.keyword_matcher import keyword_matcher
 
 logger = logging.getLogger(__name__)
 
+AudioInput = Union[bytes, BinaryIO]
+
+PCM_CHUNK_BYTES = 64 * 1024
+
 class SpeechService:
     def __init__(self):
         self.speech_client = None
@@ -30,8 +33,8 @@ class SpeechService:
             logger.error(f"Failed to initialize Google Cloud clients: {e}")
             logger.info("Falling back to mock speech service")
     
-    async def transcribe_audio(self, audio_data: bytes, audio_format: str = "ogg") -> Optional[str]:
-        """Transcribe audio to text"""
+    async def transcribe_audio(self, audio_data: AudioInput, audio_format: str = "ogg") -> Optional[str]:
+        """Transcribe audio (bytes or a readable file such as a spooled download) to text"""
         try:
             if self.speech_client:
                 return await self._transcribe_with_google(audio_data, audio_format)
@@ -41,17 +44,23 @@ class SpeechService:
             logger.error(f"Error transcribing audio: {e}")
             return None
     
-    async def _transcribe_with_google(self, audio_data: bytes, audio_format: str) -> Optional[str]:
+    async def _transcribe_with_google(self, audio_data: AudioInput, audio_format: str) -> Optional[str]:
         """Transcribe using Google Cloud Speech-to-Text"""
         try:
             # Convert audio format if needed
             if audio_format.lower() == "ogg":
-                # WhatsApp sends OGG files, convert to supported format
-                audio_data = await self._convert_audio_format(audio_data, "ogg", "wav")
-                encoding = speech.RecognitionConfig.AudioEncoding.LINEAR16
+                # WhatsApp sends OGG/Opus, decode to raw 16 kHz mono PCM
+                content = await self._convert_to_pcm(audio_data)
+                if content is not None:
+                    encoding = speech.RecognitionConfig.AudioEncoding.LINEAR16
+                else:
+                    content = self._read_all(audio_data)
+                    encoding = speech.RecognitionConfig.AudioEncoding.OGG_OPUS
             elif audio_format.lower() == "mp3":
+                content = self._read_all(audio_data)
                 encoding = speech.RecognitionConfig.AudioEncoding.MP3
             else:
+                content = self._read_all(audio_data)
                 encoding = speech.RecognitionConfig.AudioEncoding.LINEAR16
             
             # Configure recognition
@@ -65,7 +74,7 @@ class SpeechService:
                 model="latest_long"
             )
             
-            audio = speech.RecognitionAudio(content=audio_data)
+            audio = speech.RecognitionAudio(content=content)
             
             # Perform recognition
             response = self.speech_client.recognize(config=config, audio=audio)
@@ -87,7 +96,7 @@ class SpeechService:
             logger.error(f"Google Speech-to-Text error: {e}")
             return None
     
-    async def _mock_transcribe(self, audio_data: bytes, audio_format: str) -> str:
+    async def _mock_transcribe(self, audio_data: AudioInput, audio_format: str) -> str:
         """Mock transcription for development"""
         # Simulate processing time
         await asyncio.sleep(1)
@@ -104,48 +113,70 @@ class SpeechService:
         import random
         return random.choice(mock_responses)
     
-    async def _convert_audio_format(self, audio_data: bytes, from_format: str, to_format: str) -> bytes:
-        """Convert audio format using ffmpeg"""
+    async def _convert_to_pcm(self, audio_data: AudioInput) -> Optional[bytes]:
+        """Decode audio to s16le 16 kHz mono with ffmpeg, streaming through pipes"""
         try:
-            # Create temporary files
-            with tempfile.NamedTemporaryFile(suffix=f".{from_format}", delete=False) as input_file:
-                input_file.write(audio_data)
-                input_path = input_file.name
-            
-            output_path = input_path.replace(f".{from_format}", f".{to_format}")
-            
-            # Use ffmpeg to convert
-            import subprocess
-            result = subprocess.run([
-                "ffmpeg", "-i", input_path, 
+            process = await asyncio.create_subprocess_exec(
+                "ffmpeg", "-hide_banner", "-loglevel", "error",
+                "-i", "pipe:0",
+                "-f", "s16le", "-acodec", "pcm_s16le",
                 "-ar", "16000",  # Sample rate
                 "-ac", "1",      # Mono
-                "-y",            # Overwrite output
-                output_path
-            ], capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                # Read converted file
-                with open(output_path, "rb") as f:
-                    converted_data = f.read()
-                
-                # Clean up
-                os.unlink(input_path)
-                os.unlink(output_path)
-                
-                return converted_data
-            else:
-                logger.error(f"FFmpeg conversion failed: {result.stderr}")
-                # Clean up
-                os.unlink(input_path)
-                if os.path.exists(output_path):
-                    os.unlink(output_path)
-                
-                return audio_data  # Return original if conversion fails
-                
+                "pipe:1",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except Exception as e:
+            logger.error(f"Audio conversion error: {e}")
+            return None
+        
+        async def feed():
+            try:
+                for chunk in self._iter_chunks(audio_data):
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                # ffmpeg exited early, its stderr says why
+                pass
+            finally:
+                process.stdin.close()
+        
+        try:
+            # Feed stdin while draining stdout/stderr so neither pipe can fill up
+            _, pcm, stderr = await asyncio.gather(feed(), process.stdout.read(), process.stderr.read())
+            await process.wait()
         except Exception as e:
             logger.error(f"Audio conversion error: {e}")
-            return audio_data
+            if process.returncode is None:
+                process.kill()
+            return None
+        
+        if process.returncode != 0:
+            logger.error(f"FFmpeg conversion failed: {stderr.decode(errors='replace')}")
+            return None
+        return pcm
+    
+    @staticmethod
+    def _iter_chunks(audio_data: AudioInput) -> Iterator[bytes]:
+        if isinstance(audio_data, (bytes, bytearray)):
+            view = memoryview(audio_data)
+            for start in range(0, len(view), PCM_CHUNK_BYTES):
+                yield view[start:start + PCM_CHUNK_BYTES]
+            return
+        audio_data.seek(0)
+        while True:
+            chunk = audio_data.read(PCM_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+    
+    @staticmethod
+    def _read_all(audio_data: AudioInput) -> bytes:
+        if isinstance(audio_data, (bytes, bytearray)):
+            return bytes(audio_data)
+        audio_data.seek(0)
+        return audio_data.read()
     
     async def text_to_speech(self, text: str, language_code: str = "de-DE") -> Optional[bytes]:
         """Convert text to speech"""
@@ -201,12 +232,9 @@ class SpeechService:
     async def detect_language(self, text: str) -> str:
         """Detect language of text"""
         # Simple language detection based on common words
-        german_words = ["der", "die", "das", "und", "ist", "ich", "du", "er", "sie", "es", "wir", "ihr", "sie"]
-        english_words = ["the", "and", "is", "i", "you", "he", "she", "it", "we", "they", "are"]
-        
-        text_lower = text.lower()
-        german_count = sum(1 for word in german_words if word in text_lower)
-        english_count = sum(1 for word in english_words if word in text_lower)
+        matches = keyword_matcher.find(text, "language:")
+        german_count = sum(1 for match in matches if match.category == "language:de")
+        english_count = len(matches) - german_count
         
         if german_count > english_count:
             return "de-DE"
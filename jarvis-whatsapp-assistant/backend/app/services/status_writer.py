@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Iterable, Optional, Tuple
+
+import asyncpg
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.core.config import settings
+from app.core.metrics import STATUS_BUFFER_SIZE, STATUS_EVENTS, STATUS_FLUSH_SECONDS
+from app.models.tables import message_statuses
+from app.models.webhook import MessageStatus
+
+logger = logging.getLogger(__name__)
+
+STATUS_COLUMNS = ["message_id", "status", "recipient_id", "phone_number_id", "status_at", "error_code"]
+
+StatusRecord = Tuple[str, str, Optional[str], Optional[str], datetime, Optional[int]]
+
+class StatusWriter:
+    """Buffered writer that batches status callbacks into Postgres with COPY.
+
+    submit() never waits on the database: events go into a bounded buffer
+    that is flushed when it reaches STATUS_WRITER_BATCH_SIZE or every
+    STATUS_WRITER_FLUSH_INTERVAL_SECONDS. When the buffer is full new
+    events are dropped and counted, which is the backpressure signal.
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_buffer: Optional[int] = None
+    ):
+        self.batch_size = batch_size or settings.STATUS_WRITER_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.STATUS_WRITER_FLUSH_INTERVAL_SECONDS
+        self.max_buffer = max_buffer or settings.STATUS_WRITER_MAX_BUFFER
+        self.pool: Optional[asyncpg.Pool] = None
+        self.buffer: Deque[StatusRecord] = deque()
+        self.dropped = 0
+        self._flush_event = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool is not None
+
+    @property
+    def backpressure(self) -> bool:
+        """True while the buffer is at least 80% full"""
+        return len(self.buffer) >= self.max_buffer * 0.8
+
+    async def start(self):
+        """Connect to Postgres, create the table if needed and start the flush loop"""
+        if not settings.STATUS_WRITER_ENABLED or self._task:
+            return
+
+        try:
+            self.pool = await asyncpg.create_pool(
+                settings.DATABASE_URL.replace("+asyncpg", ""),
+                min_size=1,
+                max_size=2,
+                timeout=10
+            )
+            await self._create_table()
+        except Exception as e:
+            logger.error(f"Failed to connect status writer to Postgres: {e}")
+            if self.pool:
+                await self.pool.close()
+            self.pool = None
+            return
+
+        self._flush_event = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info("Status writer started")
+
+    async def stop(self):
+        """Stop the flush loop and drain the buffer"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if self.pool:
+            while self.buffer:
+                if not await self.flush():
+                    break
+            await self.pool.close()
+            self.pool = None
+
+        if self.buffer:
+            logger.warning(f"Status writer stopped with {len(self.buffer)} unflushed events")
+        logger.info("Status writer stopped")
+
+    def submit(self, statuses: Iterable[MessageStatus]) -> int:
+        """Buffer status events without blocking, returns the number accepted"""
+        if not self.enabled:
+            return 0
+
+        accepted = 0
+        dropped = 0
+        for status in statuses:
+            if len(self.buffer) >= self.max_buffer:
+                dropped += 1
+                continue
+            self.buffer.append(self._to_record(status))
+            accepted += 1
+
+        if accepted:
+            STATUS_EVENTS.labels(result="buffered").inc(accepted)
+        if dropped:
+            self.dropped += dropped
+            STATUS_EVENTS.labels(result="dropped").inc(dropped)
+            logger.warning(f"Status buffer full, dropped {dropped} events")
+
+        STATUS_BUFFER_SIZE.set(len(self.buffer))
+        if len(self.buffer) >= self.batch_size:
+            self._flush_event.set()
+        return accepted
+
+    async def flush(self) -> bool:
+        """Write one batch with COPY; failed batches go back to the buffer"""
+        async with self._flush_lock:
+            if not self.buffer or not self.pool:
+                return True
+
+            batch = [self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))]
+            started = time.perf_counter()
+            try:
+                async with self.pool.acquire() as connection:
+                    await connection.copy_records_to_table(
+                        message_statuses.name,
+                        records=batch,
+                        columns=STATUS_COLUMNS
+                    )
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} status events: {e}")
+                STATUS_EVENTS.labels(result="failed").inc(len(batch))
+                # Requeue oldest-first as far as the buffer allows
+                room = self.max_buffer - len(self.buffer)
+                self.buffer.extendleft(reversed(batch[:room]))
+                STATUS_BUFFER_SIZE.set(len(self.buffer))
+                return False
+
+            STATUS_FLUSH_SECONDS.observe(time.perf_counter() - started)
+            STATUS_EVENTS.labels(result="written").inc(len(batch))
+            STATUS_BUFFER_SIZE.set(len(self.buffer))
+            return True
+
+    async def _flush_loop(self):
+        """Flush when a batch is full or the interval elapsed"""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+
+            while self.buffer:
+                if not await self.flush():
+                    # Back off on database errors instead of spinning
+                    await asyncio.sleep(self.flush_interval)
+                    break
+                if len(self.buffer) < self.batch_size:
+                    break
+
+    async def _create_table(self):
+        dialect = postgresql.dialect()
+        statements = [str(CreateTable(message_statuses, if_not_exists=True).compile(dialect=dialect))]
+        statements += [
+            str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+            for index in message_statuses.indexes
+        ]
+        async with self.pool.acquire() as connection:
+            for statement in statements:
+                await connection.execute(statement)
+
+    @staticmethod
+    def _to_record(status: MessageStatus) -> StatusRecord:
+        error_code = None
+        if status.errors:
+            try:
+                error_code = int(status.errors[0].get("code"))
+            except (TypeError, ValueError):
+                error_code = None
+        return (
+            status.id,
+            status.status,
+            status.recipient_id,
+            status.phone_number_id,
+            datetime.fromtimestamp(status.timestamp, tz=timezone.utc),
+            error_code
+        )
+
+# Global status writer instance
+status_writer = StatusWriter()
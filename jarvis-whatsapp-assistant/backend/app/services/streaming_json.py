@@ -0,0 +1,103 @@
+import json
+from typing import Any, Dict, Optional
+
+_WHITESPACE = " \t\r\n"
+
+class IncrementalJSONObject:
+    """Incremental parser for the top-level fields of one streamed JSON object.
+
+    feed() takes completion chunks as they arrive and returns the top-level
+    fields whose values became complete with that chunk, so a caller can
+    act on "intent" and "response" before the rest of the object has been
+    generated. Anything before the opening brace (e.g. a ```json fence) is
+    skipped. Each character is scanned once.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = True
+        self._key: Optional[str] = None
+        self._start: Optional[int] = None
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """Add a chunk; returns the fields completed by it (raises ValueError on malformed JSON)"""
+        self.text += chunk
+        completed: Dict[str, Any] = {}
+        text = self.text
+
+        while self._pos < len(text) and not self.done:
+            char = text[self._pos]
+            position = self._pos
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._string_done(text[self._start:position + 1], completed)
+                continue
+
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                continue
+
+            if self._depth > 1:
+                if char == '"':
+                    self._in_string = True
+                elif char in "{[":
+                    self._depth += 1
+                elif char in "}]":
+                    self._depth -= 1
+                    if self._depth == 1:
+                        self._complete(text[self._start:position + 1], completed)
+                continue
+
+            # Top level of the object
+            if char == '"' and self._start is None:
+                self._in_string = True
+                self._start = position
+            elif char in "{[" and self._start is None:
+                self._depth += 1
+                self._start = position
+            elif char == ",":
+                self._finish_literal(text[:position], completed)
+                self._expect_key = True
+            elif char == "}":
+                self._finish_literal(text[:position], completed)
+                self._depth = 0
+                self.done = True
+            elif char == ":":
+                self._expect_key = False
+            elif char not in _WHITESPACE and self._start is None:
+                # Number, true, false or null: ends at the next , or }
+                self._start = position
+
+        return completed
+
+    def _string_done(self, raw: str, completed: Dict[str, Any]):
+        if self._expect_key:
+            self._key = json.loads(raw)
+            self._start = None
+        else:
+            self._complete(raw, completed)
+
+    def _finish_literal(self, text: str, completed: Dict[str, Any]):
+        if self._start is not None and not self._expect_key:
+            self._complete(text[self._start:].strip(), completed)
+
+    def _complete(self, raw: str, completed: Dict[str, Any]):
+        value = json.loads(raw)
+        self.fields[self._key] = value
+        completed[self._key] = value
+        self._start = None
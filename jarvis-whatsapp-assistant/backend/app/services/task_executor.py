@@ -2,6 +2,7 @@ import logging
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 from app.services.ecommerce_service import ecommerce_service
+from app.services.keyword_matcher import keyword_matcher
 
 logger = logging.getLogger(__name__)
 
@@ -219,15 +220,15 @@ Soll ich die Bestellung aufgeben? (Ja/Nein)"""
     
     async def handle_confirmation(self, text: str, context: Dict) -> Dict[str, Any]:
         """Handle yes/no confirmations"""
-        text_lower = text.lower()
+        answers = keyword_matcher.categories(text, "confirm:")
         
         if context.get("conversation_state") == "confirming_flower_order":
-            if any(word in text_lower for word in ["ja", "yes", "ok", "bestellen", "bestätigen"]):
+            if "yes" in answers:
                 # Confirm order
                 order_data = context.get("pending_order", {})
                 return await self.place_flower_order(order_data, context)
             
-            elif any(word in text_lower for word in ["nein", "no", "abbrechen", "cancel"]):
+            elif "no" in answers:
                 # Cancel order
                 context.pop("pending_order", None)
                 context.pop("active_order", None)
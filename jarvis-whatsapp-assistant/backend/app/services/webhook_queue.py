@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+WebhookHandler = Callable[[bytes], Awaitable[None]]
+
+class WebhookQueue:
+    """Durable webhook work queue backed by a Redis Stream and a consumer group"""
+
+    ERROR_BACKOFF_SECONDS = 1.0
+
+    def __init__(self):
+        self.stream_key = settings.WEBHOOK_STREAM_KEY
+        self.dead_letter_key = settings.WEBHOOK_DEAD_LETTER_STREAM_KEY
+        self.group = settings.WEBHOOK_CONSUMER_GROUP
+        self.consumer_name = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+        self._group_ready = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def enqueue(self, body: bytes) -> Optional[str]:
+        """Append a raw webhook body to the stream, returns the entry ID or None on failure"""
+        entry_id = await redis_client.xadd(
+            self.stream_key,
+            {"body": body.decode("utf-8")},
+            maxlen=settings.WEBHOOK_STREAM_MAXLEN
+        )
+        if entry_id:
+            logger.debug(f"Webhook queued as {entry_id}")
+        return entry_id
+
+    async def ensure_group(self) -> bool:
+        """Create the consumer group once per process"""
+        if not self._group_ready:
+            self._group_ready = await redis_client.xgroup_create(self.stream_key, self.group)
+        return self._group_ready
+
+    async def start(self, handler: WebhookHandler, concurrency: Optional[int] = None):
+        """Start the consumer pool and the pending-entry reclaimer"""
+        if self._running:
+            return
+
+        await self.ensure_group()
+        self._running = True
+        concurrency = concurrency or settings.WEBHOOK_WORKER_CONCURRENCY
+
+        for index in range(concurrency):
+            self._tasks.append(asyncio.create_task(self._consume(handler, index)))
+        self._tasks.append(asyncio.create_task(self._reclaim_loop(handler)))
+
+        logger.info(f"Webhook queue workers started: consumer={self.consumer_name}, concurrency={concurrency}")
+
+    async def stop(self):
+        """Stop all workers; unacknowledged entries stay pending and get reclaimed later"""
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Webhook queue workers stopped")
+
+    async def _consume(self, handler: WebhookHandler, index: int):
+        """Read new entries for this consumer and hand them to the handler.
+
+        Entries are handled concurrently and acknowledged one by one, so an
+        entry waiting for its sender's coalescing window does not stop the
+        consumer from reading the rest of the burst. At most
+        WEBHOOK_READ_BATCH_SIZE entries per consumer are unacknowledged.
+        """
+        in_flight: Set[asyncio.Task] = set()
+        batch_size = settings.WEBHOOK_READ_BATCH_SIZE
+        try:
+            while self._running:
+                try:
+                    if len(in_flight) >= batch_size:
+                        await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                        continue
+
+                    if not await self.ensure_group():
+                        await asyncio.sleep(self.ERROR_BACKOFF_SECONDS)
+                        continue
+
+                    entries = await redis_client.xreadgroup(
+                        self.group,
+                        self.consumer_name,
+                        self.stream_key,
+                        count=batch_size - len(in_flight),
+                        block=settings.WEBHOOK_READ_BLOCK_MS
+                    )
+                    if entries is None:
+                        # Redis unavailable or the group is gone (NOGROUP): recreate it after a pause
+                        self._group_ready = False
+                        await asyncio.sleep(self.ERROR_BACKOFF_SECONDS)
+                        continue
+                    for entry_id, fields in entries:
+                        task = asyncio.create_task(self._handle_entry(handler, entry_id, fields))
+                        in_flight.add(task)
+                        task.add_done_callback(in_flight.discard)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Webhook consumer {index} error: {e}")
+                    await asyncio.sleep(self.ERROR_BACKOFF_SECONDS)
+        finally:
+            # Unacknowledged entries stay pending and get reclaimed later
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def _reclaim_loop(self, handler: WebhookHandler):
+        """Periodically take over entries left pending by crashed or stuck consumers"""
+        while self._running:
+            try:
+                await asyncio.sleep(settings.WEBHOOK_CLAIM_INTERVAL_SECONDS)
+                await self.reclaim_pending(handler)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook reclaim error: {e}")
+
+    async def reclaim_pending(self, handler: WebhookHandler) -> int:
+        """Claim idle pending entries, retry them or move them to the dead-letter stream"""
+        idle_ms = settings.WEBHOOK_CLAIM_IDLE_MS
+        pending = await redis_client.xpending_range(self.stream_key, self.group, idle=idle_ms)
+        if not pending:
+            return 0
+
+        deliveries = {info["message_id"]: info["times_delivered"] for info in pending}
+        claimed = await redis_client.xclaim(
+            self.stream_key, self.group, self.consumer_name, idle_ms, list(deliveries)
+        )
+
+        for entry_id, fields in claimed:
+            if deliveries.get(entry_id, 0) >= settings.WEBHOOK_MAX_DELIVERIES:
+                await self._dead_letter(entry_id, fields)
+            else:
+                logger.info(f"Retrying reclaimed webhook entry {entry_id}")
+                await self._handle_entry(handler, entry_id, fields)
+
+        return len(claimed)
+
+    async def _handle_entry(self, handler: WebhookHandler, entry_id: str, fields: Dict[str, str]):
+        """Run the handler for one entry and acknowledge it on success"""
+        try:
+            await handler(fields.get("body", "").encode("utf-8"))
+        except Exception as e:
+            # Leave the entry pending so the reclaimer retries it
+            logger.error(f"Failed to process webhook entry {entry_id}: {e}")
+            return
+        await redis_client.xack(self.stream_key, self.group, entry_id)
+
+    async def _dead_letter(self, entry_id: str, fields: Dict[str, str]):
+        """Move a repeatedly failing entry out of the work stream"""
+        logger.error(f"Webhook entry {entry_id} exceeded {settings.WEBHOOK_MAX_DELIVERIES} deliveries, moving to dead-letter stream")
+        dead_letter_id = await redis_client.xadd(
+            self.dead_letter_key,
+            {**fields, "original_id": entry_id}
+        )
+        if dead_letter_id:
+            await redis_client.xack(self.stream_key, self.group, entry_id)
+
+# Global webhook queue instance
+webhook_queue = WebhookQueue()
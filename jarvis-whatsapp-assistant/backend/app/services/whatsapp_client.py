@@ -1,15 +1,89 @@
 import aiohttp
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, Optional, List
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, BinaryIO, Dict, Any, Optional, List
 from app.core.config import settings
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.metrics import (
+    WHATSAPP_CONNECTIONS,
+    WHATSAPP_IN_FLIGHT,
+    WHATSAPP_POOL_QUEUED,
+    WHATSAPP_POOL_WAIT_SECONDS,
+    WHATSAPP_REQUEST_SECONDS,
+    WHATSAPP_REQUESTS
+)
 
 logger = logging.getLogger(__name__)
 
+class WhatsAppAPIError(Exception):
+    """Non-200 response from the WhatsApp Cloud API"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class MediaTooLargeError(Exception):
+    """Media body exceeds the configured size cap"""
+
+class DownloadedMedia:
+    """Media body spooled to memory (small files) or a temp file (large ones)"""
+
+    __slots__ = ("file", "size", "sha256")
+
+    def __init__(self, file: BinaryIO, size: int, sha256: str):
+        self.file = file
+        self.size = size
+        self.sha256 = sha256
+
+    def read(self) -> bytes:
+        """Read the whole body; prefer streaming from `file` where possible"""
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self) -> "DownloadedMedia":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+async def _on_connection_queued_start(session, context, params):
+    context.queued_at = time.perf_counter()
+    WHATSAPP_POOL_QUEUED.inc()
+
+async def _on_connection_queued_end(session, context, params):
+    WHATSAPP_POOL_QUEUED.dec()
+    WHATSAPP_POOL_WAIT_SECONDS.observe(time.perf_counter() - context.queued_at)
+
+async def _on_connection_create_end(session, context, params):
+    WHATSAPP_CONNECTIONS.labels(event="created").inc()
+
+async def _on_connection_reuseconn(session, context, params):
+    WHATSAPP_CONNECTIONS.labels(event="reused").inc()
+
 class WhatsAppClient:
     def __init__(self):
         self.base_url = "https://graph.facebook.com/v18.0"
         self.phone_number_id = settings.WHATSAPP_PHONE_NUMBER_ID
         self.access_token = settings.WHATSAPP_ACCESS_TOKEN
+        self.headers = self._get_headers()
+        self.in_flight = 0
+        self.breaker = CircuitBreaker(
+            "whatsapp",
+            window=settings.WHATSAPP_BREAKER_WINDOW,
+            min_calls=settings.WHATSAPP_BREAKER_MIN_CALLS,
+            failure_ratio=settings.WHATSAPP_BREAKER_FAILURE_RATIO,
+            slow_call_seconds=settings.WHATSAPP_BREAKER_SLOW_CALL_SECONDS,
+            open_seconds=settings.WHATSAPP_BREAKER_OPEN_SECONDS
+        )
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
     
     def _get_headers(self) -> Dict[str, str]:
         """Get headers for WhatsApp API requests"""
@@ -18,6 +92,90 @@ class WhatsAppClient:
             "Content-Type": "application/json"
         }
     
+    async def start(self):
+        """Open the shared keep-alive session (called from the app lifespan)"""
+        self._get_session()
+        logger.info(f"WhatsApp HTTP pool opened (limit {settings.WHATSAPP_HTTP_POOL_SIZE})")
+    
+    async def close(self):
+        """Close the shared session and its pooled connections"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        self._loop = None
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Pool saturation snapshot for /health"""
+        return {
+            "open": bool(self.session and not self.session.closed),
+            "in_flight": self.in_flight,
+            "limit": settings.WHATSAPP_HTTP_POOL_SIZE
+        }
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, opening it lazily (e.g. in the worker or scripts)"""
+        loop = asyncio.get_running_loop()
+        if self.session is None or self.session.closed or self._loop is not loop:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_queued_start.append(_on_connection_queued_start)
+            trace_config.on_connection_queued_end.append(_on_connection_queued_end)
+            trace_config.on_connection_create_end.append(_on_connection_create_end)
+            trace_config.on_connection_reuseconn.append(_on_connection_reuseconn)
+
+            connector = aiohttp.TCPConnector(
+                limit=settings.WHATSAPP_HTTP_POOL_SIZE,
+                ttl_dns_cache=settings.WHATSAPP_HTTP_DNS_TTL_SECONDS,
+                keepalive_timeout=settings.WHATSAPP_HTTP_KEEPALIVE_SECONDS
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(
+                    total=settings.WHATSAPP_HTTP_TIMEOUT_SECONDS,
+                    connect=settings.WHATSAPP_HTTP_CONNECT_TIMEOUT_SECONDS
+                ),
+                trace_configs=[trace_config]
+            )
+            self._loop = loop
+        return self.session
+    
+    @asynccontextmanager
+    async def _request(self, endpoint: str, method: str, url: str, check_latency: bool = True, **kwargs):
+        """Issue a request on the shared session, guarded by the circuit breaker.
+
+        Network errors, timeouts, 429 and 5xx count as breaker failures, as
+        do slow calls when check_latency is set. While the breaker is open
+        this raises CircuitOpenError without touching the network.
+        """
+        if not self.breaker.allow():
+            WHATSAPP_REQUESTS.labels(endpoint=endpoint, result="circuit_open").inc()
+            raise CircuitOpenError(f"WhatsApp API circuit is {self.breaker.state}")
+        
+        session = self._get_session()
+        started = time.perf_counter()
+        self.in_flight += 1
+        WHATSAPP_IN_FLIGHT.inc()
+        result = "error"
+        success = False
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                result = "ok" if response.status == 200 else str(response.status)
+                success = response.status != 429 and response.status < 500
+                yield response
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            success = False
+            raise
+        except asyncio.CancelledError:
+            success = None
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_flight -= 1
+            WHATSAPP_IN_FLIGHT.dec()
+            WHATSAPP_REQUESTS.labels(endpoint=endpoint, result=result).inc()
+            WHATSAPP_REQUEST_SECONDS.labels(endpoint=endpoint).observe(elapsed)
+            self.breaker.record(success, elapsed if check_latency else None)
+    
     async def send_message(self, to: str, message: Dict[str, Any]) -> Dict[str, Any]:
         """Send message via WhatsApp API"""
         url = f"{self.base_url}/{self.phone_number_id}/messages"
@@ -29,16 +187,15 @@ class WhatsAppClient:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, headers=self._get_headers()) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info(f"Message sent successfully to {to}")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"WhatsApp API error: {response.status} - {error_text}")
-                        raise Exception(f"WhatsApp API error: {error_text}")
+            async with self._request("send_message", "POST", url, json=payload) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    logger.info(f"Message sent successfully to {to}")
+                    return result
+                else:
+                    error_text = await response.text()
+                    logger.error(f"WhatsApp API error: {response.status} - {error_text}")
+                    raise WhatsAppAPIError(response.status, f"WhatsApp API error: {error_text}")
         except Exception as e:
             logger.error(f"Failed to send message: {e}")
             raise
@@ -80,6 +237,16 @@ class WhatsAppClient:
         parameters: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """Send template message"""
+        message = self.build_template_message(template_name, language_code, parameters)
+        return await self.send_message(to, message)
+    
+    @staticmethod
+    def build_template_message(
+        template_name: str,
+        language_code: str = "de",
+        parameters: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Build the message body of a template message"""
         template_components = []
         
         if parameters:
@@ -88,7 +255,7 @@ class WhatsAppClient:
                 "parameters": [{"type": "text", "text": param} for param in parameters]
             })
         
-        message = {
+        return {
             "type": "template",
             "template": {
                 "name": template_name,
@@ -96,43 +263,86 @@ class WhatsAppClient:
                 "components": template_components
             }
         }
-        return await self.send_message(to, message)
     
-    async def get_media_url(self, media_id: str) -> str:
-        """Get media URL from media ID"""
+    async def get_media_info(self, media_id: str) -> Dict[str, Any]:
+        """Get media metadata (url, mime_type, sha256, file_size) from media ID"""
         url = f"{self.base_url}/{media_id}"
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=self._get_headers()) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data["url"]
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Failed to get media URL: {response.status} - {error_text}")
-                        raise Exception(f"Failed to get media URL: {error_text}")
+            async with self._request("get_media_url", "GET", url) as response:
+                if response.status == 200:
+                    return await response.json()
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Failed to get media URL: {response.status} - {error_text}")
+                    raise WhatsAppAPIError(response.status, f"Failed to get media URL: {error_text}")
         except Exception as e:
             logger.error(f"Error getting media URL: {e}")
             raise
     
-    async def download_media(self, media_url: str) -> bytes:
-        """Download media content"""
+    async def get_media_url(self, media_id: str) -> str:
+        """Get media URL from media ID, cached until shortly before it expires"""
+        from app.services.media_cache import media_cache  # Wraps this client
+        return await media_cache.get_url(media_id)
+    
+    async def iter_media(
+        self,
+        media_url: str,
+        max_bytes: Optional[int] = None,
+        chunk_size: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Stream media content in chunks, raises MediaTooLargeError past max_bytes"""
+        max_bytes = max_bytes or settings.MEDIA_MAX_BYTES
+        chunk_size = chunk_size or settings.MEDIA_CHUNK_BYTES
+        timeout = aiohttp.ClientTimeout(
+            total=settings.WHATSAPP_MEDIA_TIMEOUT_SECONDS,
+            connect=settings.WHATSAPP_HTTP_CONNECT_TIMEOUT_SECONDS
+        )
+        async with self._request("download_media", "GET", media_url, check_latency=False, timeout=timeout) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error(f"Failed to download media: {response.status} - {error_text}")
+                raise WhatsAppAPIError(response.status, f"Failed to download media: {error_text}")
+            
+            # Reject early when the server announces the size
+            if response.content_length and response.content_length > max_bytes:
+                raise MediaTooLargeError(f"Media is {response.content_length} bytes, limit is {max_bytes}")
+            
+            received = 0
+            async for chunk in response.content.iter_chunked(chunk_size):
+                received += len(chunk)
+                if received > max_bytes:
+                    raise MediaTooLargeError(f"Media exceeds the limit of {max_bytes} bytes")
+                yield chunk
+    
+    async def download_media_to_file(self, media_url: str, max_bytes: Optional[int] = None) -> DownloadedMedia:
+        """Download media into a SpooledTemporaryFile, hashing it on the way"""
+        spool = tempfile.SpooledTemporaryFile(max_size=settings.MEDIA_SPOOL_MEMORY_BYTES)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async for chunk in self.iter_media(media_url, max_bytes):
+                spool.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        except Exception as e:
+            spool.close()
+            logger.error(f"Error downloading media: {e}")
+            raise
+        
+        spool.seek(0)
+        return DownloadedMedia(spool, size, digest.hexdigest())
+    
+    async def download_media(self, media_url: str, max_bytes: Optional[int] = None) -> bytes:
+        """Download media content into memory (capped); prefer download_media_to_file"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(media_url, headers=self._get_headers()) as response:
-                    if response.status == 200:
-                        return await response.read()
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Failed to download media: {response.status} - {error_text}")
-                        raise Exception(f"Failed to download media: {error_text}")
+            return b"".join([chunk async for chunk in self.iter_media(media_url, max_bytes)])
         except Exception as e:
             logger.error(f"Error downloading media: {e}")
             raise
     
-    async def mark_message_as_read(self, message_id: str) -> Dict[str, Any]:
-        """Mark message as read"""
+    async def mark_message_as_read(self, message_id: str, typing: bool = False) -> Dict[str, Any]:
+        """Mark message (and all earlier ones of the chat) as read, optionally showing a typing indicator"""
         url = f"{self.base_url}/{self.phone_number_id}/messages"
         
         payload = {
@@ -140,18 +350,19 @@ class WhatsAppClient:
             "status": "read",
             "message_id": message_id
         }
+        if typing:
+            payload["typing_indicator"] = {"type": "text"}
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, headers=self._get_headers()) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info(f"Message {message_id} marked as read")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Failed to mark message as read: {response.status} - {error_text}")
-                        raise Exception(f"Failed to mark message as read: {error_text}")
+            async with self._request("mark_as_read", "POST", url, json=payload) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    logger.info(f"Message {message_id} marked as read")
+                    return result
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Failed to mark message as read: {response.status} - {error_text}")
+                    raise WhatsAppAPIError(response.status, f"Failed to mark message as read: {error_text}")
         except Exception as e:
             logger.error(f"Error marking message as read: {e}")
             raise
@@ -0,0 +1,248 @@
+"""Offline NLU accuracy and latency benchmark.
+
+Runs a labelled corpus through each NLU path and writes a JSON report
+(accuracy, coverage, confusion matrix, p50/p95/p99 latency per path) that
+can be diffed between releases. No network access: OpenAI is replaced by
+a stub that answers with the labelled intent, so the "llm" path measures
+routing accuracy and pipeline overhead, not the model.
+
+Usage (from backend/):
+    python -m benchmarks.nlu_benchmark --output nlu-benchmark.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from unittest.mock import patch
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.redis_client import MockRedisClient, redis_client
+from app.services.intent_classifier import LocalIntentRouter
+from app.services.nlu_cache import NLUCache
+from app.services.nlu_engine import NLUEngine
+from app.services.semantic_cache import SemanticCache
+
+DEFAULT_CORPUS = Path(__file__).parent / "nlu_corpus.tsv"
+PATHS = ("keyword", "classifier", "llm", "cache")
+
+class Utterance(NamedTuple):
+    language: str
+    intent: str
+    text: str
+
+class Prediction(NamedTuple):
+    intent: Optional[str]
+    answered: bool  # False when the path would hand the message on
+    seconds: float
+
+def load_corpus(path: Path) -> List[Utterance]:
+    """Read `<language>\\t<intent>\\t<message>` lines, skipping blanks and # comments"""
+    utterances = []
+    with open(path, encoding="utf-8") as corpus:
+        for line in corpus:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            language, intent, text = line.split("\t", 2)
+            utterances.append(Utterance(language.strip(), intent.strip(), text.strip()))
+    return utterances
+
+def summarize(utterances: List[Utterance], predictions: List[Prediction]) -> Dict[str, Any]:
+    """Accuracy, coverage, confusion matrix and latency percentiles of one path"""
+    correct = [p.intent == u.intent for u, p in zip(utterances, predictions)]
+    answered = [p.answered for p in predictions]
+    answered_correct = [c for c, a in zip(correct, answered) if a]
+
+    confusion: Dict[str, Dict[str, int]] = {}
+    by_language: Dict[str, List[bool]] = {}
+    for utterance, prediction, hit in zip(utterances, predictions, correct):
+        row = confusion.setdefault(utterance.intent, {})
+        predicted = prediction.intent or "none"
+        row[predicted] = row.get(predicted, 0) + 1
+        by_language.setdefault(utterance.language, []).append(hit)
+
+    latencies = np.array([p.seconds * 1000 for p in predictions])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "utterances": len(predictions),
+        "accuracy": round(float(np.mean(correct)), 4),
+        "coverage": round(float(np.mean(answered)), 4),
+        "answered_accuracy": round(float(np.mean(answered_correct)), 4) if answered_correct else None,
+        "accuracy_by_language": {lang: round(float(np.mean(hits)), 4) for lang, hits in sorted(by_language.items())},
+        "confusion": {gold: dict(sorted(row.items())) for gold, row in sorted(confusion.items())},
+        "latency_ms": {
+            "p50": round(float(p50), 4),
+            "p95": round(float(p95), 4),
+            "p99": round(float(p99), 4),
+            "mean": round(float(latencies.mean()), 4)
+        }
+    }
+
+class NLUBenchmark:
+    """Runs the corpus through the keyword, classifier, stubbed LLM and cache paths"""
+
+    def __init__(self, utterances: List[Utterance], llm_latency_ms: float = 0.0, repeat: int = 1):
+        self.utterances = utterances
+        self.llm_latency_ms = llm_latency_ms
+        self.repeat = max(1, repeat)
+        self.engine = NLUEngine()
+        self.router = LocalIntentRouter()
+        self.llm_calls = 0
+        self._gold: Optional[str] = None
+
+    async def run(self, paths: Tuple[str, ...] = PATHS) -> Dict[str, Any]:
+        self.router.load()
+        with self._offline():
+            results = {}
+            for path in paths:
+                predictions = await getattr(self, f"run_{path}")()
+                results[path] = summarize(self.utterances, predictions)
+            return results
+
+    async def run_keyword(self) -> List[Prediction]:
+        """Keyword rules (the fallback when OpenAI is unavailable or the service is degraded)"""
+        async def predict(utterance: Utterance) -> Tuple[str, bool]:
+            result = await self.engine._mock_analyze(utterance.text, {})
+            return result["intent"], True
+        return await self._measure(predict)
+
+    async def run_classifier(self) -> List[Prediction]:
+        """Local intent classifier; answered when it is confident"""
+        async def predict(utterance: Utterance) -> Tuple[str, bool]:
+            intent, confidence = self.router.classify(utterance.text)
+            return intent, self.router.is_confident(confidence)
+        return await self._measure(predict)
+
+    async def run_llm(self) -> List[Prediction]:
+        """NLUEngine.analyze with caches off: local routes plus the stubbed LLM"""
+        with patch.object(settings, "NLU_CACHE_ENABLED", False), \
+                patch.object(settings, "NLU_SEMANTIC_CACHE_ENABLED", False):
+            return await self._measure(self._analyze(answered_by_llm=False))
+
+    async def run_cache(self) -> List[Prediction]:
+        """NLUEngine.analyze with warm caches: every message was seen once before"""
+        with patch("app.services.nlu_engine.nlu_cache", NLUCache()), \
+                patch("app.services.nlu_engine.semantic_cache", SemanticCache()):
+            analyze = self._analyze(answered_by_llm=True)
+            for utterance in self.utterances:
+                await analyze(utterance)
+            # Answered: served without calling the LLM again
+            return await self._measure(self._analyze(answered_by_llm=False), warm=False)
+
+    def _analyze(self, answered_by_llm: bool) -> Callable:
+        async def predict(utterance: Utterance) -> Tuple[str, bool]:
+            self._gold = utterance.intent
+            calls = self.llm_calls
+            result = await self.engine.analyze(utterance.text, {"user_id": "benchmark", "conversation_state": "idle"})
+            return result.get("intent"), answered_by_llm or self.llm_calls == calls
+        return predict
+
+    async def _measure(self, predict: Callable, warm: bool = True) -> List[Prediction]:
+        predictions = []
+        for utterance in self.utterances:
+            if warm:
+                await predict(utterance)
+            best = None
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                intent, answered = await predict(utterance)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            predictions.append(Prediction(intent, answered, best))
+        return predictions
+
+    async def _stub_completion(self, **kwargs):
+        """Stands in for openai.ChatCompletion.acreate: answers with the labelled intent"""
+        self.llm_calls += 1
+        if self.llm_latency_ms:
+            await asyncio.sleep(self.llm_latency_ms / 1000)
+        content = json.dumps({
+            "intent": self._gold,
+            "entities": {},
+            "confidence": 0.95,
+            "response": "Benchmark",
+            "action": "benchmark",
+            "next_step": "await_user_request"
+        })
+        message = type("Message", (), {"content": content})
+        return type("Response", (), {"choices": [type("Choice", (), {"message": message})]})
+
+    def _offline(self) -> ExitStack:
+        """OpenAI stubbed, in-process Redis, no rate limiting, no streaming"""
+        stack = ExitStack()
+        stack.enter_context(patch("openai.ChatCompletion.acreate", self._stub_completion))
+        stack.enter_context(patch.object(redis_client, "redis_client", MockRedisClient()))
+        stack.enter_context(patch("app.services.nlu_engine.intent_router", self.router))
+        stack.enter_context(patch.object(self.engine, "openai_available", True))
+        stack.enter_context(patch.object(settings, "NLU_GOVERNOR_ENABLED", False))
+        stack.enter_context(patch.object(settings, "NLU_STREAMING_ENABLED", False))
+        return stack
+
+async def run_benchmark(
+    corpus: Path = DEFAULT_CORPUS,
+    paths: Tuple[str, ...] = PATHS,
+    llm_latency_ms: float = 0.0,
+    repeat: int = 1
+) -> Dict[str, Any]:
+    """The full report for a corpus"""
+    utterances = load_corpus(corpus)
+    languages: Dict[str, int] = {}
+    intents: Dict[str, int] = {}
+    for utterance in utterances:
+        languages[utterance.language] = languages.get(utterance.language, 0) + 1
+        intents[utterance.intent] = intents.get(utterance.intent, 0) + 1
+
+    benchmark = NLUBenchmark(utterances, llm_latency_ms=llm_latency_ms, repeat=repeat)
+    return {
+        "corpus": {
+            "path": corpus.name,
+            "sha1": hashlib.sha1(corpus.read_bytes()).hexdigest(),
+            "utterances": len(utterances),
+            "languages": dict(sorted(languages.items())),
+            "intents": dict(sorted(intents.items()))
+        },
+        "settings": {
+            "classifier_threshold": settings.NLU_CLASSIFIER_THRESHOLD,
+            "semantic_cache_threshold": settings.NLU_SEMANTIC_CACHE_THRESHOLD,
+            "llm_latency_ms": llm_latency_ms,
+            "repeat": repeat
+        },
+        "paths": await benchmark.run(paths)
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline NLU accuracy and latency benchmark")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--output", type=Path, help="write the JSON report here instead of stdout")
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=list(PATHS))
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated LLM latency")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per message (the fastest counts)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run_benchmark(args.corpus, tuple(args.paths), args.llm_latency_ms, args.repeat))
+    output = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+    for path, summary in report["paths"].items():
+        latency = summary["latency_ms"]
+        print(
+            f"{path:>10}: accuracy {summary['accuracy']:.1%}, coverage {summary['coverage']:.1%}, "
+            f"p50 {latency['p50']:.3f} ms, p95 {latency['p95']:.3f} ms, p99 {latency['p99']:.3f} ms",
+            file=sys.stderr
+        )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
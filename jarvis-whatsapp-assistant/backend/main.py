@@ -1,6 +1,7 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import uvicorn
 import os
 import logging
@@ -9,7 +10,18 @@ from contextlib import asynccontextmanager
 # Import our modules
 from app.core.config import settings
 from app.core.redis_client import redis_client
-from app.api.webhooks import router as webhook_router
+from app.api.webhooks import router as webhook_router, process_webhook_body
+from app.api.broadcasts import router as broadcast_router
+from app.services.admission_controller import admission_controller
+from app.services.broadcast_service import broadcast_service
+from app.services.intent_classifier import intent_router
+from app.services.message_dispatcher import message_dispatcher
+from app.services.outbound_scheduler import outbound_scheduler
+from app.services.prompt_context import token_counter
+from app.services.side_effects import side_effects
+from app.services.status_writer import status_writer
+from app.services.webhook_queue import webhook_queue
+from app.services.whatsapp_client import whatsapp_client
 
 # Configure logging
 logging.basicConfig(
@@ -24,9 +36,26 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting JARVIS WhatsApp Assistant...")
     await redis_client.connect()
+    await whatsapp_client.start()
+    await outbound_scheduler.start()
+    await side_effects.start()
+    await status_writer.start()
+    if settings.WEBHOOK_QUEUE_ENABLED and settings.WEBHOOK_QUEUE_RUN_WORKERS:
+        await webhook_queue.start(process_webhook_body)
+    if intent_router.enabled:
+        intent_router.load()
+    await token_counter.load()
+    await broadcast_service.resume()
     yield
     # Shutdown
     logger.info("Shutting down JARVIS WhatsApp Assistant...")
+    await webhook_queue.stop()
+    await broadcast_service.stop()
+    await message_dispatcher.close()
+    await status_writer.stop()
+    await side_effects.stop()
+    await outbound_scheduler.stop()
+    await whatsapp_client.close()
     await redis_client.disconnect()
 
 # Create FastAPI app
@@ -48,6 +77,7 @@ app.add_middleware(
 
 # Include routers
 app.include_router(webhook_router, prefix="/api/v1")
+app.include_router(broadcast_router, prefix="/api/v1")
 
 @app.get("/")
 async def root():
@@ -67,6 +97,15 @@ async def health_check():
         return {
             "status": "healthy",
             "redis": "connected" if redis_client.redis_client else "disconnected",
+            "load": admission_controller.snapshot(),
+            "status_writer": {
+                "enabled": status_writer.enabled,
+                "buffered": len(status_writer.buffer),
+                "dropped": status_writer.dropped,
+                "backpressure": status_writer.backpressure
+            },
+            "whatsapp_pool": whatsapp_client.pool_stats(),
+            "whatsapp_breaker": whatsapp_client.breaker.snapshot(),
             "openai_configured": bool(settings.OPENAI_API_KEY),
             "whatsapp_configured": bool(settings.WHATSAPP_ACCESS_TOKEN)
         }
@@ -76,6 +115,11 @@ async def health_check():
             content={"status": "unhealthy", "error": str(e)}
         )
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler"""
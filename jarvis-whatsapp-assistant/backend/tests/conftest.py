@@ -0,0 +1,18 @@
+import pytest
+
+from app.core.redis_client import MockRedisClient, redis_client
+from app.services.llm_governor import llm_governor
+
+@pytest.fixture(autouse=True)
+def isolated_redis():
+    """Fresh in-process Redis per test, and no governor state left over from an earlier one.
+
+    A test that runs without Redis would otherwise put the global LLM
+    governor on its local fallback budgets for REDIS_RETRY_SECONDS, which
+    throttles the LLM calls of the tests after it.
+    """
+    redis_client.redis_client = MockRedisClient()
+    llm_governor._redis_retry_at = 0.0
+    llm_governor._local_leases.clear()
+    llm_governor._local_buckets.clear()
+    yield
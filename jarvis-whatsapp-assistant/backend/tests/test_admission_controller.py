@@ -0,0 +1,153 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from app.models.webhook import InboundMessage, WebhookEnvelope
+from app.services.admission_controller import (
+    AdmissionController, AdmissionRejected, LOAD_DEGRADED, LOAD_NORMAL, LOAD_OVERLOADED
+)
+
+class TestAdmissionController:
+
+    @pytest.mark.asyncio
+    async def test_concurrency_ceiling_and_queue_budget(self):
+        """Test that work beyond the ceiling waits and beyond the budget is rejected"""
+        controller = AdmissionController(max_concurrency=1, max_queue_depth=1, degrade_ratio=1.0)
+        release = asyncio.Event()
+
+        async def work():
+            async with controller.admit():
+                await release.wait()
+
+        first = asyncio.create_task(work())
+        await asyncio.sleep(0)
+        second = asyncio.create_task(work())
+        await asyncio.sleep(0)
+
+        assert controller.in_flight == 1
+        assert controller.waiting == 1
+        assert controller.state == LOAD_OVERLOADED
+
+        with pytest.raises(AdmissionRejected):
+            async with controller.admit():
+                pass
+
+        release.set()
+        await asyncio.gather(first, second)
+        assert controller.snapshot()["in_flight"] == 0
+        assert controller.state == LOAD_NORMAL
+
+    @pytest.mark.asyncio
+    async def test_degraded_state(self):
+        """Test that load above the degrade ratio is reported as degraded"""
+        controller = AdmissionController(max_concurrency=4, max_queue_depth=4, degrade_ratio=0.5)
+
+        async with controller.admit():
+            assert controller.state == LOAD_NORMAL
+            async with controller.admit():
+                assert controller.state == LOAD_DEGRADED
+                assert controller.degraded is True
+
+    @pytest.mark.asyncio
+    async def test_degraded_only_inside_admission(self):
+        """Test that work not admitted by the controller (queue workers) keeps the full code paths"""
+        controller = AdmissionController(max_concurrency=2, max_queue_depth=2, degrade_ratio=0.5)
+        release = asyncio.Event()
+
+        async def inline():
+            async with controller.admit():
+                await release.wait()
+
+        task = asyncio.create_task(inline())
+        await asyncio.sleep(0)
+        assert controller.state == LOAD_DEGRADED
+        assert controller.degraded is False
+
+        release.set()
+        await task
+
+    @pytest.mark.asyncio
+    async def test_mailbox_jobs_keep_their_own_admission(self):
+        """Test that a sender's mailbox reports degraded per job, not per mailbox start"""
+        from app.services.sender_mailboxes import SenderMailboxes
+
+        controller = AdmissionController(max_concurrency=2, max_queue_depth=2, degrade_ratio=0.5)
+        mailboxes = SenderMailboxes(max_concurrency=4, idle_seconds=1)
+        release = asyncio.Event()
+
+        async def job():
+            await asyncio.sleep(0.01)
+            return controller.degraded
+
+        async def admitted():
+            async with controller.admit():
+                await release.wait()
+                return await mailboxes.submit("user", job)
+
+        first = asyncio.create_task(admitted())
+        await asyncio.sleep(0)
+        queued = mailboxes.submit("user", job)
+        release.set()
+        second = mailboxes.submit("user", job)
+
+        assert await first is True
+        assert await queued is False
+        assert await second is False
+        await mailboxes.close()
+
+    @pytest.mark.asyncio
+    async def test_queue_mode_nlu_is_not_degraded(self):
+        """Test that NLU keeps using the LLM outside admission while inline traffic is degraded"""
+        from app.services.nlu_engine import NLUEngine
+
+        controller = AdmissionController(max_concurrency=2, max_queue_depth=2, degrade_ratio=0.5)
+        engine = NLUEngine()
+        engine.openai_available = True
+        release = asyncio.Event()
+
+        async def inline():
+            async with controller.admit():
+                await release.wait()
+
+        with patch("app.services.nlu_engine.admission_controller", controller), \
+             patch("app.services.nlu_engine.intent_router") as router, \
+             patch("app.services.nlu_engine.nlu_cache.get", AsyncMock(return_value=None)), \
+             patch("app.services.nlu_engine.semantic_cache.get", return_value=None), \
+             patch.object(engine, "_mock_analyze", AsyncMock(return_value={"intent": "general_chat"})) as keywords, \
+             patch("openai.ChatCompletion.acreate", AsyncMock()) as acreate:
+            router.enabled = False
+            acreate.return_value.choices[0].message.content = (
+                '{"intent": "general_chat", "entities": {}, "confidence": 0.9, "response": "Gern."}'
+            )
+            task = asyncio.create_task(inline())
+            await asyncio.sleep(0)
+
+            await engine.analyze("Erzähl mir was", {"user_id": "a"})
+            assert acreate.await_count == 1
+            keywords.assert_not_awaited()
+
+            async with controller.admit():
+                await engine.analyze("Erzähl mir was", {"user_id": "a"})
+            keywords.assert_awaited_once()
+
+            release.set()
+            await task
+
+    @pytest.mark.asyncio
+    async def test_shed_with_busy_policy(self):
+        """Test that shed payloads get a busy reply per sender"""
+        from app.api import webhooks
+
+        envelope = WebhookEnvelope()
+        envelope.messages = [
+            InboundMessage(id="1", sender_id="a", type="text"),
+            InboundMessage(id="2", sender_id="a", type="text"),
+            InboundMessage(id="3", sender_id="b", type="text")
+        ]
+
+        with patch.object(webhooks.webhook_queue, "enqueue", new_callable=AsyncMock) as enqueue, \
+             patch.object(webhooks.message_processor, "send_busy_message", new_callable=AsyncMock) as busy:
+            await webhooks.shed_webhook(b"{}", envelope)
+
+        assert sorted(call.args[0] for call in busy.await_args_list) == ["a", "b"]
+        enqueue.assert_not_awaited()
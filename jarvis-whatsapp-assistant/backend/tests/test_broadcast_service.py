@@ -0,0 +1,149 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.redis_client import MockRedisClient, redis_client
+from app.models.broadcast import BroadcastRequest
+from app.services.broadcast_service import STATUS_COMPLETED, BroadcastService
+from main import app
+
+class TestBroadcastService:
+
+    @pytest.fixture(autouse=True)
+    def recipients_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "BROADCAST_RECIPIENTS_DIR", str(tmp_path))
+        (tmp_path / "customers.tsv").write_text(
+            "# Muttertag\n491510\tAnna\n491511\n\n491512\tBen\n491513\tCarla\n491514\n",
+            encoding="utf-8"
+        )
+        self.tmp_path = tmp_path
+
+    def setup_method(self):
+        """Setup for each test"""
+        redis_client.redis_client = MockRedisClient()
+        self.scheduler = MagicMock()
+
+        async def send_template_message(to, template_name, language_code, parameters, priority):
+            if to == "491513":
+                raise Exception("invalid recipient")
+            return {"messages": [{"id": f"wamid.{to}"}]}
+
+        self.scheduler.send_template_message = AsyncMock(side_effect=send_template_message)
+        self.service = BroadcastService(self.scheduler, concurrency=2, batch_size=2)
+
+    async def create_job(self, request: BroadcastRequest) -> str:
+        with patch.object(self.service, "_spawn"):
+            return await self.service.create(request)
+
+    @pytest.mark.asyncio
+    async def test_file_broadcast_reports_per_recipient_results(self):
+        """Test that every recipient of a file is sent once with its own parameters"""
+        job_id = await self.create_job(BroadcastRequest(
+            template_name="muttertag_erinnerung",
+            parameters=["Kunde"],
+            recipients_file="customers.tsv"
+        ))
+        await self.service._run(job_id)
+
+        job = await self.service.get(job_id)
+        assert job["status"] == STATUS_COMPLETED
+        assert (job["sent"], job["failed"]) == (4, 1)
+        assert await redis_client.get(f"broadcast:{job_id}:lock") is None
+
+        results = await self.service.results(job_id)
+        assert [result["to"] for result in results] == ["491510", "491511", "491512", "491513", "491514"]
+        assert results[3]["status"] == "failed"
+        parameters = {call.args[0]: call.args[3] for call in self.scheduler.send_template_message.await_args_list}
+        assert parameters["491510"] == ["Anna"]
+        assert parameters["491511"] == ["Kunde"]
+
+    @pytest.mark.asyncio
+    async def test_resume_continues_from_checkpoint(self):
+        """Test that a resumed job skips batches that were already checkpointed"""
+        job_id = await self.create_job(BroadcastRequest(template_name="t", recipients_file="customers.tsv"))
+        batches = self.service._file_batches(BroadcastRequest(template_name="t", recipients_file="customers.tsv"), 0)
+        cursor, _ = await batches.__anext__()
+        await batches.aclose()
+        await redis_client.hset(f"broadcast:{job_id}", {"cursor": cursor})
+
+        await self.service._run(job_id)
+
+        sent_to = [call.args[0] for call in self.scheduler.send_template_message.await_args_list]
+        assert sent_to == ["491512", "491513", "491514"]
+
+    @pytest.mark.asyncio
+    async def test_redis_set_broadcast(self):
+        """Test that a Redis set is streamed with SSCAN until the scan completes"""
+        await redis_client.sadd("customers:muttertag", *[f"49170{i}" for i in range(5)])
+        job_id = await self.create_job(BroadcastRequest(template_name="t", recipients_set="customers:muttertag"))
+
+        await self.service._run(job_id)
+
+        job = await self.service.get(job_id)
+        assert job["status"] == STATUS_COMPLETED
+        assert job["sent"] == 5
+        assert (await redis_client.hgetall(f"broadcast:{job_id}"))["cursor"] == "done"
+
+    @pytest.mark.asyncio
+    async def test_lock_taken_over_by_another_replica_is_kept(self):
+        """Test that a job whose lock expired mid-run does not release the new owner's lock"""
+        job_id = await self.create_job(BroadcastRequest(template_name="t", recipients_file="customers.tsv"))
+        lock_key = f"broadcast:{job_id}:lock"
+
+        async def send_template_message(to, template_name, language_code, parameters, priority):
+            await redis_client.set(lock_key, "other-replica")
+            return {"messages": [{"id": f"wamid.{to}"}]}
+
+        self.scheduler.send_template_message.side_effect = send_template_message
+        await self.service._run(job_id)
+
+        assert await redis_client.get(lock_key) == "other-replica"
+
+    @pytest.mark.asyncio
+    async def test_spilled_recipients_are_counted_separately(self):
+        """Test that recipients parked by the outbound scheduler are not reported as sent"""
+        async def send_template_message(to, template_name, language_code, parameters, priority):
+            return {"spilled": True} if to == "491512" else {"messages": [{"id": f"wamid.{to}"}]}
+
+        self.scheduler.send_template_message.side_effect = send_template_message
+        job_id = await self.create_job(BroadcastRequest(template_name="t", recipients_file="customers.tsv"))
+        await self.service._run(job_id)
+
+        job = await self.service.get(job_id)
+        assert (job["sent"], job["failed"], job["spilled"], job["processed"]) == (4, 0, 1, 5)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_job_stops(self):
+        """Test that a cancelled job sends nothing more"""
+        job_id = await self.create_job(BroadcastRequest(template_name="t", recipients_file="customers.tsv"))
+        assert await self.service.cancel(job_id) is True
+
+        await self.service._run(job_id)
+
+        self.scheduler.send_template_message.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_file_outside_directory_is_rejected(self):
+        """Test that recipients files cannot escape the broadcast directory"""
+        with pytest.raises(ValueError):
+            await self.service.create(BroadcastRequest(template_name="t", recipients_file="../secrets.tsv"))
+
+    def test_request_needs_exactly_one_source(self):
+        """Test that a broadcast needs a file or a set, not both"""
+        with pytest.raises(ValueError):
+            BroadcastRequest(template_name="t")
+        with pytest.raises(ValueError):
+            BroadcastRequest(template_name="t", recipients_file="a.tsv", recipients_set="s")
+
+    def test_api_requires_admin_token(self, monkeypatch):
+        """Test that the broadcast API is closed without a valid admin token"""
+        client = TestClient(app)
+        body = {"template_name": "t", "recipients_set": "customers"}
+
+        assert client.post("/api/v1/broadcasts", json=body).status_code == 403
+
+        monkeypatch.setattr(settings, "ADMIN_API_TOKEN", "s3cret")
+        assert client.post("/api/v1/broadcasts", json=body, headers={"Authorization": "Bearer wrong"}).status_code == 401
+        assert client.get("/api/v1/broadcasts/unknown", headers={"Authorization": "Bearer s3cret"}).status_code == 404
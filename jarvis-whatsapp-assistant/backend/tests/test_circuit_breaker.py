@@ -0,0 +1,144 @@
+import pytest
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+from app.core.config import settings
+from app.core.redis_client import MockRedisClient, redis_client
+from app.services.circuit_breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker, CircuitOpenError
+from app.services.outbound_scheduler import OutboundScheduler, TokenBucket
+
+class TestCircuitBreaker:
+
+    def make_breaker(self, **kwargs) -> CircuitBreaker:
+        options = dict(window=4, min_calls=4, failure_ratio=0.5, open_seconds=0.05, success_threshold=2)
+        options.update(kwargs)
+        return CircuitBreaker("test", **options)
+
+    def test_opens_on_failure_ratio(self):
+        """Test that the breaker opens once the window's failure ratio is reached"""
+        breaker = self.make_breaker()
+
+        for success in (True, False, True):
+            breaker.record(success)
+        assert breaker.state == STATE_CLOSED
+
+        breaker.record(False)
+        assert breaker.state == STATE_OPEN
+        assert breaker.allow() is False
+
+    def test_slow_calls_count_as_failures(self):
+        """Test that successful but slow calls trip the breaker"""
+        breaker = self.make_breaker(slow_call_seconds=1.0)
+
+        for _ in range(4):
+            breaker.record(True, elapsed=2.0)
+
+        assert breaker.state == STATE_OPEN
+
+    def test_half_open_probes_close_or_reopen(self):
+        """Test that probes close the breaker on success and reopen it on failure"""
+        breaker = self.make_breaker(open_seconds=0)
+        for _ in range(4):
+            breaker.record(False)
+
+        assert breaker.state == STATE_HALF_OPEN
+        assert breaker.allow() is True
+        assert breaker.allow() is False
+        breaker.record(True)
+        assert breaker.allow() is True
+        breaker.record(True)
+        assert breaker.state == STATE_CLOSED
+
+        for _ in range(4):
+            breaker.record(False)
+        assert breaker.allow() is True
+        breaker.record(False)
+        assert breaker._state == STATE_OPEN
+
+class TestOutboundSpill:
+
+    def setup_method(self):
+        """Setup for each test"""
+        redis_client.redis_client = MockRedisClient()
+        self.client = MagicMock()
+        self.client.phone_number_id = "123"
+        self.client.breaker = CircuitBreaker("test_spill", window=2, min_calls=2, open_seconds=60)
+        self.client.send_message = AsyncMock(return_value={"messages": [{"id": "wamid.1"}]})
+        self.scheduler = OutboundScheduler(self.client, bucket=TokenBucket(rate=1000, capacity=1000), workers=1)
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_spills_without_calling_api(self):
+        """Test that sends are parked in Redis while the breaker is open"""
+        self.client.breaker.record(False)
+        self.client.breaker.record(False)
+
+        result = await self.scheduler.send_text_message("49151", "Hallo")
+
+        assert result == {"spilled": True}
+        self.client.send_message.assert_not_awaited()
+        entries = await redis_client.lrange(settings.OUTBOUND_SPILL_KEY, 0, -1)
+        assert json.loads(entries[0])["to"] == "49151"
+        await self.scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_spill_drains_when_breaker_closes(self):
+        """Test that parked messages are sent once the breaker recovers"""
+        self.client.breaker.record(False)
+        self.client.breaker.record(False)
+        await self.scheduler.send_text_message("49151", "Hallo")
+
+        self.client.breaker._transition(STATE_CLOSED)
+        for _ in range(50):
+            if self.client.send_message.await_count:
+                break
+            await asyncio.sleep(0.01)
+
+        assert self.client.send_message.await_args.args[0] == "49151"
+        assert await redis_client.llen(settings.OUTBOUND_SPILL_KEY) == 0
+        await self.scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_half_open_drains_a_batch_and_respills_rejected_jobs(self):
+        """Test that a half-open breaker gets a small batch and jobs it rejects are parked again"""
+        self.client.breaker.record(False)
+        self.client.breaker.record(False)
+        for to in ("49151", "49152", "49153"):
+            await self.scheduler.send_text_message(to, "Hallo")
+        self.client.send_message.side_effect = [
+            {"messages": [{"id": "wamid.1"}]},
+            CircuitOpenError("probe slot taken"),
+            CircuitOpenError("probe slot taken")
+        ]
+
+        self.client.breaker._transition(STATE_HALF_OPEN)
+        for _ in range(50):
+            if self.client.send_message.await_count == 3 and not await redis_client.exists(f"{settings.OUTBOUND_SPILL_KEY}:drain_lock"):
+                break
+            await asyncio.sleep(0.01)
+
+        entries = await redis_client.lrange(settings.OUTBOUND_SPILL_KEY, 0, -1)
+        assert [json.loads(entry)["to"] for entry in entries] == ["49152", "49153"]
+        await self.scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_spilled_jobs_survive_a_stop_mid_drain(self):
+        """Test that entries leave the spill list only after their batch was sent"""
+        self.client.breaker.record(False)
+        self.client.breaker.record(False)
+        await self.scheduler.send_text_message("49151", "Hallo")
+
+        async def send_message(to, message):
+            await asyncio.Event().wait()
+
+        self.client.send_message.side_effect = send_message
+
+        self.client.breaker._transition(STATE_CLOSED)
+        for _ in range(50):
+            if self.client.send_message.await_count:
+                break
+            await asyncio.sleep(0.01)
+        await self.scheduler.stop()
+
+        assert await redis_client.llen(settings.OUTBOUND_SPILL_KEY) == 1
+        assert not await redis_client.exists(f"{settings.OUTBOUND_SPILL_KEY}:drain_lock")
@@ -0,0 +1,130 @@
+import pytest
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+from app.services.entity_extractor import EntityExtractor, parse_number_word
+from app.services.nlu_engine import NLUEngine
+
+# A Saturday
+TODAY = date(2026, 10, 17)
+
+class TestEntityExtractor:
+
+    def setup_method(self):
+        """Setup for each test"""
+        self.extractor = EntityExtractor()
+
+    def test_number_words(self):
+        """Test German number words"""
+        assert parse_number_word("zwölf") == 12
+        assert parse_number_word("einundzwanzig") == 21
+        assert parse_number_word("hundertundeins") == 101
+        assert parse_number_word("zweihundertfünfzig") == 250
+        assert parse_number_word("42") == 42
+        assert parse_number_word("freundin") is None
+        assert parse_number_word("und") is None
+
+    def test_relative_dates(self):
+        """Test relative day words, day counts and weekdays"""
+        assert self.extractor.extract_date("Bitte übermorgen liefern", TODAY) == date(2026, 10, 19)
+        assert self.extractor.extract_date("morgen früh", TODAY) == date(2026, 10, 18)
+        assert self.extractor.extract_date("in drei Tagen", TODAY) == date(2026, 10, 20)
+        assert self.extractor.extract_date("in einer Woche", TODAY) == date(2026, 10, 24)
+        assert self.extractor.extract_date("am Freitag", TODAY) == date(2026, 10, 23)
+        # The same weekday means next week
+        assert self.extractor.extract_date("am Samstag", TODAY) == date(2026, 10, 24)
+        assert self.extractor.extract_date("Guten Morgen", TODAY) is None
+
+    def test_absolute_dates(self):
+        """Test numeric and month name dates, rolling over past dates to next year"""
+        assert self.extractor.extract_date("am 14.2.", TODAY) == date(2027, 2, 14)
+        assert self.extractor.extract_date("am 24.12.", TODAY) == date(2026, 12, 24)
+        assert self.extractor.extract_date("bis 03.11.26", TODAY) == date(2026, 11, 3)
+        assert self.extractor.extract_date("am 5. Dezember", TODAY) == date(2026, 12, 5)
+        assert self.extractor.extract_date("14. Februar 2028", TODAY) == date(2028, 2, 14)
+        # An explicit date wins over a relative word
+        assert self.extractor.extract_date("nicht morgen, am 30.10.", TODAY) == date(2026, 10, 30)
+        assert self.extractor.extract_date("am 31.2.", TODAY) is None
+
+    def test_addresses(self):
+        """Test street addresses with and without postcode and city"""
+        assert self.extractor.extract_address("Bitte an Hauptstraße 5, 10115 Berlin liefern") == "Hauptstraße 5, 10115 Berlin"
+        assert self.extractor.extract_address("Karl-Marx-Allee 12a") == "Karl-Marx-Allee 12a"
+        assert self.extractor.extract_address("Berliner Str. 3 60311 Frankfurt am Main") == "Berliner Str. 3, 60311 Frankfurt am Main"
+        assert self.extractor.extract_address("lindenweg 7") == "lindenweg 7"
+        assert self.extractor.extract_address("Ich bin gleich weg") is None
+
+    def test_quantities(self):
+        """Test counted flowers as digits, number words and dozens"""
+        assert self.extractor.extract_quantity("zwölf rote Rosen") == 12
+        assert self.extractor.extract_quantity("einundzwanzig Tulpen") == 21
+        assert self.extractor.extract_quantity("15 langstielige Rosen") == 15
+        assert self.extractor.extract_quantity("ein Dutzend Rosen") == 12
+        assert self.extractor.extract_quantity("ein paar Rosen") is None
+        assert self.extractor.extract_quantity("für eine Freundin") is None
+
+    def test_extract(self):
+        """Test all slots from one message"""
+        slots = self.extractor.extract("10 Tulpen übermorgen an Hauptstraße 5, 10115 Berlin", TODAY)
+        assert slots == {
+            "delivery_date": "19.10.2026",
+            "delivery_address": "Hauptstraße 5, 10115 Berlin",
+            "quantity": 10
+        }
+        assert self.extractor.extract("Was kostet das?", TODAY) == {}
+
+    @pytest.mark.asyncio
+    async def test_engine_fills_order_slots_without_llm(self):
+        """Test order details are read by the rules and the LLM only sees the rest"""
+        engine = NLUEngine()
+        engine.openai_available = True
+        context = {"user_id": "a", "conversation_state": "collecting_flower_order"}
+
+        with patch("openai.ChatCompletion.acreate", AsyncMock()) as acreate:
+            acreate.return_value.choices[0].message.content = '{"intent": "general_chat", "entities": {}, "confidence": 0.9}'
+
+            result = await engine.analyze("Hauptstraße 5, 10115 Berlin", context)
+            assert result["intent"] == "order_flowers"
+            assert result["entities"]["delivery_address"] == "Hauptstraße 5, 10115 Berlin"
+            assert acreate.await_count == 0
+
+            await engine.analyze("Was kostet das?", context)
+            assert acreate.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_engine_sends_negations_and_other_requests_to_llm(self):
+        """Test order details with a cancellation, correction or other intent are not answered by the rules"""
+        engine = NLUEngine()
+        engine.openai_available = True
+        context = {"user_id": "a", "conversation_state": "collecting_flower_order"}
+
+        with patch("openai.ChatCompletion.acreate", AsyncMock()) as acreate:
+            acreate.return_value.choices[0].message.content = '{"intent": "general_chat", "entities": {}, "confidence": 0.9}'
+
+            for text in (
+                "Ach vergiss es, ich will heute doch nichts bestellen",
+                "Am Montag lieber nicht, eher Mittwoch",
+                "Wie wird das Wetter morgen?"
+            ):
+                calls = acreate.await_count
+                result = await engine.analyze(text, context)
+                assert acreate.await_count == calls + 1, text
+                assert result["intent"] == "general_chat"
+
+    @pytest.mark.asyncio
+    async def test_engine_merges_rule_slots_into_llm_result(self):
+        """Test slots the LLM left empty are filled from the rules when the LLM was asked anyway"""
+        engine = NLUEngine()
+        engine.openai_available = True
+        context = {"user_id": "a", "conversation_state": "collecting_flower_order"}
+
+        with patch("openai.ChatCompletion.acreate", AsyncMock()) as acreate:
+            acreate.return_value.choices[0].message.content = (
+                '{"intent": "order_flowers", "entities": {"delivery_address": null, "quantity": 3}, "confidence": 0.9}'
+            )
+            result = await engine.analyze("Termin passt, liefere an Hauptstraße 5, 10115 Berlin, 12 Rosen", context)
+
+        assert acreate.await_count == 1
+        assert result["entities"]["delivery_address"] == "Hauptstraße 5, 10115 Berlin"
+        # The LLM's own value wins
+        assert result["entities"]["quantity"] == 3
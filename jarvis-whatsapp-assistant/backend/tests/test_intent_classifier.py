@@ -0,0 +1,71 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.services.intent_classifier import IntentClassifier, LocalIntentRouter, char_ngrams
+from app.services.nlu_engine import NLUEngine
+
+class TestIntentClassifier:
+
+    def setup_method(self):
+        """Setup for each test"""
+        self.router = LocalIntentRouter(threshold=0.7)
+
+    def test_char_ngrams(self):
+        """Test word-bounded character n-grams"""
+        grams = char_ngrams("Hi!", 2, 3)
+
+        assert grams == [" h", "hi", "i ", " hi", "hi "]
+
+    def test_fit_and_predict(self):
+        """Test a tiny corpus is separable"""
+        classifier = IntentClassifier().fit(
+            ["Hallo", "Guten Morgen", "Tschüss", "Bis bald"],
+            ["greeting", "greeting", "goodbye", "goodbye"]
+        )
+
+        assert classifier.predict("hallo!")[0] == "greeting"
+        assert classifier.predict("bis morgen, tschüss")[0] == "goodbye"
+        assert classifier.predict("xyz") == ("goodbye", 0.0)
+
+    def test_shipped_corpus(self):
+        """Test the shipped corpus recognizes unseen phrasings confidently"""
+        for text, expected in [
+            ("Hallo JARVIS", "greeting"),
+            ("hilfe", "help"),
+            ("Tschüss!", "goodbye"),
+            ("schreib ne mail an tom", "send_email"),
+            ("wie wird das wetter in bremen", "get_weather"),
+            ("Bestelle meiner Freundin rote Rosen", "order_flowers")
+        ]:
+            intent, confidence = self.router.classify(text)
+            assert intent == expected
+            assert self.router.is_confident(confidence)
+
+        assert not self.router.is_confident(self.router.classify("asdf qwer")[1])
+
+    @pytest.mark.asyncio
+    async def test_engine_routing(self):
+        """Test confident local intents skip the LLM and everything else escalates"""
+        engine = NLUEngine()
+        engine.openai_available = True
+        llm_result = {"intent": "order_flowers", "entities": {"recipient": "Freundin"}, "confidence": 0.95}
+
+        with patch("app.services.nlu_engine.intent_router", self.router), \
+                patch.object(engine, "_mock_analyze") as mock_analyze, \
+                patch("openai.ChatCompletion.acreate", AsyncMock()) as acreate:
+            acreate.return_value.choices[0].message.content = '{"intent": "order_flowers", "entities": {"recipient": "Freundin"}, "confidence": 0.95}'
+
+            greeting = await engine.analyze("Hallo JARVIS", {"user_id": "a"})
+            assert greeting["intent"] == "greeting"
+            assert acreate.await_count == 0
+
+            # Orders need entities and go to the LLM even when the classifier is sure
+            order = await engine.analyze("Bestelle meiner Freundin rote Rosen", {"user_id": "a"})
+            assert order == llm_result
+            assert acreate.await_count == 1
+
+            # Inside a multi-step flow the LLM sees the conversation state
+            await engine.analyze("Hallo", {"user_id": "a", "conversation_state": "collecting_flower_order"})
+            assert acreate.await_count == 2
+
+            mock_analyze.assert_not_called()
@@ -0,0 +1,56 @@
+import pytest
+
+from app.services.keyword_matcher import KeywordMatch, KeywordMatcher, keyword_matcher
+from app.services.nlu_engine import NLUEngine
+from app.services.speech_service import SpeechService
+
+class TestKeywordMatcher:
+
+    def setup_method(self):
+        """Setup for each test"""
+        self.matcher = KeywordMatcher({
+            "greeting": ["hi", "hallo", "guten tag"],
+            "order": ["bestell*"],
+            "pronoun": ["he", "she", "his", "hers"]
+        })
+
+    def test_single_pass_reports_all_hits(self):
+        """Test every hit is reported with its category and position"""
+        matches = self.matcher.find("Guten Tag! Hi, ich bestelle")
+
+        assert matches == [
+            KeywordMatch("greeting", "guten tag", 0, 9),
+            KeywordMatch("greeting", "hi", 11, 13),
+            KeywordMatch("order", "bestell", 19, 26)
+        ]
+
+    def test_word_boundaries(self):
+        """Test keywords do not match inside other words"""
+        assert self.matcher.find("Das ist nicht hilfreich") == []
+        assert self.matcher.categories("she ushers his") == {"pronoun"}
+        assert [match.keyword for match in self.matcher.find("she ushers his")] == ["she", "his"]
+
+    def test_stems_and_namespaces(self):
+        """Test stems match word prefixes only and namespaces filter hits"""
+        assert self.matcher.categories("Bestellung bitte") == {"order"}
+        assert self.matcher.categories("abbestellen") == set()
+
+        assert keyword_matcher.categories("Bestelle meiner Freundin rote Rosen", "recipient:") == {"Freundin"}
+        assert keyword_matcher.categories("Nein, noch nicht", "confirm:") == {"no"}
+
+    def test_register_rebuilds(self):
+        """Test tables registered later are matched"""
+        self.matcher.find("hi")
+        self.matcher.register({"goodbye": ["tschüss"]})
+
+        assert self.matcher.categories("Tschüss!") == {"goodbye"}
+
+    @pytest.mark.asyncio
+    async def test_rule_based_callers(self):
+        """Test substring false positives of the old checks are gone"""
+        engine = NLUEngine()
+
+        assert (await engine._mock_analyze("Hilfe", {}))["intent"] == "help"
+        assert engine._extract_recipient("Blumen zum Muttertag") is None
+        assert await SpeechService().detect_language("This is it") == "en-US"
+        assert await SpeechService().detect_language("Ich bin hier, wie ist das Wetter?") == "de-DE"
@@ -0,0 +1,153 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.core.config import settings
+from app.core.redis_client import MockRedisClient, redis_client
+from app.services.llm_governor import (
+    PRIORITY_CHAT,
+    PRIORITY_FLOW,
+    REASON_RPM,
+    REASON_TPM,
+    RELEASE_SCRIPT,
+    LLMGovernor
+)
+
+class TestLLMGovernor:
+
+    def setup_method(self):
+        """Setup for each test"""
+        # No Redis in tests: the governor enforces the local share of the budgets
+        self.patches = [
+            patch.object(settings, "NLU_GOVERNOR_ENABLED", True),
+            patch.object(settings, "NLU_GOVERNOR_REPLICAS", 1),
+            patch.object(settings, "NLU_GOVERNOR_BURST_SECONDS", 10.0),
+            patch.object(settings, "NLU_GOVERNOR_COMPLETION_TOKENS", 100),
+            patch.object(settings, "NLU_GOVERNOR_POLL_SECONDS", 0.01),
+            patch.object(redis_client, "eval", AsyncMock(return_value=None))
+        ]
+        for p in self.patches:
+            p.start()
+        self.governor = LLMGovernor(max_concurrency=1, rpm=600, tpm=60000)
+
+    def teardown_method(self):
+        for p in self.patches:
+            p.stop()
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limit_queues_calls(self):
+        """Test a second call waits until the first lease is released"""
+        first = await self.governor.acquire("gpt-4", 200)
+        second = asyncio.create_task(self.governor.acquire("gpt-4", 200))
+        await asyncio.sleep(0.05)
+        assert not second.done()
+        assert self.governor.waiting["gpt-4"]
+
+        await self.governor.release(first)
+        lease = await asyncio.wait_for(second, 1)
+        assert lease.local
+        assert not self.governor.waiting["gpt-4"]
+
+    @pytest.mark.asyncio
+    async def test_flow_turns_go_first(self):
+        """Test queued flow turns get the next lease before earlier chat turns"""
+        order = []
+        held = await self.governor.acquire("gpt-4", 200)
+
+        async def call(name, priority):
+            async with self.governor.slot("gpt-4", 200, priority):
+                order.append(name)
+
+        chat = asyncio.create_task(call("chat", PRIORITY_CHAT))
+        await asyncio.sleep(0.02)
+        flow = asyncio.create_task(call("flow", PRIORITY_FLOW))
+        await asyncio.sleep(0.02)
+
+        await self.governor.release(held)
+        await asyncio.wait_for(asyncio.gather(chat, flow), 1)
+        assert order == ["flow", "chat"]
+
+    @pytest.mark.asyncio
+    async def test_models_have_separate_budgets(self):
+        """Test a busy primary model does not block the secondary"""
+        await self.governor.acquire("gpt-4", 200)
+        lease = await asyncio.wait_for(self.governor.acquire("gpt-3.5-turbo", 200), 1)
+        assert lease.model == "gpt-3.5-turbo"
+
+    def test_token_budget_is_reserved_up_front(self):
+        """Test calls wait for tokens before the budget is exhausted"""
+        governor = LLMGovernor(max_concurrency=10, rpm=600, tpm=6000)  # 1000 tokens of burst
+        first = governor.estimate(700)
+        assert first == 800
+
+        lease = type("Lease", (), {})()
+        lease.model, lease.lease_id, lease.estimated_tokens, lease.local = "gpt-4", "a", first, False
+        assert governor._take_local(lease) == (0, 0)
+
+        lease.lease_id = "b"
+        wait_ms, reason = governor._take_local(lease)
+        assert reason == REASON_TPM
+        # 600 more tokens at 100 tokens per second
+        assert 5500 < wait_ms <= 6000
+
+    def test_request_budget(self):
+        """Test the requests-per-minute bucket"""
+        governor = LLMGovernor(max_concurrency=10, rpm=6, tpm=60000)  # 1 request of burst
+        lease = type("Lease", (), {})()
+        lease.model, lease.lease_id, lease.estimated_tokens, lease.local = "gpt-4", "a", 100, False
+        assert governor._take_local(lease) == (0, 0)
+
+        lease.lease_id = "b"
+        wait_ms, reason = governor._take_local(lease)
+        assert reason == REASON_RPM
+        assert 9000 < wait_ms <= 10000
+
+    @pytest.mark.asyncio
+    async def test_release_refunds_unused_tokens(self):
+        """Test the estimate is settled against the actual completion"""
+        async with self.governor.slot("gpt-4", 400) as lease:
+            assert lease.estimated_tokens == 500
+            lease.completion_tokens = 20
+
+        _, tokens, _ = self.governor._local_buckets["gpt-4"]
+        assert tokens == pytest.approx(10000 - 420, abs=5)
+        # The completion estimate follows the observed completions
+        assert self.governor.expected_completion_tokens == pytest.approx(92)
+
+    @pytest.mark.asyncio
+    async def test_shared_budget_through_redis(self):
+        """Test leases granted by Redis are released there with the refund"""
+        redis_client.eval.return_value = [0, 0]
+        async with self.governor.slot("gpt-4", 400) as lease:
+            lease.completion_tokens = 50
+
+        assert not lease.local
+        script, keys, args = redis_client.eval.call_args.args
+        assert script == RELEASE_SCRIPT
+        assert keys == ["llm_governor:gpt-4:bucket", "llm_governor:gpt-4:leases"]
+        assert args == [lease.lease_id, 50]
+
+    @pytest.mark.asyncio
+    async def test_scripts_share_budget_across_replicas(self):
+        """Test two governors on one Redis draw from the same concurrency and token budgets"""
+        self.patches[-1].stop()  # Redis available after all
+        with patch.object(redis_client, "redis_client", MockRedisClient()):
+            other = LLMGovernor(max_concurrency=1, rpm=600, tpm=60000)
+            first = await self.governor.acquire("gpt-4", 200)
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(other.acquire("gpt-4", 200), 0.05)
+
+            first.completion_tokens = 20
+            await self.governor.release(first)
+            second = await asyncio.wait_for(other.acquire("gpt-4", 200), 0.5)
+
+        assert not first.local and not second.local
+        assert self.governor._local_buckets == {} and other._local_buckets == {}
+
+    @pytest.mark.asyncio
+    async def test_disabled(self):
+        """Test a disabled governor grants immediately"""
+        with patch.object(settings, "NLU_GOVERNOR_ENABLED", False):
+            await self.governor.acquire("gpt-4", 200)
+            await asyncio.wait_for(self.governor.acquire("gpt-4", 200), 0.1)
+        redis_client.eval.assert_not_called()
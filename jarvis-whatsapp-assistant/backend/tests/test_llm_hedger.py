@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.core.config import settings
+from app.services.llm_hedger import HedgedLLMCaller
+from app.services.nlu_engine import NLUEngine
+
+def fake_attempt(delays, calls, errors=()):
+    """Attempt that answers after delays[model] seconds, or raises for models in errors"""
+    async def attempt(model, claim, timeout):
+        calls.append(model)
+        await asyncio.sleep(delays[model])
+        if model in errors:
+            raise RuntimeError(f"{model} failed")
+        claim()
+        return f"answer from {model}"
+    return attempt
+
+class TestHedgedLLMCaller:
+
+    def setup_method(self):
+        """Setup for each test"""
+        self.calls = []
+        self.caller = HedgedLLMCaller("gpt-4", "gpt-3.5-turbo", deadline_seconds=1.0)
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_is_not_hedged(self):
+        """Test a primary answering within the hedge delay runs alone"""
+        with patch.object(settings, "NLU_HEDGE_DELAY_SECONDS", 0.2), \
+                patch.object(settings, "NLU_HEDGE_MIN_DELAY_SECONDS", 0.05):
+            model, result = await self.caller.call(fake_attempt({"gpt-4": 0.01}, self.calls))
+
+        assert (model, result) == ("gpt-4", "answer from gpt-4")
+        assert self.calls == ["gpt-4"]
+        assert len(self.caller.latencies["gpt-4"]) == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_is_hedged_and_cancelled(self):
+        """Test the secondary wins against a stalled primary"""
+        with patch.object(settings, "NLU_HEDGE_DELAY_SECONDS", 0.05), \
+                patch.object(settings, "NLU_HEDGE_MIN_DELAY_SECONDS", 0.05):
+            model, _ = await self.caller.call(fake_attempt({"gpt-4": 10, "gpt-3.5-turbo": 0.01}, self.calls))
+
+        assert model == "gpt-3.5-turbo"
+        assert self.calls == ["gpt-4", "gpt-3.5-turbo"]
+
+    @pytest.mark.asyncio
+    async def test_failed_primary_hedges_immediately(self):
+        """Test a primary error starts the secondary without waiting for the delay"""
+        with patch.object(settings, "NLU_HEDGE_DELAY_SECONDS", 0.9):
+            start = asyncio.get_running_loop().time()
+            model, _ = await self.caller.call(
+                fake_attempt({"gpt-4": 0.01, "gpt-3.5-turbo": 0.01}, self.calls, errors={"gpt-4"})
+            )
+
+        assert model == "gpt-3.5-turbo"
+        assert asyncio.get_running_loop().time() - start < 0.5
+
+    @pytest.mark.asyncio
+    async def test_deadline(self):
+        """Test the call gives up at the deadline"""
+        caller = HedgedLLMCaller("gpt-4", "", deadline_seconds=0.1)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await caller.call(fake_attempt({"gpt-4": 10}, self.calls))
+
+    def test_hedge_delay_follows_percentile(self):
+        """Test the delay is the configured percentile of recent primary latencies"""
+        for latency in range(1, 101):
+            self.caller._record_latency("gpt-4", latency / 100)
+
+        with patch.object(settings, "NLU_HEDGE_PERCENTILE", 0.9), \
+                patch.object(settings, "NLU_HEDGE_MIN_DELAY_SECONDS", 0.1):
+            assert self.caller.hedge_delay() == pytest.approx(0.9)
+
+    @pytest.mark.asyncio
+    async def test_engine_uses_secondary_answer(self):
+        """Test the NLU engine returns the hedged model's valid JSON"""
+        engine = NLUEngine()
+        engine.openai_available = True
+
+        async def acreate(model, **kwargs):
+            await asyncio.sleep(10 if model == "gpt-4" else 0.01)
+            response = MagicMock()
+            response.choices[0].message.content = '{"intent": "get_weather", "entities": {"location": "Bremen"}, "confidence": 0.9, "response": "Sonnig"}'
+            return response
+
+        with patch("app.services.nlu_engine.llm_hedger", self.caller), \
+                patch.object(settings, "NLU_HEDGE_DELAY_SECONDS", 0.05), \
+                patch.object(settings, "NLU_HEDGE_MIN_DELAY_SECONDS", 0.05), \
+                patch("openai.ChatCompletion.acreate", acreate):
+            result = await engine.analyze("Wie wird das Wetter in Bremen?", {"conversation_state": "collecting_flower_order"})
+
+        assert result["entities"] == {"location": "Bremen"}
@@ -0,0 +1,120 @@
+import pytest
+import asyncio
+import hashlib
+import io
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.core.config import settings
+from app.core.redis_client import MockRedisClient, redis_client
+from app.services.media_cache import MediaCache, url_expiry
+from app.services.whatsapp_client import DownloadedMedia, WhatsAppAPIError, WhatsAppClient
+
+VOICE_NOTE = b"OggS" + bytes(range(256)) * 10
+VOICE_SHA256 = hashlib.sha256(VOICE_NOTE).hexdigest()
+
+def make_media(data: bytes = VOICE_NOTE) -> DownloadedMedia:
+    return DownloadedMedia(io.BytesIO(data), len(data), hashlib.sha256(data).hexdigest())
+
+class TestMediaCache:
+
+    def setup_method(self):
+        """Setup for each test"""
+        redis_client.redis_client = MockRedisClient()
+        self.client = MagicMock()
+        self.client.get_media_info = AsyncMock(side_effect=lambda media_id: {
+            "id": media_id,
+            "url": f"https://lookaside.fbsbx.com/whatsapp_business/attachments/?mid={media_id}",
+            "sha256": VOICE_SHA256,
+            "file_size": len(VOICE_NOTE)
+        })
+
+        async def download(url):
+            await asyncio.sleep(0.01)
+            return make_media()
+
+        self.client.download_media_to_file = AsyncMock(side_effect=download)
+
+    def test_url_expiry_from_ext_parameter(self):
+        """Test that the lookaside `ext` parameter is parsed as expiry"""
+        assert url_expiry("https://lookaside.fbsbx.com/?mid=1&ext=1700000300&hash=x") == 1700000300
+        assert url_expiry("https://lookaside.fbsbx.com/?mid=1") is None
+
+    @pytest.mark.asyncio
+    async def test_info_is_cached_until_url_expiry(self):
+        """Test that metadata is cached and an already expiring URL is not"""
+        cache = MediaCache(self.client)
+
+        await cache.get_info("m1")
+        await cache.get_info("m1")
+        assert self.client.get_media_info.await_count == 1
+
+        self.client.get_media_info.side_effect = lambda media_id: {"url": f"https://x/?ext={int(time.time()) + 5}"}
+        await cache.get_info("m2")
+        await cache.get_info("m2")
+        assert self.client.get_media_info.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_same_content_is_downloaded_once(self):
+        """Test that redelivered/forwarded media with the same sha256 hits the blob cache"""
+        cache = MediaCache(self.client)
+
+        first, second, third = await asyncio.gather(cache.fetch("m1"), cache.fetch("m2"), cache.fetch("m1"))
+
+        assert self.client.download_media_to_file.await_count == 1
+        assert first.read() == second.read() == third.read() == VOICE_NOTE
+
+    @pytest.mark.asyncio
+    async def test_blob_cache_evicts_least_recently_used(self):
+        """Test that the blob cache stays under its byte cap"""
+        cache = MediaCache(self.client, max_bytes=25, max_item_bytes=20)
+
+        for data in (b"a" * 10, b"b" * 10, b"c" * 10):
+            await cache._store_blob(make_media(data))
+
+        assert cache.blob_bytes == 20
+        assert hashlib.sha256(b"a" * 10).hexdigest() not in cache.blobs
+        assert sorted(path.stat().st_size for path in cache.directory.iterdir()) == [10, 10]
+
+        await cache._store_blob(make_media(b"d" * 21))
+        assert cache.blob_bytes == 20
+
+    @pytest.mark.asyncio
+    async def test_blobs_are_kept_on_disk(self, tmp_path):
+        """Test that cached bodies live in the cache directory, not in memory"""
+        with patch.object(settings, "MEDIA_BLOB_CACHE_DIR", str(tmp_path)):
+            cache = MediaCache(self.client)
+            await cache.fetch("m1")
+
+            assert (tmp_path / VOICE_SHA256).read_bytes() == VOICE_NOTE
+            assert cache.blobs == {VOICE_SHA256: len(VOICE_NOTE)}
+            with await cache.fetch("m2") as media:
+                assert media.file.name == str(tmp_path / VOICE_SHA256)
+                assert media.read() == VOICE_NOTE
+
+            # A file removed from the directory is downloaded again
+            (tmp_path / VOICE_SHA256).unlink()
+            assert (await cache.fetch("m1")).read() == VOICE_NOTE
+            assert self.client.download_media_to_file.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_media_url_is_cached_for_every_caller(self):
+        """Test that WhatsAppClient.get_media_url goes through the media cache"""
+        cache = MediaCache(self.client)
+        with patch("app.services.media_cache.media_cache", cache):
+            first = await WhatsAppClient.get_media_url(MagicMock(), "m1")
+            second = await WhatsAppClient.get_media_url(MagicMock(), "m1")
+
+        assert first == second == await cache.get_url("m1")
+        assert self.client.get_media_info.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_url_is_refreshed_once(self):
+        """Test that a 403 on a cached URL triggers a fresh metadata lookup"""
+        cache = MediaCache(self.client)
+        self.client.download_media_to_file.side_effect = [WhatsAppAPIError(403, "expired"), make_media()]
+
+        media = await cache.fetch("m1")
+
+        assert media.sha256 == VOICE_SHA256
+        assert self.client.get_media_info.await_count == 2
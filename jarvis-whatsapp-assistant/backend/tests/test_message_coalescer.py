@@ -0,0 +1,126 @@
+import pytest
+import asyncio
+from unittest.mock import MagicMock
+
+from app.core.redis_client import MockRedisClient, redis_client
+from app.models.webhook import InboundMessage
+from app.services.message_coalescer import MessageCoalescer, merge_text_messages
+from app.services.message_deduplicator import MessageDeduplicator
+from app.services.message_dispatcher import MessageDispatcher
+
+def make_message(sender: str, message_id: str, text: str = None, type: str = "text", timestamp: int = 0) -> InboundMessage:
+    return InboundMessage(id=message_id, sender_id=sender, type=type, timestamp=timestamp, text=text or message_id)
+
+class TestMessageCoalescer:
+
+    def setup_method(self):
+        """Setup for each test"""
+        self.flushed = []
+
+        def on_flush(sender_id, messages):
+            self.flushed.append((sender_id, [message.id for message in messages]))
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(None)
+            return future
+
+        self.on_flush = on_flush
+
+    def test_merge_joins_texts_and_keeps_last_id(self):
+        """Test that a burst becomes one text message with the last message ID"""
+        merged = merge_text_messages([
+            make_message("a", "m1", "Ich brauche"),
+            make_message("a", "m2", "einen Termin"),
+            make_message("a", "m3", "morgen")
+        ])
+
+        assert merged.id == "m3"
+        assert merged.text == "Ich brauche\neinen Termin\nmorgen"
+
+    @pytest.mark.asyncio
+    async def test_window_collects_burst(self):
+        """Test that messages inside the window are flushed together"""
+        coalescer = MessageCoalescer(self.on_flush, window_ms=30, max_wait_ms=1000, max_messages=10)
+
+        waiters = [coalescer.add(make_message("a", "m1"))]
+        await asyncio.sleep(0.01)
+        waiters.append(coalescer.add(make_message("a", "m2")))
+        waiters.append(coalescer.add(make_message("b", "n1")))
+        await asyncio.gather(*waiters)
+
+        assert sorted(self.flushed) == [("a", ["m1", "m2"]), ("b", ["n1"])]
+
+    @pytest.mark.asyncio
+    async def test_max_messages_flushes_immediately(self):
+        """Test that a full burst does not wait for the window"""
+        coalescer = MessageCoalescer(self.on_flush, window_ms=10000, max_wait_ms=10000, max_messages=2)
+
+        coalescer.add(make_message("a", "m1"))
+        coalescer.add(make_message("a", "m2"))
+
+        assert self.flushed == [("a", ["m1", "m2"])]
+        assert not coalescer.pending
+
+    @pytest.mark.asyncio
+    async def test_max_wait_caps_sliding_window(self):
+        """Test that a steady stream is flushed after max_wait at the latest"""
+        coalescer = MessageCoalescer(self.on_flush, window_ms=30, max_wait_ms=50, max_messages=100)
+
+        for i in range(6):
+            coalescer.add(make_message("a", f"m{i}"))
+            await asyncio.sleep(0.02)
+
+        assert self.flushed
+        assert len(self.flushed[0][1]) < 6
+        coalescer.flush_all()
+
+class TestDispatcherCoalescing:
+
+    def setup_method(self):
+        """Setup for each test"""
+        redis_client.redis_client = MockRedisClient()
+        self.processed = []
+
+        async def process_message(message):
+            self.processed.append((message.id, message.type, message.text))
+
+        self.processor = MagicMock()
+        self.processor.process_message = process_message
+
+    @pytest.mark.asyncio
+    async def test_burst_is_processed_once(self):
+        """Test that rapid-fire texts across webhooks produce a single processing call"""
+        dispatcher = MessageDispatcher(self.processor, deduplicator=MessageDeduplicator(), coalesce_window_ms=30)
+
+        await asyncio.gather(
+            dispatcher.dispatch([make_message("a", "m1", "Hallo", timestamp=1)]),
+            dispatcher.dispatch([make_message("a", "m2", "wie spät ist es?", timestamp=2)])
+        )
+
+        assert self.processed == [("m2", "text", "Hallo\nwie spät ist es?")]
+        await dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_non_text_flushes_pending_burst_first(self):
+        """Test that a media message is processed after the texts sent before it"""
+        dispatcher = MessageDispatcher(self.processor, deduplicator=MessageDeduplicator(), coalesce_window_ms=1000)
+
+        await dispatcher.dispatch([
+            make_message("a", "m1", timestamp=1),
+            make_message("a", "img", type="image", timestamp=2)
+        ])
+
+        assert [entry[0] for entry in self.processed] == ["m1", "img"]
+        await dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_redelivered_message_is_dropped_from_burst(self):
+        """Test that already processed IDs are left out of a merged burst"""
+        deduplicator = MessageDeduplicator()
+        await deduplicator.claim("m1")
+        await deduplicator.mark_done("m1")
+        dispatcher = MessageDispatcher(self.processor, deduplicator=deduplicator, coalesce_window_ms=20)
+
+        await dispatcher.dispatch([make_message("a", "m1", timestamp=1), make_message("a", "m2", timestamp=2)])
+
+        assert self.processed == [("m2", "text", "m2")]
+        await dispatcher.close()
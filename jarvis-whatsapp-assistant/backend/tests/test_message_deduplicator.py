@@ -0,0 +1,75 @@
+import pytest
+
+from app.core.redis_client import redis_client, MockRedisClient
+from app.services.message_deduplicator import BloomFilter, MessageDeduplicator
+
+class TestBloomFilter:
+
+    def test_membership(self):
+        """Test that added items are always found"""
+        bloom = BloomFilter(capacity=1000, error_rate=0.001)
+        for i in range(1000):
+            bloom.add(f"wamid.{i}")
+
+        assert all(f"wamid.{i}" in bloom for i in range(1000))
+
+    def test_false_positive_rate(self):
+        """Test that unseen items are rarely reported as present"""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"wamid.{i}")
+
+        false_positives = sum(f"other.{i}" in bloom for i in range(10000))
+        assert false_positives < 300
+
+class TestMessageDeduplicator:
+
+    def setup_method(self):
+        """Setup for each test"""
+        redis_client.redis_client = MockRedisClient()
+        self.deduplicator = MessageDeduplicator()
+
+    def teardown_method(self):
+        """Reset the shared Redis client"""
+        redis_client.redis_client = None
+
+    @pytest.mark.asyncio
+    async def test_first_delivery_is_claimed(self):
+        """Test that a new message ID is processed"""
+        assert await self.deduplicator.claim("wamid.1") is True
+        assert self.deduplicator.stats["miss"] == 1
+
+    @pytest.mark.asyncio
+    async def test_local_hit_after_done(self):
+        """Test that a handled message is rejected from the Bloom filter"""
+        await self.deduplicator.claim("wamid.1")
+        await self.deduplicator.mark_done("wamid.1")
+
+        assert await self.deduplicator.claim("wamid.1") is False
+        assert self.deduplicator.stats["local_hit"] == 1
+        assert redis_client.redis_client.data["dedup:message:wamid.1"] == "done"
+
+    @pytest.mark.asyncio
+    async def test_redis_hit_from_other_replica(self):
+        """Test that a message claimed by another replica is rejected"""
+        other_replica = MessageDeduplicator()
+        await other_replica.claim("wamid.1")
+
+        assert await self.deduplicator.claim("wamid.1") is False
+        assert self.deduplicator.stats["redis_hit"] == 1
+
+    @pytest.mark.asyncio
+    async def test_release_allows_retry(self):
+        """Test that a released claim can be processed again"""
+        await self.deduplicator.claim("wamid.1")
+        await self.deduplicator.release("wamid.1")
+
+        assert await self.deduplicator.claim("wamid.1") is True
+
+    @pytest.mark.asyncio
+    async def test_redis_unavailable_fails_open(self):
+        """Test that messages are processed when Redis is down"""
+        redis_client.redis_client = None
+
+        assert await self.deduplicator.claim("wamid.1") is True
+        assert await self.deduplicator.claim("wamid.1") is True
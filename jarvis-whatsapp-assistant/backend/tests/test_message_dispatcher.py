@@ -0,0 +1,82 @@
+import pytest
+import asyncio
+from unittest.mock import MagicMock
+
+from app.services.message_deduplicator import MessageDeduplicator
+from app.models.webhook import InboundMessage
+from app.services.message_dispatcher import MessageDispatcher
+
+def make_message(sender: str, message_id: str, timestamp: int = 0) -> InboundMessage:
+    return InboundMessage(id=message_id, sender_id=sender, type="text", timestamp=timestamp, text=message_id)
+
+class TestMessageDispatcher:
+
+    def setup_method(self):
+        """Setup for each test"""
+        self.processed = []
+        self.active = 0
+        self.max_active = 0
+
+        async def process_message(message):
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            await asyncio.sleep(0.01)
+            self.processed.append(message.id)
+            self.active -= 1
+
+        self.processor = MagicMock()
+        self.processor.process_message = process_message
+
+    @pytest.mark.asyncio
+    async def test_dispatch_keeps_per_sender_order(self):
+        """Test that one sender's messages are processed in timestamp order"""
+        dispatcher = MessageDispatcher(self.processor, max_concurrency=4, deduplicator=MessageDeduplicator())
+
+        await dispatcher.dispatch([
+            make_message("a", "a2", timestamp=2),
+            make_message("b", "b1", timestamp=1),
+            make_message("a", "a1", timestamp=1),
+            make_message("a", "a3", timestamp=3)
+        ])
+
+        a_order = [message_id for message_id in self.processed if message_id.startswith("a")]
+        assert a_order == ["a1", "a2", "a3"]
+        assert len(self.processed) == 4
+        await dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_dispatch_bounds_concurrency_across_senders(self):
+        """Test that different senders run concurrently up to the limit"""
+        dispatcher = MessageDispatcher(self.processor, max_concurrency=2, deduplicator=MessageDeduplicator())
+
+        await dispatcher.dispatch([make_message(str(i), f"m{i}") for i in range(6)])
+
+        assert len(self.processed) == 6
+        assert self.max_active == 2
+        await dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_dispatch_skips_redelivered_messages(self):
+        """Test that a redelivered message ID is processed only once"""
+        dispatcher = MessageDispatcher(self.processor, deduplicator=MessageDeduplicator())
+
+        await dispatcher.dispatch([make_message("a", "wamid.1")])
+        await dispatcher.dispatch([make_message("a", "wamid.1"), make_message("a", "wamid.2")])
+
+        assert self.processed == ["wamid.1", "wamid.2"]
+        await dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_messages_across_payloads_stay_ordered(self):
+        """Test that a sender's messages from concurrent payloads never interleave"""
+        dispatcher = MessageDispatcher(self.processor, deduplicator=MessageDeduplicator())
+
+        await asyncio.gather(
+            dispatcher.dispatch([make_message("a", "a1")]),
+            dispatcher.dispatch([make_message("a", "a2")]),
+            dispatcher.dispatch([make_message("a", "a3")])
+        )
+
+        assert self.processed == ["a1", "a2", "a3"]
+        assert self.max_active == 1
+        await dispatcher.close()
@@ -0,0 +1,33 @@
+import re
+import pytest
+
+from app.services.nlu_engine import NLUEngine
+from benchmarks.nlu_benchmark import DEFAULT_CORPUS, PATHS, load_corpus, run_benchmark
+
+class TestNLUBenchmark:
+
+    def test_corpus_covers_every_intent(self):
+        """Test the corpus has German and English messages for every prompt intent"""
+        prompt_intents = set(re.findall(r"^- (\w+):", NLUEngine()._get_system_prompt(), re.MULTILINE))
+        utterances = load_corpus(DEFAULT_CORPUS)
+
+        for language in ("de", "en"):
+            assert {u.intent for u in utterances if u.language == language} == prompt_intents
+
+    @pytest.mark.asyncio
+    async def test_report(self):
+        """Test every path reports accuracy, confusion and latency percentiles"""
+        report = await run_benchmark(repeat=1)
+
+        assert report["corpus"]["utterances"] == len(load_corpus(DEFAULT_CORPUS))
+        assert set(report["paths"]) == set(PATHS)
+        for summary in report["paths"].values():
+            assert 0 <= summary["accuracy"] <= 1
+            assert set(summary["latency_ms"]) == {"p50", "p95", "p99", "mean"}
+            assert summary["latency_ms"]["p50"] <= summary["latency_ms"]["p99"]
+            assert sum(sum(row.values()) for row in summary["confusion"].values()) == summary["utterances"]
+
+        # The stubbed LLM is always right, so misses come from local routes answering wrongly
+        assert report["paths"]["llm"]["accuracy"] >= 0.95
+        # Repeated messages are served without the LLM when their intent is cacheable
+        assert report["paths"]["cache"]["coverage"] > report["paths"]["llm"]["coverage"]
@@ -0,0 +1,101 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.core.redis_client import MockRedisClient, redis_client
+from app.services.nlu_cache import NLUCache, normalize_text
+from app.services.nlu_engine import NLUEngine
+
+GREETING = {
+    "intent": "greeting",
+    "entities": {},
+    "confidence": 0.97,
+    "response": "Hallo! Wie kann ich helfen?",
+    "action": "greet_user",
+    "next_step": "await_user_request"
+}
+
+# What the cache keeps of it
+GREETING_CLASSIFICATION = {"intent": "greeting", "entities": {}, "confidence": 0.97}
+
+class TestNLUCache:
+
+    def setup_method(self):
+        """Setup for each test"""
+        redis_client.redis_client = MockRedisClient()
+        self.cache = NLUCache(max_entries=2)
+        self.context = {"user_id": "a", "conversation_state": "idle", "message_count": 3}
+
+    def test_normalize_text(self):
+        """Test that case, punctuation and whitespace do not change the key text"""
+        assert normalize_text("  Hallo,   JARVIS!! ") == "hallo jarvis"
+        assert normalize_text("Wie spät ist es?") == "wie spät ist es"
+
+    def test_key_ignores_irrelevant_context(self):
+        """Test that only conversation state and last intent are part of the key"""
+        other_user = {"user_id": "b", "conversation_state": "idle", "message_count": 99}
+
+        assert self.cache.key("Hallo!", self.context) == self.cache.key("hallo", other_user)
+        assert self.cache.key("Ja", self.context) != self.cache.key("Ja", {"conversation_state": "confirming_flower_order"})
+        assert self.cache.key("x" * 100, self.context) is None
+
+    @pytest.mark.asyncio
+    async def test_local_and_redis_tiers(self):
+        """Test that results are served locally and, after eviction, from Redis"""
+        assert await self.cache.set("Hallo", self.context, GREETING) is True
+
+        assert await self.cache.get("hallo!", {"user_id": "b"}) == GREETING_CLASSIFICATION
+
+        await self.cache.set("Hi", self.context, GREETING)
+        await self.cache.set("Hey", self.context, GREETING)
+        assert self.cache.key("Hallo", self.context) not in self.cache.local
+        assert await self.cache.get("Hallo", self.context) == GREETING_CLASSIFICATION
+        assert self.cache.key("Hallo", self.context) in self.cache.local
+
+    @pytest.mark.asyncio
+    async def test_per_intent_rules(self):
+        """Test that user specific, uncertain and non-cacheable results are not stored"""
+        order = dict(GREETING, intent="order_flowers")
+        with_entities = dict(GREETING, entities={"recipient": "Freundin"})
+        uncertain = dict(GREETING, confidence=0.4)
+
+        assert await self.cache.set("Rosen", self.context, order) is False
+        assert await self.cache.set("Hallo Anna", self.context, with_entities) is False
+        assert await self.cache.set("Hallo", self.context, uncertain) is False
+        assert await self.cache.set("Hallo", self.context, dict(GREETING, entities={"name": None})) is True
+
+    @pytest.mark.asyncio
+    async def test_engine_uses_cache_before_llm(self):
+        """Test that a cached result skips the OpenAI call"""
+        engine = NLUEngine()
+        engine.openai_available = True
+        response = MagicMock()
+        response.choices[0].message.content = '{"intent": "help", "entities": {}, "confidence": 0.97, "response": "Ich kann vieles."}'
+
+        with patch("app.services.nlu_engine.nlu_cache", self.cache), \
+                patch("app.services.nlu_engine.intent_router") as router, \
+                patch("openai.ChatCompletion.acreate", AsyncMock(return_value=response)) as acreate:
+            router.enabled = False
+            first = await engine.analyze("Was kannst du?", self.context)
+            second = await engine.analyze("was kannst du", {"user_id": "b"})
+
+        assert acreate.await_count == 1
+        assert first["response"] == "Ich kann vieles."
+        # The other sender gets the intent's canned reply, not the one written for the first
+        assert second == dict(engine._local_result("help", 0.97), entities={})
+
+    @pytest.mark.asyncio
+    async def test_reply_text_is_not_stored(self):
+        """Test that a reply written for one sender never reaches the shared cache"""
+        personal = dict(GREETING, response="Hallo Anna! Wie war der Termin beim Zahnarzt?")
+        await self.cache.set("Hallo", self.context, personal)
+
+        stored = await redis_client.get(self.cache.key("Hallo", self.context))
+        assert "Anna" not in stored
+        assert "response" not in await self.cache.get("hallo", {"user_id": "b"})
+
+    @pytest.mark.asyncio
+    async def test_general_chat_is_not_shared(self):
+        """Test chat replies, which draw on the user's history, are not cached"""
+        chat = dict(GREETING, intent="general_chat", response="Gut, und wie war dein Termin, Anna?")
+        assert await self.cache.set("Wie geht es dir?", self.context, chat) is False
+        assert await self.cache.get("Wie geht es dir?", {"user_id": "b"}) is None
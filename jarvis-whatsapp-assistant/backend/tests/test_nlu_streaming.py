@@ -0,0 +1,126 @@
+import asyncio
+import json
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from unittest.mock import AsyncMock, patch
+
+from app.core.config import settings
+from app.core.redis_client import MockRedisClient, redis_client
+from app.services.message_processor import MessageProcessor
+from app.services.nlu_engine import NLUEngine
+from app.services.streaming_json import IncrementalJSONObject
+
+RESULT = {
+    "intent": "general_chat",
+    "entities": {},
+    "confidence": 0.9,
+    "response": "Mir geht es gut, danke!",
+    "action": "general_response",
+    "next_step": "await_user_request"
+}
+
+class TestIncrementalJSONObject:
+
+    def test_fields_complete_in_order(self):
+        """Test top-level fields are reported as soon as their value is complete"""
+        text = '```json\n{"intent": "order_flowers", "entities": {"recipient": "Fr\\"eundin", "tags": ["}"]}, "confidence": 0.95, "response": "Gerne!"}\n```'
+        parser = IncrementalJSONObject()
+
+        completed = []
+        for char in text:
+            completed.extend(parser.feed(char))
+
+        assert completed == ["intent", "entities", "confidence", "response"]
+        assert parser.done
+        assert parser.fields == json.loads(text[8:-4])
+
+    def test_partial_object(self):
+        """Test a truncated stream keeps the completed fields only"""
+        parser = IncrementalJSONObject()
+
+        assert parser.feed('{"intent": "help", "confidence": 0.') == {"intent": "help"}
+        assert parser.feed('9, "resp') == {"confidence": 0.9}
+        assert not parser.done
+
+class TestNLUStreaming:
+
+    def setup_method(self):
+        """Setup for each test"""
+        redis_client.redis_client = MockRedisClient()
+        self.release = asyncio.Event()
+        self.events = []
+
+        async def completions(request):
+            body = await request.json()
+            assert body["stream"] is True
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+
+            text = json.dumps(RESULT, ensure_ascii=False)
+            split = text.index('"action"')
+            for part in (text[:split], text[split:]):
+                for start in range(0, len(part), 8):
+                    chunk = {
+                        "id": "chatcmpl-1",
+                        "object": "chat.completion.chunk",
+                        "created": 0,
+                        "model": "gpt-4",
+                        "choices": [{"index": 0, "delta": {"content": part[start:start + 8]}, "finish_reason": None}]
+                    }
+                    await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                if not self.release.is_set():
+                    # Hold the rest of the completion until the reply went out
+                    await asyncio.wait_for(self.release.wait(), 5)
+            self.events.append("stream_end")
+            await response.write(b"data: [DONE]\n\n")
+            return response
+
+        self.app = web.Application()
+        self.app.router.add_post("/v1/chat/completions", completions)
+
+    def make_engine(self, server: TestServer) -> NLUEngine:
+        engine = NLUEngine()
+        engine.openai_available = True
+        with patch.object(settings, "OPENAI_API_KEY", "sk-test"), \
+                patch.object(settings, "OPENAI_BASE_URL", str(server.make_url("/v1"))):
+            engine._get_async_client()
+        return engine
+
+    @pytest.mark.asyncio
+    async def test_reply_is_dispatched_before_stream_ends(self):
+        """Test on_ready fires once intent and response are parsed"""
+        async def on_ready(partial):
+            self.events.append(("ready", partial["intent"], partial["response"]))
+            self.release.set()
+
+        with patch.object(settings, "NLU_CACHE_ENABLED", False), \
+                patch.object(settings, "NLU_CLASSIFIER_ENABLED", False):
+            async with TestServer(self.app) as server:
+                result = await self.make_engine(server).analyze("Wie geht es dir?", {}, on_ready=on_ready)
+
+        assert self.events == [("ready", "general_chat", RESULT["response"]), "stream_end"]
+        assert result == RESULT
+
+    @pytest.mark.asyncio
+    async def test_processor_sends_reply_early(self):
+        """Test the message processor replies from the partial result"""
+        processor = MessageProcessor()
+        processor.outbound = AsyncMock()
+
+        async def send_text_message(to, text):
+            self.events.append(("sent", text))
+            self.release.set()
+
+        processor.outbound.send_text_message.side_effect = send_text_message
+        context = {"user_id": "49151", "conversation_state": "idle"}
+
+        with patch.object(settings, "NLU_CACHE_ENABLED", False), \
+                patch.object(settings, "NLU_CLASSIFIER_ENABLED", False):
+            async with TestServer(self.app) as server:
+                with patch("app.services.message_processor.nlu_engine", self.make_engine(server)):
+                    await processor.process_text_message("49151", "Wie geht es dir?", context)
+
+        assert self.events == [("sent", RESULT["response"]), "stream_end"]
+        assert context["last_intent"] == "general_chat"
+        assert context["last_response"] == RESULT["response"]
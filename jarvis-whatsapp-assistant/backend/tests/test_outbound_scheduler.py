@@ -0,0 +1,105 @@
+import pytest
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+from app.core.config import settings
+from app.core.redis_client import MockRedisClient, redis_client
+from app.services.outbound_scheduler import PRIORITY_BULK, PRIORITY_REPLY, OutboundScheduler, TokenBucket
+from app.services.whatsapp_client import WhatsAppAPIError
+
+class TestOutboundScheduler:
+
+    def setup_method(self):
+        """Setup for each test"""
+        redis_client.redis_client = MockRedisClient()
+        self.sent = []
+
+        async def send_message(to, message):
+            await asyncio.sleep(0.01)
+            self.sent.append(to)
+            return {"messages": [{"id": f"wamid.{to}"}]}
+
+        self.client = MagicMock()
+        self.client.phone_number_id = "123"
+        self.client.send_message = AsyncMock(side_effect=send_message)
+
+    def make_scheduler(self, **kwargs) -> OutboundScheduler:
+        kwargs.setdefault("workers", 1)
+        return OutboundScheduler(
+            self.client,
+            bucket=TokenBucket(rate=1000, capacity=1000),
+            retry_base=0.001,
+            retry_max=0.01,
+            **kwargs
+        )
+
+    def test_local_bucket_limits_burst(self):
+        """Test that the in-process bucket hands out `capacity` tokens, then asks to wait"""
+        bucket = TokenBucket(rate=10, capacity=2)
+
+        assert bucket._take_local("123") == 0
+        assert bucket._take_local("123") == 0
+        assert bucket._take_local("123") > 0
+        assert bucket._take_local("456") == 0
+
+    @pytest.mark.asyncio
+    async def test_shared_bucket_through_redis(self):
+        """Test the bucket script limits the burst through Redis without the local fallback"""
+        bucket = TokenBucket(rate=10, capacity=2)
+
+        assert await bucket.take("123") == 0
+        assert await bucket.take("123") == 0
+        assert await bucket.take("123") > 0
+        assert await bucket.take("456") == 0
+        assert bucket.local == {}
+
+    @pytest.mark.asyncio
+    async def test_replies_jump_ahead_of_bulk(self):
+        """Test that reply traffic is sent before queued bulk traffic"""
+        scheduler = self.make_scheduler()
+
+        futures = [scheduler.submit(f"bulk{i}", {"type": "text"}, PRIORITY_BULK) for i in range(3)]
+        futures.append(scheduler.submit("reply", {"type": "text"}, PRIORITY_REPLY))
+        await asyncio.gather(*futures)
+
+        assert self.sent.index("reply") <= 1
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_transient_failure_is_retried(self):
+        """Test that 5xx errors are retried until the send succeeds"""
+        self.client.send_message.side_effect = [WhatsAppAPIError(503, "unavailable"), {"messages": []}]
+        scheduler = self.make_scheduler()
+
+        result = await scheduler.send_text_message("49151", "Hallo")
+
+        assert result == {"messages": []}
+        assert self.client.send_message.await_count == 2
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_permanent_failure_is_dead_lettered(self):
+        """Test that 4xx errors are not retried and end up in the dead-letter list"""
+        self.client.send_message.side_effect = WhatsAppAPIError(400, "invalid recipient")
+        scheduler = self.make_scheduler()
+
+        with pytest.raises(WhatsAppAPIError):
+            await scheduler.send_text_message("49151", "Hallo")
+
+        assert self.client.send_message.await_count == 1
+        entries = await redis_client.lrange(settings.OUTBOUND_DEAD_LETTER_KEY, 0, -1)
+        assert json.loads(entries[-1])["to"] == "49151"
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_retries_are_bounded(self):
+        """Test that a persistently failing send gives up after max_attempts"""
+        self.client.send_message.side_effect = WhatsAppAPIError(500, "error")
+        scheduler = self.make_scheduler(max_attempts=3)
+
+        with pytest.raises(WhatsAppAPIError):
+            await scheduler.send_text_message("49151", "Hallo")
+
+        assert self.client.send_message.await_count == 3
+        await scheduler.stop()
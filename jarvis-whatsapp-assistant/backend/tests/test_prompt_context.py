@@ -0,0 +1,85 @@
+import json
+import threading
+import pytest
+from unittest.mock import patch
+
+from app.services.nlu_engine import NLUEngine
+from app.services.prompt_context import ContextProjector, TokenCounter
+
+CONTEXT = {
+    "user_id": "491701234567",
+    "conversation_state": "collecting_flower_order",
+    "preferences": {"language": "de"},
+    "active_tasks": [{"id": "t1"}],
+    "message_count": 12,
+    "first_interaction": False,
+    "last_message": "für meine Freundin",
+    "last_response": "Ich benötige noch: Lieferadresse",
+    "last_intent": "order_flowers",
+    "active_order": {"recipient": "Freundin", "flower_type": "rote Rosen"}
+}
+
+class TestPromptContext:
+
+    def setup_method(self):
+        """Setup for each test"""
+        self.counter = TokenCounter()
+        self.projector = ContextProjector(self.counter, max_field_chars=50)
+
+    def test_token_count(self):
+        """Test token counts are positive and grow with the text"""
+        assert self.counter.count("") == 0
+        assert 0 < self.counter.count("Hallo JARVIS") < self.counter.count("Hallo JARVIS, wie ist das Wetter?")
+
+    @pytest.mark.asyncio
+    async def test_encoding_is_loaded_off_the_event_loop(self):
+        """Test load() fetches the encoding in a worker thread, and only until it is loaded"""
+        threads = []
+
+        def get_encoding():
+            threads.append(threading.current_thread())
+
+        with patch.object(self.counter, "_get_encoding", side_effect=get_encoding):
+            await self.counter.load()
+        assert len(threads) == 1 and threads[0] is not threading.main_thread()
+
+        self.counter._loaded = True
+        with patch.object(self.counter, "_get_encoding") as get_encoding:
+            await self.counter.load()
+        get_encoding.assert_not_called()
+
+    def test_projects_state_fields_in_priority_order(self):
+        """Test only fields relevant for the state are kept"""
+        projected = self.projector.project(CONTEXT, 1000)
+
+        assert list(projected) == ["conversation_state", "active_order", "last_intent", "last_response", "preferences"]
+
+        confirming = self.projector.project(dict(CONTEXT, conversation_state="confirming_flower_order"), 1000)
+        assert "active_order" not in confirming
+        assert "preferences" not in confirming
+
+    def test_budget_drops_fields_that_do_not_fit(self):
+        """Test the projection never exceeds the budget"""
+        budget = self.counter.count(json.dumps({
+            "conversation_state": "collecting_flower_order",
+            "active_order": CONTEXT["active_order"]
+        }, ensure_ascii=False))
+
+        projected = self.projector.project(CONTEXT, budget)
+
+        assert list(projected) == ["conversation_state", "active_order"]
+        assert self.projector.project(CONTEXT, 0) == {}
+
+    def test_long_fields_are_clipped(self):
+        """Test long strings are clipped before counting"""
+        projected = self.projector.project(dict(CONTEXT, conversation_state="idle", last_response="x" * 500), 1000)
+
+        assert projected["last_response"] == "x" * 50 + "…"
+
+    def test_user_prompt_contains_projection_only(self):
+        """Test the NLU prompt no longer embeds the full context"""
+        prompt = NLUEngine()._get_user_prompt("Hauptstraße 5, Berlin", CONTEXT)
+
+        assert '"recipient": "Freundin"' in prompt
+        assert "491701234567" not in prompt
+        assert "active_tasks" not in prompt
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.services.nlu_engine import NLUEngine
+from app.services.semantic_cache import SemanticCache, hashed_vector
+
+HELP = {
+    "intent": "help",
+    "entities": {},
+    "confidence": 0.95,
+    "response": "Ich kann Blumen bestellen, Termine planen und mehr.",
+    "action": "show_help",
+    "next_step": "await_user_request"
+}
+
+HELP_CLASSIFICATION = {"intent": "help", "entities": {}, "confidence": 0.95}
+
+class TestSemanticCache:
+
+    def setup_method(self):
+        """Setup for each test"""
+        self.cache = SemanticCache(capacity=3, dim=4096, threshold=0.75)
+        self.context = {"user_id": "a", "conversation_state": "idle"}
+
+    def test_hashed_vector(self):
+        """Test vectors are normalized and similar texts score higher"""
+        vector = hashed_vector("Hilfe bitte", 4096)
+        assert vector.dtype == np.float32
+        assert np.linalg.norm(vector) == pytest.approx(1.0)
+        assert float(vector @ hashed_vector("hilfe bitteee", 4096)) > 0.75
+        assert float(vector @ hashed_vector("Wie spät ist es?", 4096)) < 0.5
+        assert not hashed_vector("!!!", 4096).any()
+
+    def test_near_duplicate_hit(self):
+        """Test a result is reused for a similar message only"""
+        assert self.cache.set("Was kannst du?", self.context, HELP)
+
+        assert self.cache.get("was kannst du alles", self.context) == HELP_CLASSIFICATION
+        assert self.cache.get("Wie spät ist es?", self.context) is None
+        # Other conversation state
+        assert self.cache.get("Was kannst du?", {"conversation_state": "collecting_flower_order"}) is None
+
+    def test_added_content_misses(self):
+        """Test a similar message that asks for more than the cached one is not served from it"""
+        greeting = {**HELP, "intent": "greeting", "response": "Hallo! Wie kann ich helfen?"}
+        assert self.cache.set("Hallo Jarvis", self.context, greeting)
+
+        assert self.cache.get("hallo jarvis!", self.context) == {**HELP_CLASSIFICATION, "intent": "greeting"}
+        assert self.cache.get("Hallo Jarvis, Rosen", self.context) is None
+        assert self.cache.get("Hallo Jarvis, bitte Tulpen", self.context) is None
+
+    def test_only_safe_intents(self):
+        """Test chat, entity and low-confidence results are not indexed"""
+        assert not self.cache.set("Wie geht es dir?", self.context, {**HELP, "intent": "general_chat"})
+        assert not self.cache.set("Hilfe", self.context, {**HELP, "entities": {"topic": "Blumen"}})
+        assert not self.cache.set("Hilfe", self.context, {**HELP, "confidence": 0.3})
+        assert len(self.cache) == 0
+
+    def test_lru_eviction(self):
+        """Test the least recently used row is replaced when the index is full"""
+        for text in ("Hilfe bitte", "Was kannst du?", "Welche Funktionen gibt es?"):
+            self.cache.set(text, self.context, HELP)
+        assert self.cache.get("hilfe bitteee", self.context)
+
+        self.cache.set("Zeig mir die Befehle", self.context, HELP)
+        assert len(self.cache) == 3
+        assert self.cache.get("hilfe bitteee", self.context)
+        assert self.cache.get("was kannst du alles", self.context) is None
+
+    def test_same_text_updates_row(self):
+        """Test storing the same message again does not take another row"""
+        self.cache.set("Hilfe bitte", self.context, HELP)
+        self.cache.set("hilfe, bitte!", self.context, {**HELP, "confidence": 0.99})
+        assert len(self.cache) == 1
+        assert self.cache.get("Hilfe bitte", self.context)["confidence"] == 0.99
+
+    @pytest.mark.asyncio
+    async def test_engine_reuses_similar_llm_results(self):
+        """Test a paraphrase is answered from the semantic cache without the LLM"""
+        engine = NLUEngine()
+        engine.openai_available = True
+
+        with patch("app.services.nlu_engine.semantic_cache", self.cache), \
+                patch("app.services.nlu_engine.intent_router") as router, \
+                patch("app.services.nlu_engine.nlu_cache.get", AsyncMock(return_value=None)), \
+                patch("app.services.nlu_engine.nlu_cache.set", AsyncMock()), \
+                patch("openai.ChatCompletion.acreate", AsyncMock()) as acreate:
+            router.enabled = False
+            acreate.return_value.choices[0].message.content = (
+                '{"intent": "help", "entities": {}, "confidence": 0.95, "response": "Ich kann vieles."}'
+            )
+
+            first = await engine.analyze("Was kannst du?", self.context)
+            second = await engine.analyze("was kannst du alles", self.context)
+
+        assert first["intent"] == second["intent"] == "help"
+        assert second["response"] == engine._local_result("help", 0.95)["response"]
+        assert acreate.await_count == 1
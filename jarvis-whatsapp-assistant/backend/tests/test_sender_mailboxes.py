@@ -0,0 +1,76 @@
+import pytest
+import asyncio
+
+from app.services.sender_mailboxes import SenderMailboxes
+
+class TestSenderMailboxes:
+
+    @pytest.mark.asyncio
+    async def test_jobs_of_one_sender_run_in_order(self):
+        """Test that a sender's jobs never overlap"""
+        mailboxes = SenderMailboxes(max_concurrency=8, idle_seconds=1)
+        events = []
+
+        async def job(name):
+            events.append(f"start-{name}")
+            await asyncio.sleep(0.01)
+            events.append(f"end-{name}")
+            return name
+
+        futures = [mailboxes.submit("user", lambda name=name: job(name)) for name in ("1", "2", "3")]
+        results = await asyncio.gather(*futures)
+
+        assert results == ["1", "2", "3"]
+        assert events == ["start-1", "end-1", "start-2", "end-2", "start-3", "end-3"]
+        await mailboxes.close()
+
+    @pytest.mark.asyncio
+    async def test_different_senders_run_in_parallel(self):
+        """Test that jobs of different senders overlap"""
+        mailboxes = SenderMailboxes(max_concurrency=8, idle_seconds=1)
+        started = asyncio.Event()
+        both_running = asyncio.Event()
+
+        async def first():
+            started.set()
+            await asyncio.wait_for(both_running.wait(), timeout=1)
+
+        async def second():
+            await started.wait()
+            both_running.set()
+
+        await asyncio.gather(mailboxes.submit("a", first), mailboxes.submit("b", second))
+        await mailboxes.close()
+
+    @pytest.mark.asyncio
+    async def test_job_exception_is_returned_to_caller(self):
+        """Test that a failing job does not kill the mailbox"""
+        mailboxes = SenderMailboxes(idle_seconds=1)
+
+        async def failing():
+            raise ValueError("boom")
+
+        async def ok():
+            return "ok"
+
+        with pytest.raises(ValueError):
+            await mailboxes.submit("user", failing)
+        assert await mailboxes.submit("user", ok) == "ok"
+        await mailboxes.close()
+
+    @pytest.mark.asyncio
+    async def test_idle_mailbox_is_evicted(self):
+        """Test that idle mailboxes are removed"""
+        mailboxes = SenderMailboxes(idle_seconds=0.05)
+
+        async def ok():
+            return "ok"
+
+        await mailboxes.submit("user", ok)
+        assert len(mailboxes) == 1
+
+        await asyncio.sleep(0.1)
+        assert len(mailboxes) == 0
+
+        assert await mailboxes.submit("user", ok) == "ok"
+        await mailboxes.close()
@@ -0,0 +1,71 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.side_effects import SideEffectLane
+
+class TestSideEffectLane:
+
+    def setup_method(self):
+        """Setup for each test"""
+        self.client = MagicMock()
+        self.client.mark_message_as_read = AsyncMock(return_value={"success": True})
+
+    @pytest.mark.asyncio
+    async def test_read_receipts_are_coalesced_per_sender(self):
+        """Test that only the newest pending receipt per sender is sent"""
+        lane = SideEffectLane(self.client, workers=1)
+
+        lane.mark_read("a", "m1")
+        lane.mark_read("a", "m2")
+        lane.mark_read("b", "n1")
+        lane.mark_read("a", "m3", typing=True)
+        await lane.drain()
+
+        calls = [(call.args[0], call.kwargs["typing"]) for call in self.client.mark_message_as_read.await_args_list]
+        assert calls == [("n1", False), ("m3", True)]
+        await lane.stop()
+
+    @pytest.mark.asyncio
+    async def test_submit_does_not_wait_for_the_call(self):
+        """Test that a slow side effect does not block the caller"""
+        release = asyncio.Event()
+
+        async def slow_read(message_id, typing=False):
+            await release.wait()
+
+        self.client.mark_message_as_read = AsyncMock(side_effect=slow_read)
+        lane = SideEffectLane(self.client, workers=1)
+
+        lane.mark_read("a", "m1")
+        await asyncio.sleep(0)
+
+        assert self.client.mark_message_as_read.await_count == 1
+        release.set()
+        await lane.stop()
+
+    @pytest.mark.asyncio
+    async def test_failures_are_swallowed(self):
+        """Test that a failing side effect is logged and the lane keeps running"""
+        self.client.mark_message_as_read.side_effect = [Exception("graph down"), {"success": True}]
+        lane = SideEffectLane(self.client, workers=1)
+
+        lane.mark_read("a", "m1")
+        await lane.drain()
+        lane.mark_read("b", "n1")
+        await lane.drain()
+
+        assert self.client.mark_message_as_read.await_count == 2
+        await lane.stop()
+
+    @pytest.mark.asyncio
+    async def test_full_lane_drops_oldest(self):
+        """Test that the lane stays bounded"""
+        lane = SideEffectLane(self.client, workers=1, max_pending=2)
+
+        lane.mark_read("a", "m1")
+        lane.mark_read("b", "n1")
+        lane.mark_read("c", "o1")
+
+        assert list(lane.pending) == ["read:b", "read:c"]
+        await lane.stop()
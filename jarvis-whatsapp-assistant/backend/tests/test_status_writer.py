@@ -0,0 +1,88 @@
+import pytest
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+from app.models.webhook import MessageStatus
+from app.services.status_writer import StatusWriter
+
+def make_statuses(count: int, start: int = 0):
+    return [MessageStatus(id=f"wamid.{i}", status="delivered", timestamp=1700000000 + i) for i in range(start, start + count)]
+
+class TestStatusWriter:
+
+    def setup_method(self):
+        """Setup for each test"""
+        self.connection = MagicMock()
+        self.connection.copy_records_to_table = AsyncMock()
+
+        @asynccontextmanager
+        async def acquire():
+            yield self.connection
+
+        self.writer = StatusWriter(batch_size=3, flush_interval=60, max_buffer=5)
+        self.writer.pool = MagicMock()
+        self.writer.pool.acquire = acquire
+        self.writer.pool.close = AsyncMock()
+
+    def written_ids(self):
+        return [
+            record[0]
+            for call in self.connection.copy_records_to_table.await_args_list
+            for record in call.kwargs["records"]
+        ]
+
+    def test_submit_without_database_is_noop(self):
+        """Test that statuses are ignored while Postgres is not connected"""
+        writer = StatusWriter()
+
+        assert writer.submit(make_statuses(2)) == 0
+        assert len(writer.buffer) == 0
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_one_batch_with_copy(self):
+        """Test that a flush writes at most one batch via COPY"""
+        self.writer.submit(make_statuses(4))
+
+        assert await self.writer.flush() is True
+
+        call = self.connection.copy_records_to_table.await_args
+        assert call.args[0] == "message_statuses"
+        assert len(call.kwargs["records"]) == 3
+        assert len(self.writer.buffer) == 1
+
+    @pytest.mark.asyncio
+    async def test_full_buffer_drops_and_reports_backpressure(self):
+        """Test that the bounded buffer drops new events when full"""
+        accepted = self.writer.submit(make_statuses(7))
+
+        assert accepted == 5
+        assert self.writer.dropped == 2
+        assert self.writer.backpressure is True
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_requeues_batch(self):
+        """Test that a failed COPY keeps the events for the next flush"""
+        self.connection.copy_records_to_table.side_effect = [Exception("db down"), None]
+        self.writer.submit(make_statuses(2))
+
+        assert await self.writer.flush() is False
+        assert len(self.writer.buffer) == 2
+
+        assert await self.writer.flush() is True
+        records = self.connection.copy_records_to_table.await_args.kwargs["records"]
+        assert [record[0] for record in records] == ["wamid.0", "wamid.1"]
+
+    @pytest.mark.asyncio
+    async def test_size_trigger_and_drain_on_stop(self):
+        """Test that a full batch triggers a flush and stop() drains the rest"""
+        self.writer._task = asyncio.create_task(self.writer._flush_loop())
+        self.writer.submit(make_statuses(4))
+        await asyncio.sleep(0.01)
+
+        assert len(self.writer.buffer) == 1
+
+        await self.writer.stop()
+
+        assert self.written_ids() == [f"wamid.{i}" for i in range(4)]
+        assert self.writer.enabled is False
@@ -34,7 +34,7 @@ class TestWebhook:
         )
         assert response.status_code == 403
     
-    @patch('app.services.message_processor.message_processor.process_incoming_message')
+    @patch('app.services.message_processor.message_processor.process_message')
     def test_webhook_message_processing(self, mock_process):
         """Test webhook message processing"""
         mock_process.return_value = AsyncMock()
@@ -63,6 +63,8 @@ class TestWebhook:
         
         assert response.status_code == 200
         assert response.json() == {"status": "ok"}
+        mock_process.assert_called_once()
+        assert mock_process.call_args.args[0].id == "msg123"
     
     def test_webhook_invalid_json(self):
         """Test webhook with invalid JSON"""
@@ -72,6 +74,29 @@ class TestWebhook:
         )
         assert response.status_code == 400
     
+    def test_webhook_invalid_json_is_not_queued(self):
+        """Test that queue mode rejects invalid JSON instead of acking and enqueueing it"""
+        with patch("app.api.webhooks.settings.WEBHOOK_QUEUE_ENABLED", True), \
+             patch("app.api.webhooks.webhook_queue.enqueue", new_callable=AsyncMock) as enqueue:
+            response = client.post("/api/v1/webhook", data="invalid json")
+            valid = client.post("/api/v1/webhook", json={"entry": []})
+        
+        assert response.status_code == 400
+        assert valid.status_code == 200
+        enqueue.assert_awaited_once_with(b'{"entry": []}')
+    
+    def test_queue_mode_bypasses_admission(self):
+        """Test that queue mode acks and enqueues without shedding, even when inline admission is full"""
+        with patch("app.api.webhooks.settings.WEBHOOK_QUEUE_ENABLED", True), \
+             patch("app.api.webhooks.webhook_queue.enqueue", new_callable=AsyncMock, return_value="1-0") as enqueue, \
+             patch("app.api.webhooks.admission_controller.admit", side_effect=AssertionError("admitted")), \
+             patch("app.api.webhooks.shed_webhook", new_callable=AsyncMock) as shed:
+            response = client.post("/api/v1/webhook", json={"entry": []})
+        
+        assert response.status_code == 200
+        enqueue.assert_awaited_once()
+        shed.assert_not_awaited()
+    
     def test_health_endpoint(self):
         """Test health check endpoint"""
         response = client.get("/health")
@@ -82,6 +107,7 @@ class TestWebhook:
         assert "redis" in data
         assert "openai_configured" in data
         assert "whatsapp_configured" in data
+        assert data["load"]["state"] == "normal"
     
     def test_root_endpoint(self):
         """Test root endpoint"""
@@ -0,0 +1,67 @@
+import pytest
+import orjson
+
+from app.models.webhook import WebhookEnvelope, InboundMessage
+
+class TestWebhookEnvelope:
+
+    def test_batched_payload(self):
+        """Test that messages and statuses of all entries and changes are collected"""
+        body = orjson.dumps({
+            "entry": [
+                {"changes": [
+                    {"field": "messages", "value": {
+                        "metadata": {"phone_number_id": "pn1"},
+                        "messages": [
+                            {"from": "a", "id": "1", "type": "text", "text": {"body": "Hallo"}, "timestamp": "10"},
+                            {"from": "b", "id": "2", "type": "audio", "audio": {"id": "media1"}, "timestamp": "11"}
+                        ]
+                    }},
+                    {"field": "messages", "value": {"statuses": [{"id": "out1", "status": "read", "timestamp": "12"}]}}
+                ]},
+                {"changes": [
+                    {"field": "messages", "value": {"messages": [
+                        {"from": "a", "id": "3", "type": "image", "image": {"id": "media2", "caption": "Blumen"}}
+                    ]}},
+                    {"field": "account_update", "value": {}}
+                ]}
+            ]
+        })
+
+        envelope = WebhookEnvelope.from_bytes(body)
+
+        assert [message.id for message in envelope.messages] == ["1", "2", "3"]
+        text, audio, image = envelope.messages
+        assert (text.sender_id, text.text, text.timestamp, text.phone_number_id) == ("a", "Hallo", 10, "pn1")
+        assert audio.media_id == "media1"
+        assert (image.media_id, image.caption) == ("media2", "Blumen")
+        assert envelope.statuses[0].status == "read"
+        assert envelope.unhandled[0]["field"] == "account_update"
+
+    def test_interactive_message(self):
+        """Test that the interactive payload is kept"""
+        message = InboundMessage.from_dict({
+            "from": "a", "id": "1", "type": "interactive",
+            "interactive": {"type": "button_reply", "button_reply": {"id": "yes", "title": "Ja"}}
+        })
+
+        assert message.interactive["button_reply"]["title"] == "Ja"
+        assert message.text is None
+
+    def test_slots(self):
+        """Test that the models carry no per-instance dict"""
+        message = InboundMessage(id="1", sender_id="a", type="text")
+
+        with pytest.raises(AttributeError):
+            message.unknown = True
+
+    def test_invalid_json(self):
+        """Test that invalid payloads raise ValueError"""
+        with pytest.raises(ValueError):
+            WebhookEnvelope.from_bytes(b"invalid json")
+        with pytest.raises(ValueError):
+            WebhookEnvelope.from_bytes(b"[]")
+
+    def test_empty_payload(self):
+        """Test that a payload without entries is falsy"""
+        assert not WebhookEnvelope.from_bytes(b"{}")
@@ -0,0 +1,133 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from app.core.redis_client import redis_client, MockRedisClient
+from app.models.webhook import InboundMessage
+from app.services.message_deduplicator import MessageDeduplicator
+from app.services.message_dispatcher import MessageDispatcher
+from app.services.webhook_queue import WebhookQueue
+
+class TestWebhookQueue:
+
+    def setup_method(self):
+        """Setup for each test"""
+        redis_client.redis_client = MockRedisClient()
+        self.queue = WebhookQueue()
+
+    def teardown_method(self):
+        """Reset the shared Redis client"""
+        redis_client.redis_client = None
+
+    @pytest.mark.asyncio
+    async def test_enqueue_appends_raw_body(self):
+        """Test that enqueue stores the raw body in the stream"""
+        entry_id = await self.queue.enqueue(b'{"entry": []}')
+
+        assert entry_id is not None
+        stream = redis_client.redis_client.streams[self.queue.stream_key]
+        assert stream[-1] == (entry_id, {"body": '{"entry": []}'})
+
+    @pytest.mark.asyncio
+    async def test_workers_drain_and_ack(self):
+        """Test that the worker pool hands entries to the handler and acknowledges them"""
+        handler = AsyncMock()
+        await self.queue.enqueue(b'{"entry": []}')
+
+        with patch("app.services.webhook_queue.settings.WEBHOOK_READ_BLOCK_MS", 10):
+            await self.queue.start(handler, concurrency=1)
+            for _ in range(50):
+                if handler.await_count:
+                    break
+                await asyncio.sleep(0.01)
+            await self.queue.stop()
+
+        handler.assert_awaited_once_with(b'{"entry": []}')
+        group = redis_client.redis_client.groups[(self.queue.stream_key, self.queue.group)]
+        assert group["pending"] == {}
+
+    @pytest.mark.asyncio
+    async def test_failed_entry_is_reclaimed(self):
+        """Test that an entry left pending by a failed handler is retried"""
+        await self.queue.ensure_group()
+        entry_id = await self.queue.enqueue(b'{"entry": []}')
+        entries = await redis_client.xreadgroup(self.queue.group, "crashed-worker", self.queue.stream_key)
+        assert entries[0][0] == entry_id
+
+        handler = AsyncMock()
+        with patch("app.services.webhook_queue.settings.WEBHOOK_CLAIM_IDLE_MS", 0):
+            reclaimed = await self.queue.reclaim_pending(handler)
+
+        assert reclaimed == 1
+        handler.assert_awaited_once()
+        group = redis_client.redis_client.groups[(self.queue.stream_key, self.queue.group)]
+        assert entry_id not in group["pending"]
+
+    @pytest.mark.asyncio
+    async def test_poison_entry_goes_to_dead_letter(self):
+        """Test that entries exceeding the delivery limit are dead-lettered"""
+        await self.queue.ensure_group()
+        entry_id = await self.queue.enqueue(b'not json')
+        await redis_client.xreadgroup(self.queue.group, "worker", self.queue.stream_key)
+
+        handler = AsyncMock()
+        with patch("app.services.webhook_queue.settings.WEBHOOK_CLAIM_IDLE_MS", 0), \
+             patch("app.services.webhook_queue.settings.WEBHOOK_MAX_DELIVERIES", 1):
+            await self.queue.reclaim_pending(handler)
+
+        handler.assert_not_awaited()
+        dead = redis_client.redis_client.streams[self.queue.dead_letter_key]
+        assert dead[0][1]["original_id"] == entry_id
+
+    @pytest.mark.asyncio
+    async def test_consumer_recreates_deleted_group(self):
+        """Test that a failed read (NOGROUP) backs off and recreates the group instead of busy-looping"""
+        handler = AsyncMock()
+        read = AsyncMock(wraps=redis_client.xreadgroup)
+
+        with patch("app.services.webhook_queue.settings.WEBHOOK_READ_BLOCK_MS", 10), \
+             patch.object(self.queue, "ERROR_BACKOFF_SECONDS", 0.05), \
+             patch.object(redis_client, "xreadgroup", read):
+            await self.queue.start(handler, concurrency=1)
+            # The stream and its group are deleted while the worker runs
+            redis_client.redis_client.groups.clear()
+            redis_client.redis_client.streams.clear()
+            await asyncio.sleep(0.02)
+            await self.queue.enqueue(b'{"entry": []}')
+            for _ in range(50):
+                if handler.await_count:
+                    break
+                await asyncio.sleep(0.01)
+            await self.queue.stop()
+
+        handler.assert_awaited_once_with(b'{"entry": []}')
+        assert (self.queue.stream_key, self.queue.group) in redis_client.redis_client.groups
+        # A handful of reads, not a busy loop
+        assert read.await_count < 20
+
+    @pytest.mark.asyncio
+    async def test_consumer_keeps_reading_while_a_burst_coalesces(self):
+        """Test that one consumer merges a sender's burst instead of waiting out each window"""
+        processor = AsyncMock()
+        dispatcher = MessageDispatcher(processor, deduplicator=MessageDeduplicator(), coalesce_window_ms=100)
+
+        async def handler(body):
+            text = body.decode("utf-8")
+            await dispatcher.dispatch([InboundMessage(id=text, sender_id="a", type="text", text=text)])
+
+        with patch("app.services.webhook_queue.settings.WEBHOOK_READ_BLOCK_MS", 10):
+            await self.queue.start(handler, concurrency=1)
+            for text in (b"1", b"2", b"3"):
+                await self.queue.enqueue(text)
+                await asyncio.sleep(0.03)
+            for _ in range(50):
+                group = redis_client.redis_client.groups[(self.queue.stream_key, self.queue.group)]
+                if processor.process_message.await_count and not group["pending"]:
+                    break
+                await asyncio.sleep(0.01)
+            await self.queue.stop()
+        await dispatcher.close()
+
+        processor.process_message.assert_awaited_once()
+        assert processor.process_message.await_args.args[0].text == "1\n2\n3"
+        assert group["pending"] == {}
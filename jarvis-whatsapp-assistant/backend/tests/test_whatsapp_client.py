@@ -0,0 +1,108 @@
+import pytest
+import hashlib
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.whatsapp_client import MediaTooLargeError, WhatsAppClient
+
+VOICE_NOTE = bytes(range(256)) * 1000
+
+class TestWhatsAppClient:
+
+    def setup_method(self):
+        """Setup for each test"""
+        self.requests = []
+        self.peers = set()
+
+        async def messages(request):
+            self.requests.append((request.headers.get("Authorization"), await request.json()))
+            self.peers.add(request.transport.get_extra_info("peername"))
+            return web.json_response({"messages": [{"id": "wamid.1"}]})
+
+        async def media(request):
+            return web.Response(body=b"audio-bytes")
+
+        self.app = web.Application()
+        self.app.router.add_post("/123/messages", messages)
+        self.app.router.add_get("/media/1", media)
+
+        async def voice_note(request):
+            response = web.StreamResponse()
+            await response.prepare(request)
+            for start in range(0, len(VOICE_NOTE), 10000):
+                await response.write(VOICE_NOTE[start:start + 10000])
+            return response
+
+        self.app.router.add_get("/media/voice", voice_note)
+
+    async def make_client(self, server: TestServer) -> WhatsAppClient:
+        client = WhatsAppClient()
+        client.base_url = str(server.make_url("")).rstrip("/")
+        client.phone_number_id = "123"
+        await client.start()
+        return client
+
+    @pytest.mark.asyncio
+    async def test_requests_reuse_one_pooled_connection(self):
+        """Test that sequential calls share the session and its keep-alive connection"""
+        async with TestServer(self.app) as server:
+            client = await self.make_client(server)
+            session = client.session
+
+            for i in range(3):
+                await client.send_text_message("49151", f"Nachricht {i}")
+            await client.mark_message_as_read("wamid.0")
+
+            assert client.session is session
+            assert len(self.peers) == 1
+            assert len(self.requests) == 4
+            assert self.requests[0][0] == f"Bearer {client.access_token}"
+            assert client.pool_stats()["in_flight"] == 0
+            await client.close()
+
+    @pytest.mark.asyncio
+    async def test_download_media_and_close(self):
+        """Test that media downloads use the shared session and close() releases it"""
+        async with TestServer(self.app) as server:
+            client = await self.make_client(server)
+
+            data = await client.download_media(str(server.make_url("/media/1")))
+            await client.close()
+
+            assert data == b"audio-bytes"
+            assert client.session is None
+            assert client.pool_stats()["open"] is False
+
+    @pytest.mark.asyncio
+    async def test_api_error_raises(self):
+        """Test that non-200 responses still raise"""
+        async with TestServer(self.app) as server:
+            client = await self.make_client(server)
+
+            with pytest.raises(Exception):
+                await client.get_media_url("missing")
+            await client.close()
+
+    @pytest.mark.asyncio
+    async def test_download_to_file_spools_and_hashes(self):
+        """Test that a streamed download is spooled with its size and sha256"""
+        async with TestServer(self.app) as server:
+            client = await self.make_client(server)
+
+            with await client.download_media_to_file(str(server.make_url("/media/voice"))) as media:
+                assert media.size == len(VOICE_NOTE)
+                assert media.sha256 == hashlib.sha256(VOICE_NOTE).hexdigest()
+                assert media.read() == VOICE_NOTE
+            await client.close()
+
+    @pytest.mark.asyncio
+    async def test_download_enforces_size_cap(self):
+        """Test that streaming stops with MediaTooLargeError past the cap"""
+        async with TestServer(self.app) as server:
+            client = await self.make_client(server)
+
+            with pytest.raises(MediaTooLargeError):
+                await client.download_media_to_file(str(server.make_url("/media/voice")), max_bytes=50000)
+            with pytest.raises(MediaTooLargeError):
+                await client.download_media(str(server.make_url("/media/1")), max_bytes=5)
+            await client.close()
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import signal
+
+# Import our modules
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.api.webhooks import process_webhook_body
+from app.services.intent_classifier import intent_router
+from app.services.message_dispatcher import message_dispatcher
+from app.services.outbound_scheduler import outbound_scheduler
+from app.services.prompt_context import token_counter
+from app.services.side_effects import side_effects
+from app.services.status_writer import status_writer
+from app.services.webhook_queue import webhook_queue
+from app.services.whatsapp_client import whatsapp_client
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+async def run_worker():
+    """Drain the webhook stream until SIGINT/SIGTERM"""
+    logger.info("Starting JARVIS webhook worker...")
+    await redis_client.connect()
+    await whatsapp_client.start()
+    await outbound_scheduler.start()
+    await side_effects.start()
+    await status_writer.start()
+    if intent_router.enabled:
+        intent_router.load()
+    await token_counter.load()
+    await webhook_queue.start(process_webhook_body, settings.WEBHOOK_WORKER_CONCURRENCY)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await stop_event.wait()
+
+    logger.info("Shutting down JARVIS webhook worker...")
+    await webhook_queue.stop()
+    await message_dispatcher.close()
+    await status_writer.stop()
+    await side_effects.stop()
+    await outbound_scheduler.stop()
+    await whatsapp_client.close()
+    await redis_client.disconnect()
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())